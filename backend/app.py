@@ -1,18 +1,34 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
-from database.db import init_db, get_db
+
+load_dotenv()
+
+# librosa compiles its numba functions as it imports them; a writable on-disk cache
+# lets every later worker process load the compiled code instead of recompiling
+if not os.getenv('NUMBA_CACHE_DIR'):
+    os.environ['NUMBA_CACHE_DIR'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.numba_cache')
+
+from database.db import init_db, get_db, DATABASE
+from database.image_cache import SkinImageCache
+from database.ocr_store import LabOcrStore
 from models.skin_analyzer import SkinAnalyzer
 from models.lab_analyzer import LabAnalyzer
 from models.chatbot import MedicalChatbot
 from models.sound_analyzer import SoundAnalyzer
+from models.sound_stream import SoundStreamRegistry
+from utils.helpers import allowed_file
+from utils.response_cache import fragment_cache_stats
 import jwt
+import json
+import queue
+import sqlite3
+import threading
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
-
-load_dotenv()
+from contextlib import closing
 
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -29,6 +45,16 @@ skin_analyzer = SkinAnalyzer()
 lab_analyzer = LabAnalyzer()
 chatbot = MedicalChatbot()
 sound_analyzer = SoundAnalyzer()
+sound_streams = SoundStreamRegistry(sound_analyzer)
+
+# Warm up sound analysis before serving, so no user waits for it
+sound_warmup_error = None
+if os.getenv('SOUND_WARMUP', 'true').lower() == 'true':
+    try:
+        print(f"✓ Sound analysis warmed up in {sound_analyzer.warmup():.2f}s")
+    except Exception as e:
+        sound_warmup_error = str(e)
+        print(f"⚠️ Sound analysis warmup failed: {e}")
 
 # Create upload folder
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -49,6 +75,30 @@ def token_required(f):
         return f(current_user_id, *args, **kwargs)
     return decorated
 
+# Accounts (by email) allowed to call operator endpoints
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+# Operator check; goes below token_required
+def admin_required(f):
+    @wraps(f)
+    def decorated(current_user_id, *args, **kwargs):
+        user = get_db().execute('SELECT email FROM users WHERE id = ?', (current_user_id,)).fetchone()
+        if user is None or user['email'].lower() not in ADMIN_EMAILS:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(current_user_id, *args, **kwargs)
+    return decorated
+
+# Routes - Readiness (for load balancers and container health checks)
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    # Warmup finishes before the app starts serving: answering at all means ready
+    return jsonify({
+        'ready': True,
+        'sound_warmed_up': sound_analyzer.ready,
+        'sound_warmup_seconds': sound_analyzer.warmup_seconds,
+        'sound_warmup_error': sound_warmup_error
+    })
+
 # Routes - Frontend
 @app.route('/')
 def index():
@@ -146,8 +196,9 @@ def analyze_skin(current_user_id):
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'skin_{current_user_id}_{datetime.now().timestamp()}.jpg')
     file.save(filepath)
     
-    # Analyze image
-    result = skin_analyzer.analyze(filepath)
+    # Analyze image (near-duplicates of earlier uploads reuse the stored result)
+    result = skin_analyzer.analyze(filepath, user_id=current_user_id,
+                                   image_cache=SkinImageCache(get_db()))
     
     # Save to database
     db = get_db()
@@ -163,24 +214,78 @@ def analyze_skin(current_user_id):
 @app.route('/api/analyze/lab', methods=['POST'])
 @token_required
 def analyze_lab(current_user_id):
-    if 'image' not in request.files:
+    # One image ('image') or several images and/or PDFs ('files')
+    files = request.files.getlist('files') or request.files.getlist('image')
+    files = [file for file in files if file.filename]
+    if not files:
         return jsonify({'error': 'No image provided'}), 400
     
-    file = request.files['image']
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'lab_{current_user_id}_{datetime.now().timestamp()}.jpg')
-    file.save(filepath)
+    for file in files:
+        if not allowed_file(file.filename, 'lab'):
+            return jsonify({'error': f'Unsupported file type: {file.filename}'}), 400
     
-    result = lab_analyzer.analyze(filepath)
+    timestamp = datetime.now().timestamp()
+    filepaths = []
+    for i, file in enumerate(files):
+        ext = file.filename.rsplit('.', 1)[1].lower()
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'lab_{current_user_id}_{timestamp}_{i}.{ext}')
+        file.save(filepath)
+        filepaths.append(filepath)
     
-    db = get_db()
-    db.execute(
-        'INSERT INTO health_records (user_id, record_type, diagnosis, treatment, severity) VALUES (?, ?, ?, ?, ?)',
-        (current_user_id, 'lab', result['diagnosis'], result['treatment'], result['severity'])
-    )
-    db.commit()
+    # Raw OCR of every page is kept so the report can be re-parsed later without OCR
+    ocr_pages = []
+    
+    def ocr_lookup(image_hash, ocr_version):
+        # Own connection: the streaming analysis runs outside the request context
+        with closing(sqlite3.connect(DATABASE)) as conn:
+            return LabOcrStore(conn).find(image_hash, ocr_version, user_id=current_user_id)
+    
+    def save_record(result):
+        db = get_db()
+        cursor = db.execute(
+            'INSERT INTO health_records (user_id, record_type, diagnosis, treatment, severity) VALUES (?, ?, ?, ?, ?)',
+            (current_user_id, 'lab', result['diagnosis'], result['treatment'], result['severity'])
+        )
+        db.commit()
+        if ocr_pages:
+            LabOcrStore(db).save_pages(cursor.lastrowid, current_user_id, ocr_pages)
+    
+    # ?stream=true: newline-delimited JSON, one progress event per page, then the result
+    if request.args.get('stream', '').lower() == 'true':
+        events = queue.Queue()
+        
+        def run():
+            events.put({'event': 'result', 'result': lab_analyzer.analyze_document(
+                filepaths, progress=events.put, ocr_sink=ocr_pages.append, ocr_lookup=ocr_lookup)})
+        
+        threading.Thread(target=run, daemon=True).start()
+        
+        def generate():
+            while True:
+                event = events.get()
+                if event['event'] == 'result' and 'quality' not in event['result']:
+                    save_record(event['result'])
+                yield json.dumps(event) + '\n'
+                if event['event'] == 'result':
+                    break
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    result = lab_analyzer.analyze_document(filepaths, ocr_sink=ocr_pages.append, ocr_lookup=ocr_lookup)
+    if 'quality' in result:
+        # Rejected by the quality gate before OCR: ask for a better image
+        return jsonify(result), 422
+    save_record(result)
     
     return jsonify(result)
 
+@app.route('/api/analyze/lab/quality-stats', methods=['GET'])
+@token_required
+def lab_quality_stats(current_user_id):
+    if lab_analyzer.quality_gate is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **lab_analyzer.quality_gate.stats()})
+
 # Routes - Chatbot
 @app.route('/api/chatbot', methods=['POST'])
 @token_required
@@ -199,6 +304,18 @@ def chat(current_user_id):
     
     return jsonify({'response': response})
 
+@app.route('/api/chatbot/cache-stats', methods=['GET'])
+@token_required
+def chatbot_cache_stats(current_user_id):
+    return jsonify(fragment_cache_stats(chatbot))
+
+@app.route('/api/chatbot/reload', methods=['POST'])
+@token_required
+@admin_required
+def chatbot_reload(current_user_id):
+    chatbot.reload_disease_database()
+    return jsonify({'symptoms': len(chatbot.symptoms_database), **fragment_cache_stats(chatbot)})
+
 # Routes - Sound Analysis
 @app.route('/api/analyze/sound', methods=['POST'])
 @token_required
@@ -207,17 +324,72 @@ def analyze_sound(current_user_id):
         return jsonify({'error': 'No audio file provided'}), 400
     
     file = request.files['audio']
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'sound_{current_user_id}_{datetime.now().timestamp()}.wav')
+    # Keep the real extension so the decoder picks soundfile or ffmpeg up front
+    ext = file.filename.rsplit('.', 1)[1].lower() if allowed_file(file.filename, 'audio') else 'wav'
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'sound_{current_user_id}_{datetime.now().timestamp()}.{ext}')
     file.save(filepath)
     
     result = sound_analyzer.analyze(filepath)
+    save_sound_record(current_user_id, result)
     
+    return jsonify(result)
+
+def save_sound_record(user_id, result):
     db = get_db()
     db.execute(
         'INSERT INTO health_records (user_id, record_type, diagnosis, treatment, severity) VALUES (?, ?, ?, ?, ?)',
-        (current_user_id, 'sound', result['diagnosis'], result['treatment'], result['severity'])
+        (user_id, 'sound', result['diagnosis'], result['treatment'], result['severity'])
     )
     db.commit()
+
+# Live recordings: open a stream, post raw PCM chunks while recording, then finish
+@app.route('/api/analyze/sound/stream', methods=['POST'])
+@token_required
+def open_sound_stream(current_user_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        stream_id = sound_streams.open(current_user_id, int(data.get('sample_rate', 0)), data.get('format', 'f32le'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    stream = sound_streams.get(stream_id, current_user_id)
+    return jsonify({
+        'stream_id': stream_id,
+        'sample_rate': stream.sample_rate,
+        'provisional_seconds': stream.provisional_seconds
+    }), 201
+
+@app.route('/api/analyze/sound/stream/<stream_id>', methods=['POST'])
+@token_required
+def sound_stream_chunk(current_user_id, stream_id):
+    stream = sound_streams.get(stream_id, current_user_id)
+    if stream is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    
+    # Body: raw PCM in the format given when the stream was opened
+    with stream.lock:
+        provisional = stream.feed(request.get_data())
+        seconds = stream.features.seconds
+    return jsonify({'seconds': round(seconds, 2), 'result': provisional})
+
+@app.route('/api/analyze/sound/stream/<stream_id>/finish', methods=['POST'])
+@token_required
+def finish_sound_stream(current_user_id, stream_id):
+    stream = sound_streams.close(stream_id, current_user_id)
+    if stream is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    
+    with stream.lock:
+        # A last chunk may come with the request that ends the stream
+        if request.content_length:
+            stream.feed(request.get_data())
+        try:
+            result = stream.finish()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    save_sound_record(current_user_id, result)
     
     return jsonify(result)
 
@@ -0,0 +1,100 @@
+"""
+Benchmark audio decoding for sound analysis: librosa.load against the
+AudioLoader decode paths, next to the feature extraction time they feed.
+
+Test files are a synthetic 44.1 kHz stereo recording written as WAV, FLAC,
+OGG and MP3 (when libsndfile can write them), plus m4a when ffmpeg is
+installed.
+
+Usage: python backend/benchmarks/bench_audio_decode.py [--seconds 60] [--repeats 3]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.audio_io import AudioLoader
+from models.sound_features import extract_signal_features
+
+NATIVE_RATE = 44100
+
+
+def write_test_files(directory, seconds):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * NATIVE_RATE)) / NATIVE_RATE
+    breath = np.clip(np.sin(2 * np.pi * t / 4), 0, None) ** 2 * rng.standard_normal(t.size) * 0.1
+    stereo = np.stack([breath, 0.8 * breath + 0.01 * np.sin(2 * np.pi * 120 * t)], axis=1).astype(np.float32)
+
+    paths = {}
+    for ext, fmt in (('wav', 'WAV'), ('flac', 'FLAC'), ('ogg', 'OGG'), ('mp3', 'MP3')):
+        if fmt not in sf.available_formats():
+            continue
+        path = os.path.join(directory, f'recording.{ext}')
+        # Written in blocks: one large write can crash libsndfile's Vorbis/MP3 encoders
+        with sf.SoundFile(path, 'w', NATIVE_RATE, 2, format=fmt) as out:
+            for start in range(0, len(stereo), NATIVE_RATE):
+                out.write(stereo[start:start + NATIVE_RATE])
+        paths[ext] = path
+    if shutil.which('ffmpeg'):
+        path = os.path.join(directory, 'recording.m4a')
+        subprocess.run(['ffmpeg', '-v', 'error', '-y', '-i', paths['wav'], path], check=True)
+        paths['m4a'] = path
+    return paths
+
+
+def timed(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return (time.perf_counter() - start) / repeats * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    loaders = {
+        'loader soxr_hq': AudioLoader(resample='soxr_hq'),
+        'loader soxr_mq': AudioLoader(resample='soxr_mq'),
+        'loader native': AudioLoader(resample='none')
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_test_files(directory, args.seconds)
+        print("=" * 78)
+        print(f"Decode of a {args.seconds:.0f} s 44.1 kHz stereo recording (ms), features for scale")
+        print("=" * 78)
+        print(f"  {'format':<6} {'librosa.load':>13}" + ''.join(f"{name:>16}" for name in loaders)
+              + f"{'features':>10}")
+        # Warm up imports and resampler setup outside the timings
+        librosa.load(paths['wav'], sr=22050)
+        for loader in loaders.values():
+            loader.load(paths['wav'])
+        for ext, path in paths.items():
+            baseline, (reference, _) = timed(lambda: librosa.load(path, sr=22050), args.repeats)
+            row = f"  {ext:<6} {baseline:13.1f}"
+            for name, loader in loaders.items():
+                ms, (y, sr) = timed(lambda: loader.load(path), args.repeats)
+                row += f"{ms:9.1f} ({baseline / ms:4.1f}x)"
+                if name == 'loader soxr_hq':
+                    # Same resampler as librosa.load: the signals should agree
+                    n = min(len(y), len(reference))
+                    assert np.allclose(y[:n], reference[:n], atol=1e-4), f"{ext}: decoded signal differs"
+                    analyzed = y, sr
+            features_ms, _ = timed(lambda: extract_signal_features(*analyzed), args.repeats)
+            print(row + f"{features_ms:10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark chatbot replies with and without the medical report cache, and
+check that cached replies are the ones the chatbot would build anyway.
+
+Messages are phrasings of a handful of symptom combinations in different
+orders and wordings, so most of them share a report. Reloading the disease
+database must drop the cached reports.
+
+Usage: python backend/benchmarks/bench_chatbot_cache.py [--iterations 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.chatbot import MedicalChatbot
+from utils.response_cache import FragmentCache, fragment_cache_stats
+
+MESSAGES = [
+    "i have a headache",
+    "headache and fever",
+    "fever and a headache since this morning",
+    "my head hurts and i have a high temperature",
+    "coughing, sore throat and a runny nose",
+    "runny nose, sore throat, cough",
+    "short of breath with chest pain",
+    "chest pain and shortness of breath",
+    "nauseous and dizzy",
+    "dizziness and nausea after lunch",
+    "itchy rash",
+    "rash, itching"
+]
+
+
+def timed(func, iterations):
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    sys.stdout = open(os.devnull, 'w')
+    cached, uncached = MedicalChatbot(), MedicalChatbot()
+    sys.stdout = sys.__stdout__
+    uncached._fragment_cache = FragmentCache(maxsize=0)
+
+    print("=" * 72)
+    print("Chatbot replies: uncached report -> cached report (per message)")
+    print("=" * 72)
+    mismatches = [message for message in MESSAGES
+                  if cached.get_response(message) != uncached.get_response(message)]
+    combinations = {frozenset(cached._detect_symptoms(message)) for message in MESSAGES}
+    print(f"  {len(MESSAGES)} messages, {len(combinations)} symptom combinations")
+    print(f"  Replies identical: {len(MESSAGES) - len(mismatches)}/{len(MESSAGES)}")
+    for message in mismatches:
+        print(f"    MISMATCH: {message!r}")
+
+    symptoms = [cached._detect_symptoms(message) for message in MESSAGES]
+    report = timed(lambda i: uncached._generate_medical_advice(symptoms[i % len(symptoms)]), n)
+    hit = timed(lambda i: cached._generate_medical_advice(symptoms[i % len(symptoms)]), n)
+    print(f"  {'report':<22} {report:9.2f} us -> {hit:6.2f} us   ({report / hit:6.1f}x)")
+    full = timed(lambda i: uncached.get_response(MESSAGES[i % len(MESSAGES)]), n)
+    full_hit = timed(lambda i: cached.get_response(MESSAGES[i % len(MESSAGES)]), n)
+    print(f"  {'get_response':<22} {full:9.2f} us -> {full_hit:6.2f} us   ({full / full_hit:6.1f}x)")
+    print(f"  Cache: {fragment_cache_stats(cached)}")
+
+    # A reload must not serve reports built from the previous database
+    sys.stdout = open(os.devnull, 'w')
+    cached.disease_db_path = os.devnull + '.missing'
+    cached.reload_disease_database()
+    sys.stdout = sys.__stdout__
+    reloaded = fragment_cache_stats(cached)['entries'] == 0
+    print(f"  Cache emptied by reload: {'yes' if reloaded else 'NO'}")
+
+    # Least recently used combinations go first
+    small = MedicalChatbot.__new__(MedicalChatbot)
+    small.__dict__.update(cached.__dict__)
+    small._fragment_cache = FragmentCache(maxsize=2)
+    small._generate_medical_advice(['fever'])
+    small._generate_medical_advice(['cough'])
+    small._generate_medical_advice(['fever'])
+    small._generate_medical_advice(['rash'])
+    kept = set(key for _, key in small._fragment_cache._entries)
+    lru = kept == {frozenset(['fever']), frozenset(['rash'])}
+    print(f"  Least recently used report evicted: {'yes' if lru else 'NO'}")
+
+    if mismatches or not reloaded or not lru:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
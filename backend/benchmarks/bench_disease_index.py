@@ -0,0 +1,147 @@
+"""
+Benchmark BM25 disease retrieval (DiseaseIndex) for free-text chat messages,
+and check its rankings against a direct BM25 computation.
+
+The database is the bundled diseases padded with generated ones that share
+a medical-sounding vocabulary. Building, saving and loading the index are
+timed as well as queries, and the loaded index must rank like the built one.
+
+Usage: python backend/benchmarks/bench_disease_index.py [--diseases 1000 5000 20000] [--queries 500]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.disease_index import DiseaseIndex, disease_document
+
+BUNDLED = [
+    {'name': 'Common Cold', 'symptoms': ['fever', 'cough', 'runny nose', 'sore throat', 'sneezing', 'congestion']},
+    {'name': 'Pneumonia', 'symptoms': ['high fever', 'chest pain', 'shortness of breath', 'cough with phlegm']},
+    {'name': 'Asthma', 'symptoms': ['shortness of breath', 'wheezing', 'chest tightness', 'cough']},
+    {'name': 'Migraine', 'symptoms': ['severe headache', 'nausea', 'sensitivity to light', 'visual disturbances']},
+    {'name': 'Urinary Tract Infection', 'symptoms': ['burning urination', 'frequent urination', 'cloudy urine']}
+]
+
+BODY = ['chest', 'throat', 'skin', 'joint', 'muscle', 'stomach', 'head', 'back', 'eye', 'ear', 'kidney',
+        'liver', 'lung', 'heart', 'nerve', 'bone', 'bladder', 'sinus', 'bowel', 'spine']
+FINDINGS = ['pain', 'swelling', 'rash', 'itching', 'bleeding', 'stiffness', 'weakness', 'numbness',
+            'tenderness', 'redness', 'discharge', 'cramps', 'inflammation', 'irritation', 'burning']
+KINDS = ['syndrome', 'disease', 'infection', 'disorder', 'fever', 'deficiency', 'itis', 'palsy']
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'bra', 'dri', 'pho', 'stu']
+
+
+def build_diseases(count, seed=0):
+    rng = random.Random(seed)
+    diseases = [dict(disease) for disease in BUNDLED]
+    for i in range(count - len(diseases)):
+        eponym = ''.join(rng.choice(SYLLABLES) for _ in range(3)).title()
+        symptoms = [f'{rng.choice(BODY)} {rng.choice(FINDINGS)}' for _ in range(rng.randint(3, 7))]
+        diseases.append({
+            'name': f'{eponym} {rng.choice(KINDS)}',
+            'symptoms': symptoms,
+            'description': f'A {rng.choice(["rare", "common", "chronic", "acute"])} condition of the '
+                           f'{rng.choice(BODY)} with {rng.choice(FINDINGS)}.'
+        })
+    return diseases
+
+
+def make_queries(diseases, count, seed=1):
+    rng = random.Random(seed)
+    templates = ['what is {}', 'tell me about {}', 'i keep getting {} and {}', 'could {} mean something serious',
+                 'is {} with {} contagious']
+    queries = []
+    for _ in range(count):
+        disease = rng.choice(diseases)
+        terms = [disease['name'].lower()] + disease['symptoms']
+        template = rng.choice(templates)
+        queries.append(template.format(*rng.sample(terms, template.count('{}'))))
+    return queries
+
+
+def direct_bm25(index, query, top_k):
+    """BM25 from term counts in plain Python, with the index's tokenizer"""
+    documents = [Counter(index.analyzer(disease_document(disease))) for disease in index.diseases]
+    average = sum(sum(doc.values()) for doc in documents) / len(documents)
+    doc_freq = Counter(term for doc in documents for term in doc)
+    terms = set(index.analyzer(query)) & set(index.vocabulary)
+    scores = []
+    for i, doc in enumerate(documents):
+        length = sum(doc.values())
+        score = 0.0
+        for term in terms:
+            tf = doc.get(term, 0)
+            if tf:
+                idf = math.log(1 + (len(documents) - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                score += idf * tf * (index.k1 + 1) / (tf + index.k1 * (1 - index.b + index.b * length / average))
+        scores.append((score, i))
+    scores.sort(key=lambda item: (-item[0], item[1]))
+    return [(i, score) for score, i in scores[:top_k] if score > 0]
+
+
+def same_ranking(found, expected):
+    """Same scores in the same order; equal scores may come in any order"""
+    if len(found) != len(expected):
+        return False
+    return all(math.isclose(score, expected_score, rel_tol=1e-4)
+               for (_, score), (_, expected_score) in zip(found, expected))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--diseases', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--top-k', type=int, default=3)
+    args = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        for count in [len(BUNDLED)] + args.diseases:
+            diseases = build_diseases(count)
+            queries = make_queries(diseases, args.queries)
+            path = os.path.join(directory, f'index{count}.npz')
+
+            print("=" * 72)
+            print(f"Disease retrieval: {count} diseases, top {args.top_k} of {len(queries)} queries")
+            print("=" * 72)
+            sys.stdout = open(os.devnull, 'w')
+            start = time.perf_counter()
+            built = DiseaseIndex.load_or_build(diseases, path)
+            build_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            loaded = DiseaseIndex.load_or_build(diseases, path)
+            load_ms = (time.perf_counter() - start) * 1000
+            sys.stdout = sys.__stdout__
+            print(f"  Build and save {build_ms:8.1f} ms, load saved {load_ms:7.1f} ms "
+                  f"({built.postings.shape[0]} terms, {built.postings.nnz} weights)")
+
+            checked = queries[:20]
+            mismatches = 0
+            for query in checked:
+                found = [(diseases.index(disease), score) for disease, score in built.search(query, args.top_k)]
+                mismatches += not same_ranking(found, direct_bm25(built, query, args.top_k))
+                mismatches += built.search(query, args.top_k) != loaded.search(query, args.top_k)
+            ok = ok and not mismatches
+            print(f"  Rankings match direct BM25 and the saved index: {'yes' if not mismatches else 'NO'}")
+
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                loaded.search(query, args.top_k)
+                latencies.append((time.perf_counter() - start) * 1e6)
+            print(f"  Query latency: mean {np.mean(latencies):7.1f} us, p99 {np.percentile(latencies, 99):7.1f} us")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
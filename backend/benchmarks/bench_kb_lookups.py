@@ -0,0 +1,127 @@
+"""
+Benchmark knowledge-base lookups against the previous linear scans, and
+check that both return the same entries.
+
+LabAnalyzer._get_test_info_from_db and SkinAnalyzer._get_detailed_medications
+are run on the bundled test and condition names, on keys that only match by
+substring, on unknown keys, and again after padding the databases with
+thousands of generated entries.
+
+Usage: python backend/benchmarks/bench_kb_lookups.py [--entries 5000] [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.lab_analyzer import LabAnalyzer
+from models.skin_analyzer import SkinAnalyzer
+
+# Test and condition names as setup_project.py writes them
+LAB_TESTS = [
+    {'name': 'Glucose (Fasting)', 'synonyms': ['fbs', 'fbg', 'fasting blood sugar']},
+    {'name': 'Total Cholesterol'},
+    {'name': 'HDL Cholesterol'},
+    {'name': 'LDL Cholesterol'},
+    {'name': 'Hemoglobin'},
+    {'name': 'WBC (White Blood Cells)', 'synonyms': ['wbc count', 'tlc', 'total leukocyte count']},
+    {'name': 'Creatinine'},
+    {'name': 'ALT (Liver Enzyme)'}
+]
+SKIN_CONDITIONS = ['Acne', 'Eczema (Atopic Dermatitis)', 'Psoriasis', 'Rosacea', 'Fungal Infection',
+                   'Dermatitis', 'Melanoma']
+
+EXTRA_KEYS = ['cholesterol', 'hdl_cholesterol', 'white_blood', 'liver', 'vitamin_d', 'tsh', 'ferritin', 'cr', '']
+
+
+def legacy_test_info(lab_test_database, test_name):
+    """Previous LabAnalyzer._get_test_info_from_db"""
+    for test in lab_test_database.get('tests', []):
+        db_test_name = test['name'].lower().split('(')[0].strip()
+        if test_name.replace('_', ' ') in db_test_name or db_test_name in test_name:
+            return test
+    return None
+
+
+def legacy_medications(skin_disease_database, default_meds, diagnosis):
+    """Previous SkinAnalyzer._get_detailed_medications"""
+    for condition in skin_disease_database.get('conditions', []):
+        if condition['name'] == diagnosis:
+            return condition.get('medications', [])
+    return default_meds.get(diagnosis, [])
+
+
+def build_databases(entries):
+    tests = [dict(test, normal_range={'min': 1, 'max': 2}) for test in LAB_TESTS]
+    tests += [{'name': f'Analyte {i} (Serum)', 'normal_range': {'min': 0, 'max': i}} for i in range(entries)]
+    conditions = [{'name': name, 'medications': [f'{name} medication']} for name in SKIN_CONDITIONS]
+    conditions += [{'name': f'Condition {i}', 'medications': [f'Drug {i}']} for i in range(entries)]
+    return {'tests': tests}, {'conditions': conditions}
+
+
+def timed(func, keys, iterations):
+    """Mean microseconds per lookup"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(keys[i % len(keys)])
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(lab, skin, default_meds, iterations):
+    lab_keys = list(lab.test_index) + EXTRA_KEYS
+    skin_keys = list(skin.diseases.values()) + SKIN_CONDITIONS + ['Unknown']
+
+    lab_mismatches = [key for key in lab_keys
+                      if lab._get_test_info_from_db(key) is not legacy_test_info(lab.lab_test_database, key)]
+    skin_mismatches = [key for key in skin_keys
+                       if skin._get_detailed_medications(key)
+                       != legacy_medications(skin.skin_disease_database, default_meds, key)]
+    print(f"  Parity: lab {len(lab_keys) - len(lab_mismatches)}/{len(lab_keys)}, "
+          f"skin {len(skin_keys) - len(skin_mismatches)}/{len(skin_keys)}")
+    for key in lab_mismatches + skin_mismatches:
+        print(f"    MISMATCH: {key!r}")
+
+    # Requests only ask for the keys the analyzers produce
+    lab_request_keys = list(lab.value_parser.tests)
+    skin_request_keys = list(skin.diseases.values())
+    legacy = timed(lambda key: legacy_test_info(lab.lab_test_database, key), lab_request_keys, iterations)
+    indexed = timed(lab._get_test_info_from_db, lab_request_keys, iterations)
+    print(f"  {'lab test info':<22} {legacy:9.2f} us -> {indexed:6.2f} us   ({legacy / indexed:7.1f}x)")
+    legacy = timed(lambda key: legacy_medications(skin.skin_disease_database, default_meds, key),
+                   skin_request_keys, iterations)
+    indexed = timed(skin._get_detailed_medications, skin_request_keys, iterations)
+    print(f"  {'skin medications':<22} {legacy:9.2f} us -> {indexed:6.2f} us   ({legacy / indexed:7.1f}x)")
+    return not (lab_mismatches or skin_mismatches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=5000, help='generated entries added to each database')
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    lab, skin = LabAnalyzer(enable_ocr=False), SkinAnalyzer()
+    # Defaults are whatever the index holds beyond the database entries
+    db_names = {condition['name'] for condition in skin.skin_disease_database.get('conditions', [])}
+    default_meds = {name: meds for name, meds in skin.medication_index.items() if name not in db_names}
+
+    ok = True
+    for entries in (0, args.entries):
+        lab.lab_test_database, skin.skin_disease_database = build_databases(entries)
+        lab.test_index = lab._build_test_index()
+        skin.medication_index = skin._build_medication_index()
+
+        print("=" * 72)
+        print(f"Knowledge-base lookups: linear scan -> index "
+              f"({len(lab.lab_test_database['tests'])} tests, {len(skin.skin_disease_database['conditions'])} conditions)")
+        print("=" * 72)
+        ok = run(lab, skin, default_meds, args.iterations) and ok
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Benchmark the single-pass lab value parser against the previous
+per-pattern regex parser, and check that both return the same values.
+
+The corpus mixes synonyms, casing, separators, noise lines and implausible
+values; the throughput run concatenates many reports into one large
+multi-page OCR text, then repeats it with extra tests loaded as a database
+would add them.
+
+Usage: python backend/benchmarks/bench_lab_parser.py [--reports 2000] [--pages 200]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.lab_analyzer import REASONABLE_RANGES
+from models.lab_parser import LabValueParser, DEFAULT_SYNONYMS
+
+# Patterns of the previous parser, one re.search per pattern
+LEGACY_PATTERNS = {
+    'glucose': [
+        r'glucose[:\s]+(\d+\.?\d*)',
+        r'blood\s+sugar[:\s]+(\d+\.?\d*)',
+        r'fasting\s+glucose[:\s]+(\d+\.?\d*)',
+        r'glu[:\s]+(\d+\.?\d*)',
+        r'bs[:\s]+(\d+\.?\d*)'
+    ],
+    'cholesterol': [
+        r'total\s+cholesterol[:\s]+(\d+\.?\d*)',
+        r'cholesterol[:\s]+(\d+\.?\d*)',
+        r'chol[:\s]+(\d+\.?\d*)',
+        r't\.chol[:\s]+(\d+\.?\d*)'
+    ],
+    'hdl': [
+        r'hdl[:\s-]+cholesterol[:\s]+(\d+\.?\d*)',
+        r'hdl[:\s]+(\d+\.?\d*)',
+        r'hdl-c[:\s]+(\d+\.?\d*)'
+    ],
+    'ldl': [
+        r'ldl[:\s-]+cholesterol[:\s]+(\d+\.?\d*)',
+        r'ldl[:\s]+(\d+\.?\d*)',
+        r'ldl-c[:\s]+(\d+\.?\d*)'
+    ],
+    'triglycerides': [
+        r'triglycerides[:\s]+(\d+\.?\d*)',
+        r'trig[:\s]+(\d+\.?\d*)',
+        r'tg[:\s]+(\d+\.?\d*)'
+    ],
+    'hemoglobin': [
+        r'hemoglobin[:\s]+(\d+\.?\d*)',
+        r'haemoglobin[:\s]+(\d+\.?\d*)',
+        r'hgb[:\s]+(\d+\.?\d*)',
+        r'hb[:\s]+(\d+\.?\d*)'
+    ],
+    'wbc': [
+        r'white\s+blood\s+cell[s]?[:\s]+(\d+\.?\d*)',
+        r'wbc[:\s]+(\d+\.?\d*)',
+        r'leukocyte[s]?[:\s]+(\d+\.?\d*)',
+        r'tc[:\s]+(\d+\.?\d*)'
+    ],
+    'rbc': [
+        r'red\s+blood\s+cell[s]?[:\s]+(\d+\.?\d*)',
+        r'rbc[:\s]+(\d+\.?\d*)',
+        r'erythrocyte[s]?[:\s]+(\d+\.?\d*)'
+    ],
+    'platelets': [
+        r'platelet[s]?[:\s]+(\d+\.?\d*)',
+        r'plt[:\s]+(\d+\.?\d*)',
+        r'thrombocyte[s]?[:\s]+(\d+\.?\d*)'
+    ],
+    'creatinine': [
+        r'creatinine[:\s]+(\d+\.?\d*)',
+        r'creat[:\s]+(\d+\.?\d*)',
+        r'cr[:\s]+(\d+\.?\d*)'
+    ],
+    'alt': [
+        r'alt[:\s]+(\d+\.?\d*)',
+        r'sgpt[:\s]+(\d+\.?\d*)',
+        r'alanine\s+aminotransferase[:\s]+(\d+\.?\d*)'
+    ],
+    'ast': [
+        r'ast[:\s]+(\d+\.?\d*)',
+        r'sgot[:\s]+(\d+\.?\d*)',
+        r'aspartate\s+aminotransferase[:\s]+(\d+\.?\d*)'
+    ]
+}
+
+
+def is_reasonable(test_name, value):
+    if test_name in REASONABLE_RANGES:
+        min_val, max_val = REASONABLE_RANGES[test_name]
+        return min_val <= value <= max_val
+    return True
+
+
+def legacy_parse(text, patterns=LEGACY_PATTERNS):
+    """The previous parse_lab_values: every pattern searched over the whole text"""
+    results = {}
+    text_lower = text.lower()
+    for test_name, pattern_list in patterns.items():
+        for pattern in pattern_list:
+            match = re.search(pattern, text_lower)
+            if match:
+                value = float(match.group(1))
+                if is_reasonable(test_name, value):
+                    results[test_name] = value
+                    break
+    return results
+
+
+NOISE = ['CITY LAB REPORT', 'Patient: John Doe', 'Age: 45 Sex: M', 'Sample collected 08:30',
+         'Referred by Dr. Smith', 'Method: enzymatic', 'Page 1 of 2', 'Reference interval']
+
+
+# Texts with a synonym repeated in singular and plural form, colons between
+# the words of a label, and an abbreviation the old patterns matched mid-word
+EDGE_CASES = [
+    'white blood cell\n5\n120\nwhite blood cells\n15000',
+    'WBC 5\nwhite blood cells: 7000\nwhite blood cell 8000',
+    'platelets 10\nplatelet: 250000\nthrombocytes 300000',
+    'red blood cells 2.0\nerythrocyte 4.8\nred blood cell 5.1',
+    'LDL: cholesterol 130',
+    'hdl:cholesterol: 45',
+    'SCr: 1.1'
+]
+
+
+def spellings(label):
+    """The texts a synonym stands for ('cell(s)' is 'cell' and 'cells')"""
+    return [label[:-3], label[:-3] + 's'] if label.endswith('(s)') else [label]
+
+
+def random_report(rng):
+    """OCR-like text of one report"""
+    lines = rng.sample(NOISE, 3)
+    for test, labels in DEFAULT_SYNONYMS.items():
+        if rng.random() < 0.3:
+            continue
+        label = rng.choice(spellings(rng.choice(labels)))
+        label = rng.choice([label, label.upper(), label.title(), label.replace(' ', '  ')])
+        low, high = REASONABLE_RANGES[test]
+        value = rng.uniform(low * 0.5, high * 1.2)
+        value = f"{value:.1f}" if high < 100 else f"{value:.0f}"
+        lines.append(f"{label}{rng.choice([': ', ' ', ':', ' : '])}{value} {rng.choice(['mg/dL', 'U/L', ''])}")
+    rng.shuffle(lines)
+    return '\n'.join(lines)
+
+
+def extra_tests(count):
+    """Synthetic tests with two synonyms each, as lab_test_database.json could define"""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    synonyms = {}
+    for i in range(count):
+        name = letters[i % 26] + letters[(i // 26) % 26] + letters[(i // 676) % 26]
+        synonyms[f'test_{name}'] = [f'{name}ase level', f'serum {name}in']
+    return synonyms
+
+
+def throughput(parse, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(text)
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed * 1000, len(text) / elapsed / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reports', type=int, default=2000)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    value_parser = LabValueParser()
+
+    print("=" * 72)
+    print(f"Parity on {args.reports} random reports")
+    print("=" * 72)
+    mismatches = 0
+    for text in EDGE_CASES + [random_report(rng) for _ in range(args.reports)]:
+        expected, actual = legacy_parse(text), value_parser.parse(text, accept=is_reasonable)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  MISMATCH\n    legacy: {expected}\n    new:    {actual}\n    text:   {text!r}")
+    total = len(EDGE_CASES) + args.reports
+    print(f"  {total - mismatches}/{total} identical (including {len(EDGE_CASES)} edge cases)")
+
+    print()
+    print("=" * 72)
+    print("Throughput (ms per text, MB/s)")
+    print("=" * 72)
+    single = random_report(rng)
+    # Values only on the last page: the previous parser scans the whole text per pattern
+    large = '\n'.join(rng.sample(NOISE, 5)[0] * 8 for _ in range(args.pages * 40)) + '\n' + single
+    for name, text, repeat in (('one report', single, 2000), (f'{args.pages} pages', large, 5)):
+        legacy_ms, legacy_mbs = throughput(legacy_parse, text, repeat)
+        new_ms, new_mbs = throughput(lambda t: value_parser.parse(t, accept=is_reasonable), text, repeat)
+        print(f"  {name:<12} legacy {legacy_ms:9.3f} ms ({legacy_mbs:6.1f} MB/s)   "
+              f"single-pass {new_ms:9.3f} ms ({new_mbs:6.1f} MB/s)")
+
+    print()
+    print("=" * 72)
+    print(f"Scaling with the number of tests ({args.pages} pages, ms per text)")
+    print("=" * 72)
+    for count in (0, 100, 500):
+        extra = extra_tests(count)
+        patterns = dict(LEGACY_PATTERNS)
+        for test, labels in extra.items():
+            patterns[test] = [r'\s+'.join(map(re.escape, label.split())) + r'[:\s]+(\d+\.?\d*)'
+                              for label in labels]
+        scaled_parser = LabValueParser(extra_synonyms=extra)
+        legacy_ms, _ = throughput(lambda t: legacy_parse(t, patterns), large, 2)
+        new_ms, _ = throughput(lambda t: scaled_parser.parse(t, accept=is_reasonable), large, 2)
+        print(f"  +{count:<4} tests  legacy {legacy_ms:9.1f} ms   single-pass {new_ms:9.1f} ms")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
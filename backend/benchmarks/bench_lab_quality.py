@@ -0,0 +1,93 @@
+"""
+Benchmark the lab report quality gate and check which gate each test page
+trips.
+
+Pages are synthetic 300 dpi A4 scans: readable reports with many or only a
+few lines of text (which must pass), and pages that are dark, washed out,
+flat grey, blurry, tiny or not a document at all (which must be rejected by
+the right gate).
+
+Usage: python backend/benchmarks/bench_lab_quality.py [--repeats 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.lab_quality import QualityGate
+
+TESTS = ['Glucose', 'Total Cholesterol', 'HDL Cholesterol', 'LDL Cholesterol', 'Triglycerides', 'Hemoglobin',
+         'WBC', 'RBC', 'Platelets', 'Creatinine', 'ALT', 'AST', 'Sodium', 'Potassium', 'Calcium']
+
+
+def report(lines, ink=25, paper=250, seed=0):
+    """Grayscale A4 page at 300 dpi with a title and ``lines`` result lines"""
+    rng = np.random.default_rng(seed)
+    img = np.full((3508, 2480), paper, np.uint8)
+    cv2.putText(img, 'CITY MEDICAL LABORATORY', (200, 300), cv2.FONT_HERSHEY_SIMPLEX, 2.5, ink, 5)
+    for i in range(lines):
+        text = f'{TESTS[i % len(TESTS)]}: {rng.integers(10, 300)} mg/dL   ref 70 - 110'
+        cv2.putText(img, text, (200, 500 + i * 180), cv2.FONT_HERSHEY_SIMPLEX, 1.6, ink, 3)
+    return np.clip(img + rng.normal(0, 2, img.shape), 0, 255).astype(np.uint8)
+
+
+def corpus():
+    """(name, grayscale page, expected gate or None)"""
+    dense = report(15)
+    # A snapshot of something else: shaded background with large objects
+    rng = np.random.default_rng(1)
+    y, x = np.mgrid[0:3000, 0:4000]
+    photo = (60 + 120 * x / 4000 + 40 * np.sin(y / 400)).astype(np.uint8)
+    for _ in range(15):
+        center = (int(rng.integers(0, 4000)), int(rng.integers(0, 3000)))
+        cv2.circle(photo, center, int(rng.integers(150, 600)), int(rng.integers(0, 255)), -1)
+    photo = np.clip(photo + rng.normal(0, 3, photo.shape), 0, 255).astype(np.uint8)
+    return [
+        ('dense report (15 lines)', dense, None),
+        ('sparse report (8 lines)', report(8), None),
+        ('sparse report (3 lines)', report(3), None),
+        ('dim report', report(15, ink=10, paper=150), None),
+        ('too dark', (dense * 0.2).astype(np.uint8), 'too_dark'),
+        ('washed out, sparse', report(3, ink=238, paper=252), 'overexposed'),
+        ('washed out', report(15, ink=240, paper=254), 'overexposed'),
+        ('flat grey', report(15, ink=170, paper=200), 'low_contrast'),
+        ('light grey, not overexposed', report(3, ink=200, paper=226), 'low_contrast'),
+        ('blurry', cv2.GaussianBlur(dense, (0, 0), 10), 'blurry'),
+        ('tiny', cv2.resize(dense, (250, 354), interpolation=cv2.INTER_AREA), 'too_small'),
+        ('photo, not a document', photo, 'not_a_document')
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    gate = QualityGate()
+    print("=" * 72)
+    print(f"Quality gate (contrast threshold {gate.thresholds.min_contrast:g})")
+    print("=" * 72)
+    ok = True
+    for name, page, expected in corpus():
+        result = gate.check(page)
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            gate.check(page)
+        check_ms = (time.perf_counter() - start) / args.repeats * 1000
+        correct = result['gate'] == expected
+        ok = ok and correct
+        metrics = result['metrics']
+        print(f"  {name:<28} {str(result['gate'] or 'passed'):<15} {'ok' if correct else 'WRONG':<6}"
+              f"contrast {metrics['contrast']:6.1f}  brightness {metrics['brightness']:6.1f}  {check_ms:5.1f} ms")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark per-request response assembly with and without the fragment cache.
+
+Each analyzer is measured twice: once with caching disabled (every request
+rebuilds the text) and once with the default cache (a dictionary lookup).
+
+Usage: python backend/benchmarks/bench_response_assembly.py [--iterations 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.skin_analyzer import SkinAnalyzer
+from models.lab_analyzer import LabAnalyzer
+from models.sound_analyzer import SoundAnalyzer
+from utils.response_cache import FragmentCache, fragment_cache_stats
+
+
+def timed(func, iterations):
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def report(name, uncached, cached):
+    print(f"  {name:<38} {uncached:9.2f} us -> {cached:7.2f} us   ({uncached / cached:6.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    print("=" * 72)
+    print("Response assembly: uncached builder -> cached fragment (per request)")
+    print("=" * 72)
+
+    analyzers = {}
+    for cached in (False, True):
+        skin, lab, sound = SkinAnalyzer(), LabAnalyzer(), SoundAnalyzer()
+        if not cached:
+            for obj in (skin, lab, sound):
+                obj._fragment_cache = FragmentCache(maxsize=0)
+        analyzers[cached] = (skin, lab, sound)
+
+    diagnoses = list(analyzers[True][0].diseases.values())
+    severities = ['mild', 'moderate', 'severe']
+
+    def skin_request(skin, i):
+        diagnosis = diagnoses[i % len(diagnoses)]
+        skin._get_comprehensive_treatment(diagnosis, severities[i % len(severities)], [])
+        skin._get_symptoms_for_condition(diagnosis)
+        skin._get_recommendations(diagnosis)
+
+    panels = [
+        [{'test': 'glucose', 'status': 'high', 'value': 180, 'normal_range': '70-100'}],
+        [{'test': 'cholesterol', 'status': 'high', 'value': 240, 'normal_range': '0-200'},
+         {'test': 'ldl', 'status': 'high', 'value': 160, 'normal_range': '0-100'}],
+        [{'test': 'hemoglobin', 'status': 'low', 'value': 10.5, 'normal_range': '12-17'},
+         {'test': 'wbc', 'status': 'high', 'value': 14000, 'normal_range': '4000-11000'},
+         {'test': 'alt', 'status': 'high', 'value': 90, 'normal_range': '7-56'}]
+    ]
+
+    # Every report has its own values; only the tests and status bands repeat
+    reports = [[dict(item, value=round(item['value'] * (1 + (i % 97) / 1000), 1))
+                for item in panels[i % len(panels)]] for i in range(n)]
+
+    def lab_request(lab, i):
+        panel = reports[i]
+        lab._get_treatment(panel)
+        lab._get_recommendations(panel)
+
+    conditions = list(analyzers[True][2].conditions.values())
+
+    def sound_request(sound, i):
+        sound._get_recommendations(conditions[i % len(conditions)])
+
+    for index, (name, request) in enumerate((
+            ('SkinAnalyzer treatment+symptoms+recs', skin_request),
+            ('LabAnalyzer treatment+recs', lab_request),
+            ('SoundAnalyzer recs', sound_request))):
+        report(name,
+               timed(lambda i: request(analyzers[False][index], i), n),
+               timed(lambda i: request(analyzers[True][index], i), n))
+
+    print()
+    for name, obj in zip(('skin', 'lab', 'sound'), analyzers[True]):
+        print(f"  {name} cache: {fragment_cache_stats(obj)}")
+
+
+if __name__ == '__main__':
+    main()
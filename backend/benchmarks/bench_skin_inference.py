@@ -0,0 +1,93 @@
+"""
+Benchmark the skin model CPU runtime with and without micro-batching.
+
+Uses a small randomly initialised NumPy model, so it runs on any CPU-only
+machine without TensorFlow or ONNX Runtime installed. Each setting is the
+best of a few runs; throughput is compared with max_batch=1. A batch larger
+than the number of concurrent clients never fills up, so every batch waits
+out max_wait_ms. A backend that stalls must time out rather than block.
+
+Usage: python backend/benchmarks/bench_skin_inference.py [--requests 512] [--clients 16] [--repeats 3]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.skin_inference import InferenceBackend, MicroBatcher, NumpyBackend
+
+
+class StalledBackend(InferenceBackend):
+    """A backend whose forward pass never finishes in time"""
+    name = 'stalled'
+
+    def predict(self, batch):
+        time.sleep(5)
+        return np.zeros((len(batch), 1), dtype=np.float32)
+
+
+def run(backend, requests, clients, max_batch_size, max_wait_ms):
+    """Fire ``requests`` single-image predictions from ``clients`` threads"""
+    batcher = MicroBatcher(backend, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    rng = np.random.default_rng(1)
+    samples = rng.random((clients, 224, 224, 3), dtype=np.float32)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(lambda i: batcher.predict(samples[i % clients]), range(requests)))
+    elapsed = time.perf_counter() - start
+    batcher.close()
+
+    avg_batch = batcher.stats['samples'] / max(1, batcher.stats['batches'])
+    return requests / elapsed, avg_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=512)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Skin inference runtime benchmark (random NumPy model)")
+    print("=" * 60)
+
+    for quantize in (False, True):
+        backend = NumpyBackend.random(quantize=quantize)
+
+        # Parity: batched rows must match single-sample predictions
+        batch = np.random.default_rng(2).random((4, 224, 224, 3), dtype=np.float32)
+        single = np.concatenate([backend.predict(batch[i:i + 1]) for i in range(4)])
+        assert np.allclose(backend.predict(batch), single, atol=1e-5)
+
+        label = 'int8' if quantize else 'fp32'
+        baseline = None
+        for max_batch_size in (1, 2, 4, 8, 32):
+            throughput, avg_batch = max(run(backend, args.requests, args.clients, max_batch_size, args.max_wait_ms)
+                                        for _ in range(args.repeats))
+            baseline = baseline or throughput
+            print(f"  {label}  max_batch={max_batch_size:<3} "
+                  f"{throughput:8.1f} req/s   avg batch {avg_batch:5.1f}   {throughput / baseline:5.2f}x")
+
+    batcher = MicroBatcher(StalledBackend(), timeout_seconds=0.2)
+    start = time.perf_counter()
+    try:
+        batcher.predict(np.zeros((224, 224, 3), dtype=np.float32))
+        timed_out = False
+    except TimeoutError:
+        timed_out = True
+    print(f"  Stalled backend: {'timed out' if timed_out else 'DID NOT TIME OUT'} "
+          f"after {(time.perf_counter() - start) * 1000:.0f} ms")
+    if not timed_out:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
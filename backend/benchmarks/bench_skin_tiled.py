@@ -0,0 +1,95 @@
+"""
+Benchmark tiled multi-threaded skin feature extraction against the
+single-pass extraction, and check that both give the same features.
+
+Test images are synthetic skin-like photos (smooth shading, noise and a few
+lesion blobs, some crossing tile borders) at several resolutions.
+
+Usage: python backend/benchmarks/bench_skin_tiled.py [--sizes 2000x1500 4000x3000] [--repeats 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.skin_analyzer import SkinAnalyzer
+
+
+def make_image(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    shade = 40 * np.sin(x / width * 3) * np.cos(y / height * 2)
+    img = np.stack([150 + shade, 160 + shade, 200 + shade], axis=-1)
+    img += rng.normal(0, 6, img.shape)
+    for _ in range(12):
+        cx, cy = rng.uniform(0, width), rng.uniform(0, height)
+        radius = rng.uniform(0.03, 0.12) * min(width, height)
+        cv2.ellipse(img, (int(cx), int(cy)), (int(radius), int(radius * rng.uniform(0.5, 1))),
+                    float(rng.uniform(0, 180)), 0, 360, (90, 80, 170), -1)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def best_ms(func, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['2000x1500', '4000x3000'])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    sys.stdout = open(os.devnull, 'w')
+    analyzer = SkinAnalyzer()
+    sys.stdout = sys.__stdout__
+
+    print("=" * 72)
+    print(f"Skin features: single pass -> {analyzer.tile_size} px tiles on {analyzer.tile_workers} threads")
+    print("=" * 72)
+    ok = True
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split('x'))
+        img = make_image(width, height)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        def single():
+            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+            lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+            return analyzer._extract_advanced_features(img, hsv, lab, gray)
+
+        single_ms, expected = best_ms(single, args.repeats)
+        tiled_ms, features = best_ms(lambda: analyzer._extract_tiled_features(img, gray), args.repeats)
+
+        worst, worst_name = 0.0, None
+        numeric = {}
+        for name, value in expected.items():
+            if isinstance(value, str):
+                ok = ok and features[name] == value
+            elif isinstance(value, dict):
+                numeric.update({f'{name}.{key}': (features[name][key], item) for key, item in value.items()})
+            else:
+                numeric[name] = (features[name], value)
+        for name, (value, reference) in numeric.items():
+            difference = abs(float(value) - float(reference)) / max(abs(float(reference)), 1e-9)
+            if difference > worst:
+                worst, worst_name = difference, name
+        ok = ok and worst < 1e-6
+        print(f"  {size:>10}  {single_ms:8.1f} ms -> {tiled_ms:8.1f} ms ({single_ms / tiled_ms:4.2f}x), "
+              f"max relative difference {worst:.1e}" + (f" ({worst_name})" if worst_name else ''))
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
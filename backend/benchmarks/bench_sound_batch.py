@@ -0,0 +1,113 @@
+"""
+Benchmark batch sound analysis (SoundAnalyzer.analyze_batch) against one
+analyze call per clip, and check that both give the same results.
+
+Test clips are short synthetic recordings of varying length and character
+(quiet breathing, noisy wheeze-like sound, loud low hum, coughs), written as
+WAV files so the whole path including decoding is measured. Throughput is
+reported in clips/s for each number of worker processes, pool startup
+included.
+
+Usage: python backend/benchmarks/bench_sound_batch.py [--clips 512] [--min-seconds 0.3] [--max-seconds 5] [--workers 1 2 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.sound_analyzer import SoundAnalyzer
+
+SR = 22050
+
+
+def make_clip(rng, seconds):
+    t = np.arange(int(seconds * SR)) / SR
+    kind = rng.integers(4)
+    if kind == 0:    # quiet breathing
+        y = 0.01 * rng.standard_normal(t.size)
+    elif kind == 1:  # noisy, high frequency
+        y = 0.08 * rng.standard_normal(t.size)
+    elif kind == 2:  # loud low hum
+        y = 0.2 * np.sin(2 * np.pi * 180 * t) + 0.002 * rng.standard_normal(t.size)
+    else:            # coughs over background noise
+        y = 0.002 * rng.standard_normal(t.size)
+        for start in rng.uniform(0, max(seconds - 0.4, 0.01), size=3):
+            i = int(start * SR)
+            burst = t[:int(0.3 * SR)]
+            y[i:i + burst.size] += (0.3 * np.exp(-burst / 0.08) * rng.standard_normal(burst.size))[:len(y) - i]
+    return y.astype(np.float32)
+
+
+def same_result(a, b):
+    if a.keys() != b.keys() or a['diagnosis'] != b['diagnosis'] or a['confidence'] != b['confidence']:
+        return False
+    if 'audio_features' not in a:
+        return a == b
+    for key, value in a['audio_features'].items():
+        if not np.isclose(value, b['audio_features'][key], rtol=1e-4, atol=1e-7):
+            return False
+    if 'events' in a:
+        return [(e['start'], e['end'], e['diagnosis']) for e in a['events']['items']] \
+            == [(e['start'], e['end'], e['diagnosis']) for e in b['events']['items']]
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clips', type=int, default=512)
+    parser.add_argument('--min-seconds', type=float, default=0.3)
+    parser.add_argument('--max-seconds', type=float, default=5.0)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    sys.stdout = open(os.devnull, 'w')
+    analyzer = SoundAnalyzer()
+    analyzer.warmup()
+    sys.stdout = sys.__stdout__
+
+    print("=" * 72)
+    print(f"Sound analysis of {args.clips} clips of {args.min_seconds:g}-{args.max_seconds:g} s "
+          f"({os.cpu_count()} CPUs)")
+    print("=" * 72)
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(args.clips):
+            paths.append(os.path.join(directory, f'clip{i}.wav'))
+            sf.write(paths[-1], make_clip(rng, rng.uniform(args.min_seconds, args.max_seconds)), SR)
+        # A clip that fails must fail the same way in a batch
+        paths.append(os.path.join(directory, 'missing.wav'))
+
+        sys.stdout = open(os.devnull, 'w')
+        start = time.perf_counter()
+        single = [analyzer.analyze(path) for path in paths]
+        single_s = time.perf_counter() - start
+        sys.stdout = sys.__stdout__
+        print(f"  analyze per clip:        {len(paths) / single_s:7.0f} clips/s")
+
+        for workers in args.workers:
+            sys.stdout = open(os.devnull, 'w')
+            start = time.perf_counter()
+            batched = analyzer.analyze_batch(paths, workers=workers)
+            batch_s = time.perf_counter() - start
+            sys.stdout = sys.__stdout__
+            mismatches = sum(not same_result(a, b) for a, b in zip(single, batched))
+            ok = ok and mismatches == 0 and len(batched) == len(single)
+            print(f"  analyze_batch, {workers:2d} worker{'s' if workers > 1 else ' '}: "
+                  f"{len(paths) / batch_s:7.0f} clips/s ({single_s / batch_s:.2f}x), "
+                  f"{len(paths) - mismatches}/{len(paths)} results identical")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
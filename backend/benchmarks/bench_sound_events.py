@@ -0,0 +1,99 @@
+"""
+Benchmark event-based sound feature extraction against analyzing every
+sample, and check that the detector finds the coughs that were put in.
+
+Test recordings are background noise with synthetic coughs (a sharp noisy
+burst with an exponential decay) at known times. Event extraction time is
+the RMS pass and detection plus features over the events; it should follow
+the number of coughs, not the length of the recording.
+
+Usage: python backend/benchmarks/bench_sound_events.py [--seconds 60 300] [--coughs 0 5 20 60] [--repeats 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.sound_events import EventDetector, frame_rms, extract_event_features
+from models.sound_features import extract_signal_features, frame_features
+
+SR = 22050
+COUGH_SECONDS = 0.35
+
+
+def make_recording(seconds, coughs, seed=0):
+    """Background noise with coughs spread over the recording; returns (y, cough start times)"""
+    rng = np.random.default_rng(seed)
+    y = 0.002 * rng.standard_normal(int(seconds * SR))
+    starts = np.sort(rng.choice(np.arange(1, seconds - 1, 0.75), size=coughs, replace=False))
+    t = np.arange(int(COUGH_SECONDS * SR)) / SR
+    envelope = np.minimum(t / 0.01, 1) * np.exp(-t / 0.08)
+    for start in starts:
+        i = int(start * SR)
+        y[i:i + t.size] += 0.3 * envelope * rng.standard_normal(t.size)
+    return y.astype(np.float32), starts
+
+
+def timed(func, repeats):
+    """Best of ``repeats`` runs in ms, and the result"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def by_events(detector, y):
+    rms = frame_rms(y)
+    events = detector.detect(rms, SR, len(y))
+    return extract_event_features(y, SR, events, rms) if events else extract_signal_features(y, SR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, nargs='+', default=[60, 300])
+    parser.add_argument('--coughs', type=int, nargs='+', default=[0, 5, 20, 60])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    detector = EventDetector()
+    ok = True
+
+    # Also warms up librosa before the timings
+    y, _ = make_recording(10, 5)
+    by_events(detector, y)
+    rms_error = np.max(np.abs(frame_rms(y) - frame_features(y, SR)['rms']))
+    print(f"frame_rms vs framed RMS: max abs difference {rms_error:.1e}")
+    ok = ok and rms_error < 1e-6
+
+    print("=" * 78)
+    print("Sound features: whole recording -> detected events only (ms)")
+    print("=" * 78)
+    print(f"  {'length':>7} {'coughs':>7} {'found':>6} {'event s':>8} {'whole':>9} {'events':>9} {'speedup':>8}")
+    print("  (no events found: the whole recording is analyzed)")
+    for seconds in args.seconds:
+        for coughs in args.coughs:
+            y, starts = make_recording(seconds, coughs)
+            whole_ms, _ = timed(lambda: extract_signal_features(y, SR), args.repeats)
+            event_ms, features = timed(lambda: by_events(detector, y), args.repeats)
+            events = features.get('events', [])
+
+            # Every cough should start inside exactly one event, and nothing else
+            hits = [sum(event['start'] - 0.15 <= start <= event['end'] for event in events) for start in starts]
+            found = len(events) == coughs and all(hit == 1 for hit in hits)
+            ok = ok and found
+            event_seconds = sum(event['end'] - event['start'] for event in events)
+            print(f"  {seconds:6.0f}s {coughs:7d} {len(events):6d} {event_seconds:8.1f} {whole_ms:9.1f} "
+                  f"{event_ms:9.1f} {whole_ms / event_ms:7.1f}x" + ('' if found else '   MISSED'))
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
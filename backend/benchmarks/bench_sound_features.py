@@ -0,0 +1,96 @@
+"""
+Benchmark sound feature extraction from one shared STFT against the
+previous separate librosa feature calls, and check that both agree.
+
+Recordings are synthetic breathing-like signals (noise bursts over a low
+hum) of several lengths; decode time is excluded, only feature extraction
+on the in-memory signal is timed.
+
+Usage: python backend/benchmarks/bench_sound_features.py [--durations 5 30 120] [--repeats 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import librosa
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.sound_features import extract_signal_features
+
+SR = 22050
+
+
+def legacy_features(y, sr):
+    """Previous SoundAnalyzer.extract_features body: one librosa call per feature"""
+    features = {}
+    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+    features['mfcc_mean'] = np.mean(mfccs, axis=1)
+    features['mfcc_std'] = np.std(mfccs, axis=1)
+    features['spectral_centroid_mean'] = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
+    features['spectral_rolloff_mean'] = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
+    features['zcr_mean'] = np.mean(librosa.feature.zero_crossing_rate(y))
+    features['rms_mean'] = np.mean(librosa.feature.rms(y=y))
+    return features
+
+
+def synthetic_recording(seconds, seed):
+    """Breaths: band-limited noise bursts every ~4 s over a quiet 120 Hz hum"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SR)) / SR
+    envelope = np.clip(np.sin(2 * np.pi * t / rng.uniform(3, 5)), 0, None) ** 2
+    noise = np.convolve(rng.standard_normal(t.size), np.ones(8) / 8, mode='same')
+    return (rng.uniform(0.02, 0.2) * envelope * noise + 0.01 * np.sin(2 * np.pi * 120 * t)).astype(np.float32)
+
+
+def timed(func, y, repeats):
+    func(y, SR)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func(y, SR)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def max_relative_error(expected, actual):
+    expected, actual = np.asarray(expected, dtype=np.float64), np.asarray(actual, dtype=np.float64)
+    return float(np.max(np.abs(expected - actual) / np.maximum(np.abs(expected), 1e-6)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--durations', type=float, nargs='+', default=[5, 30, 120], help='seconds')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=1e-4, help='max relative error')
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("Parity: shared STFT vs separate librosa calls (max relative error)")
+    print("=" * 72)
+    worst = {}
+    for seed in range(20):
+        y = synthetic_recording(np.random.default_rng(seed).uniform(0.5, 20), seed)
+        expected, actual = legacy_features(y, SR), extract_signal_features(y, SR)
+        for key in expected:
+            worst[key] = max(worst.get(key, 0.0), max_relative_error(expected[key], actual[key]))
+    for key, error in worst.items():
+        print(f"  {key:<24} {error:.2e}")
+    ok = all(error <= args.tolerance for error in worst.values())
+
+    print("=" * 72)
+    print("Per-recording feature extraction time")
+    print("=" * 72)
+    for seconds in args.durations:
+        y = synthetic_recording(seconds, 0)
+        legacy = timed(legacy_features, y, args.repeats)
+        shared = timed(extract_signal_features, y, args.repeats)
+        print(f"  {seconds:6.0f} s recording   {legacy:8.1f} ms -> {shared:7.1f} ms   ({legacy / shared:4.1f}x)")
+
+    if not ok:
+        print(f"Parity FAILED (tolerance {args.tolerance})")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
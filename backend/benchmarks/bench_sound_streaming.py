@@ -0,0 +1,124 @@
+"""
+Benchmark streaming feature extraction for long recordings: peak memory and
+speed of the whole-signal path against AudioLoader.stream + StreamingFeatures,
+and check that both give the same features.
+
+Test files are synthetic 44.1 kHz mono FLAC breathing recordings, resampled
+to 22.05 kHz for analysis as SoundAnalyzer does. Peak memory is measured with
+tracemalloc (numpy buffers included). The whole-signal path is only run up to
+--whole-max seconds.
+
+Usage: python backend/benchmarks/bench_sound_streaming.py [--minutes 10 60] [--whole-max 600]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.audio_io import AudioLoader
+from models.sound_features import extract_signal_features, StreamingFeatures
+
+NATIVE_RATE = 44100
+
+
+def write_recording(path, seconds, silence=0.0):
+    """Breathing-like noise with a hum, optionally starting with digital silence"""
+    rng = np.random.default_rng(0)
+    with sf.SoundFile(path, 'w', NATIVE_RATE, 1, format='FLAC', subtype='PCM_16') as out:
+        if silence:
+            out.write(np.zeros(int(silence * NATIVE_RATE), dtype=np.float32))
+        for start in range(0, int(seconds * NATIVE_RATE), 60 * NATIVE_RATE):
+            t = np.arange(start, min(start + 60 * NATIVE_RATE, int(seconds * NATIVE_RATE))) / NATIVE_RATE
+            breath = np.clip(np.sin(2 * np.pi * t / 4), 0, None) ** 2 * rng.standard_normal(t.size) * 0.1
+            out.write((breath + 0.01 * np.sin(2 * np.pi * 120 * t)).astype(np.float32))
+
+
+def whole(loader, path):
+    y, sr = loader.load(path)
+    return extract_signal_features(y, sr)
+
+
+def streamed(loader, path, block_seconds):
+    blocks, sr = loader.stream(path, block_seconds)
+    stream = StreamingFeatures(sr, segment_seconds=30)
+    for block in blocks:
+        stream.update(block)
+    return stream.finish()
+
+
+def measured(func, *args):
+    """(result, seconds, peak MiB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def max_relative_difference(reference, features):
+    worst = {}
+    for key, value in reference.items():
+        value = np.asarray(value, dtype=np.float64)
+        other = np.asarray(features[key], dtype=np.float64)
+        worst[key] = float(np.max(np.abs(value - other) / np.maximum(np.abs(value), 1e-6)))
+    return worst
+
+
+def check_parity(loader, directory, block_seconds, tolerance):
+    """Streaming vs whole-signal features on short recordings, one with a silent start"""
+    ok = True
+    print("Parity (max relative difference, streamed vs whole signal):")
+    for name, seconds, silence in (('60 s', 60, 0.0), ('60 s, 5 s silent start', 55, 5.0)):
+        path = os.path.join(directory, 'parity.flac')
+        write_recording(path, seconds, silence)
+        worst = max_relative_difference(whole(loader, path), streamed(loader, path, block_seconds))
+        # MFCCs only match up to the log-mel floor (see StreamingFeatures)
+        passed = all(diff <= (tolerance['mfcc'] if key.startswith('mfcc') else tolerance['other'])
+                     for key, diff in worst.items())
+        ok = ok and passed
+        print(f"  {name:<24} " + ', '.join(f"{key} {diff:.1e}" for key, diff in worst.items())
+              + ('' if passed else '   MISMATCH'))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--minutes', type=float, nargs='+', default=[10, 60])
+    parser.add_argument('--whole-max', type=float, default=600, help='longest recording (s) run whole')
+    parser.add_argument('--block-seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    loader = AudioLoader(resample='soxr_hq')
+    with tempfile.TemporaryDirectory() as directory:
+        print("=" * 72)
+        print("Streaming sound features")
+        print("=" * 72)
+        ok = check_parity(loader, directory, args.block_seconds, {'mfcc': 1e-2, 'other': 1e-3})
+
+        print(f"\n  {'length':>8} {'path':<8} {'time':>9} {'x realtime':>11} {'peak memory':>13}")
+        for minutes in args.minutes:
+            seconds = minutes * 60
+            path = os.path.join(directory, 'long.flac')
+            write_recording(path, seconds)
+            runs = [('stream', streamed, (loader, path, args.block_seconds))]
+            if seconds <= args.whole_max:
+                runs.insert(0, ('whole', whole, (loader, path)))
+            for name, func, func_args in runs:
+                _, elapsed, peak = measured(func, *func_args)
+                print(f"  {minutes:6.0f} m {name:<8} {elapsed:8.1f}s {seconds / elapsed:10.0f}x {peak:10.1f} MiB")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark the first sound analysis in a fresh process against steady state,
+with and without SoundAnalyzer.warmup at startup.
+
+Every measurement runs in a new Python process, as a freshly started worker
+would. NUMBA_CACHE_DIR points at an empty directory for the first process and
+is reused by the later ones, so the first row also shows what the on-disk
+cache saves.
+
+Usage: python backend/benchmarks/bench_sound_warmup.py [--seconds 30] [--requests 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(path, warmup, requests):
+    """Runs in the fresh process: startup, optional warmup, then timed requests"""
+    sys.path.insert(0, BACKEND)
+    sys.stdout = open(os.devnull, 'w')
+    start = time.perf_counter()
+    from models.sound_analyzer import SoundAnalyzer
+    analyzer = SoundAnalyzer()
+    warmup_seconds = analyzer.warmup() if warmup else 0.0
+    startup = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        result = analyzer.analyze(path)
+        latencies.append(time.perf_counter() - start)
+        assert 'error' not in result, result['error']
+    sys.stdout = sys.__stdout__
+    print(json.dumps({'startup': startup, 'warmup': warmup_seconds, 'latencies': latencies}))
+
+
+def run_child(path, warmup, requests, cache_dir):
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+    command = [sys.executable, os.path.abspath(__file__), '--child', path, '--requests', str(requests)]
+    if warmup:
+        command.append('--warmup')
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def write_recording(path, seconds):
+    import numpy as np
+    import soundfile as sf
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * 44100)) / 44100
+    y = 0.005 * rng.standard_normal(t.size) + np.clip(np.sin(2 * np.pi * t / 4), 0, None) ** 2 \
+        * 0.1 * rng.standard_normal(t.size)
+    sf.write(path, y.astype(np.float32), 44100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--requests', type=int, default=5)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--warmup', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.warmup, args.requests)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'recording.wav')
+        write_recording(path, args.seconds)
+        cache_dir = os.path.join(directory, 'numba_cache')
+
+        print("=" * 78)
+        print(f"Sound analysis of a {args.seconds:.0f} s recording in a fresh process (ms)")
+        print("=" * 78)
+        print(f"  {'startup':<34} {'startup':>9} {'warmup':>8} {'1st request':>12} {'steady':>8}")
+        runs = (('no warmup, empty numba cache', False),
+                ('no warmup, numba cache on disk', False),
+                ('warmup, numba cache on disk', True))
+        for name, warmup in runs:
+            timings = run_child(path, warmup, args.requests, cache_dir)
+            latencies = [ms * 1000 for ms in timings['latencies']]
+            steady = sorted(latencies[1:])[len(latencies[1:]) // 2] if len(latencies) > 1 else float('nan')
+            print(f"  {name:<34} {timings['startup'] * 1000:9.0f} {timings['warmup'] * 1000:8.0f} "
+                  f"{latencies[0]:12.1f} {steady:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark chatbot symptom detection (SymptomMatcher) against the previous
+substring scan over every symptom, and check it against a per-phrase regex
+search with the same word-boundary rules.
+
+Messages are short chat messages mentioning a few symptoms, synonyms,
+inflected forms and words that merely contain a symptom ('crash'). The
+vocabulary is the bundled disease database, then the same padded with
+thousands of generated symptom terms.
+
+Usage: python backend/benchmarks/bench_symptom_matcher.py [--terms 1000 10000 50000] [--iterations 2000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.chatbot import MedicalChatbot
+from models.symptom_matcher import SUFFIXES, normalize_symptom
+
+# Disease symptoms as setup_project.py writes them
+DISEASES = [
+    ('Common Cold', ['fever', 'cough', 'runny nose', 'sore throat', 'sneezing', 'congestion']),
+    ('Influenza (Flu)', ['high fever', 'severe headache', 'muscle pain', 'fatigue', 'cough', 'sore throat']),
+    ('Pneumonia', ['high fever', 'chest pain', 'shortness of breath', 'cough with phlegm', 'fatigue']),
+    ('Asthma', ['shortness of breath', 'wheezing', 'chest tightness', 'cough']),
+    ('Bronchitis', ['persistent cough', 'mucus production', 'fatigue', 'chest discomfort']),
+    ('Gastroenteritis', ['nausea', 'vomiting', 'diarrhea', 'stomach pain', 'fever']),
+    ('Migraine', ['severe headache', 'nausea', 'sensitivity to light', 'visual disturbances']),
+    ('Hypertension', ['headache', 'dizziness', 'chest pain', 'shortness of breath']),
+    ('Type 2 Diabetes', ['increased thirst', 'frequent urination', 'fatigue', 'blurred vision']),
+    ('Urinary Tract Infection', ['burning urination', 'frequent urination', 'lower abdominal pain', 'cloudy urine'])
+]
+
+MESSAGES = [
+    "i have had a high fever and a sore throat since yesterday",
+    "coughing all night, headaches in the morning and i feel tired",
+    "my car had a crash and now my back_pain is worse",
+    "short of breath when climbing stairs, some chest-pain too",
+    "nauseous after lunch, threw up twice, stomach ache",
+    "itchy rash on my arm",
+    "what should i take for a runny nose and sneezing",
+    "i feel fine, just checking in"
+]
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'xe', 'zu', 'bra', 'dri', 'pho', 'stu']
+
+
+def build_database(terms, seed=0):
+    """The bundled diseases plus ``terms`` generated symptom names spread over generated diseases"""
+    rng = random.Random(seed)
+    diseases = [{'name': name, 'symptoms': symptoms, 'medications': [], 'severity': 'mild'}
+                for name, symptoms in DISEASES]
+    generated = set()
+    while len(generated) < terms:
+        words = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        generated.add(' '.join(words))
+    generated = sorted(generated)
+    for i in range(0, len(generated), 5):
+        diseases.append({'name': f'Condition {i // 5}', 'symptoms': generated[i:i + 5], 'medications': []})
+    return {'diseases': diseases}, generated
+
+
+def legacy_detect(symptoms_database, message):
+    """Previous MedicalChatbot._detect_symptoms"""
+    detected = []
+    for symptom in symptoms_database.keys():
+        if symptom in message:
+            detected.append(symptom)
+    return detected
+
+
+def reference_detect(matcher, patterns, message):
+    """One regex search per phrase, with the matcher's word-boundary rules"""
+    text = normalize_symptom(message)
+    found = set()
+    for pattern, indexes in patterns:
+        if pattern.search(text):
+            found.update(indexes)
+    return [matcher.symptoms[index] for index in sorted(found)]
+
+
+def reference_patterns(matcher):
+    """Per-phrase regexes, spelled out from the automaton's trie"""
+    spelled = {}
+    stack = [(0, '')]
+    while stack:
+        state, prefix = stack.pop()
+        for char, child in matcher._goto[state].items():
+            stack.append((child, prefix + char))
+        for length, indexes in matcher._outputs[state]:
+            if length == len(prefix):
+                spelled[prefix] = indexes
+    suffixes = '|'.join(SUFFIXES)
+    return [(re.compile(rf'(?<![^\W_]){re.escape(phrase)}(?:{suffixes})?(?![^\W_])'), indexes)
+            for phrase, indexes in spelled.items()]
+
+
+def timed(func, messages, iterations):
+    """Mean microseconds per message"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(messages[i % len(messages)])
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--terms', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='generated symptom terms added to the database')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    sys.stdout = open(os.devnull, 'w')
+    chatbot = MedicalChatbot()
+    sys.stdout = sys.__stdout__
+
+    ok = True
+    for terms in [0] + args.terms:
+        chatbot.disease_database, generated = build_database(terms)
+        chatbot.symptoms_database = chatbot._build_symptoms_database(chatbot.disease_database)
+        start = time.perf_counter()
+        chatbot.symptom_matcher = chatbot._build_symptom_matcher(chatbot.symptoms_database, chatbot.disease_database)
+        build_ms = (time.perf_counter() - start) * 1000
+        matcher = chatbot.symptom_matcher
+
+        rng = random.Random(1)
+        messages = MESSAGES + [f"{message} and {' and '.join(rng.sample(generated, 2))}"
+                               for message in MESSAGES if generated]
+
+        print("=" * 72)
+        print(f"Symptom detection: substring scan -> automaton "
+              f"({len(chatbot.symptoms_database)} symptoms, {matcher.phrase_count} phrases)")
+        print("=" * 72)
+        patterns = reference_patterns(matcher)
+        mismatches = [message for message in messages
+                      if chatbot._detect_symptoms(message) != reference_detect(matcher, patterns, message)]
+        ok = ok and not mismatches
+        print(f"  Parity with per-phrase regex: {len(messages) - len(mismatches)}/{len(messages)}")
+        for message in mismatches:
+            print(f"    MISMATCH: {message!r}")
+        print(f"  e.g. {MESSAGES[2]!r}")
+        print(f"    substring scan: {legacy_detect(chatbot.symptoms_database, MESSAGES[2])}")
+        print(f"    automaton:      {chatbot._detect_symptoms(MESSAGES[2])}")
+
+        iterations = max(args.iterations * 1000 // max(len(chatbot.symptoms_database), 1000), 50)
+        legacy = timed(lambda message: legacy_detect(chatbot.symptoms_database, message), messages, iterations)
+        matched = timed(chatbot._detect_symptoms, messages, args.iterations)
+        print(f"  Automaton built in {build_ms:.1f} ms")
+        print(f"  {'per message':<22} {legacy:9.1f} us -> {matched:6.1f} us   ({legacy / matched:7.1f}x)")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
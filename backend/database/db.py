@@ -13,53 +13,128 @@ def get_db():
 
 def init_db():
     """Initialize the database with schema"""
-    if not os.path.exists(DATABASE):
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                name TEXT,
-                age INTEGER,
-                address TEXT,
-                profile_image TEXT,
-                google_id TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Health records table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS health_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                record_type TEXT NOT NULL,
-                diagnosis TEXT,
-                treatment TEXT,
-                severity TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Chat history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                message TEXT NOT NULL,
-                response TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+    is_new = not os.path.exists(DATABASE)
+    conn = sqlite3.connect(DATABASE)
+    cursor = conn.cursor()
+    
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            name TEXT,
+            age INTEGER,
+            address TEXT,
+            profile_image TEXT,
+            google_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Health records table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS health_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            record_type TEXT NOT NULL,
+            diagnosis TEXT,
+            treatment TEXT,
+            severity TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Chat history table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Perceptual hashes of analyzed skin images (near-duplicate cache)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS skin_image_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            phash TEXT NOT NULL,
+            analyzer_version TEXT NOT NULL DEFAULT '',
+            features TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # One row per 8-bit band of each hash, for Hamming-distance lookups
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS skin_image_cache_bands (
+            cache_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            band INTEGER NOT NULL,
+            FOREIGN KEY (cache_id) REFERENCES skin_image_cache (id)
+        )
+    ''')
+    # Databases created before results were tied to an analyzer version; their
+    # entries get an empty version and are never reused
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(skin_image_cache)')]
+    if 'analyzer_version' not in columns:
+        cursor.execute("ALTER TABLE skin_image_cache ADD COLUMN analyzer_version TEXT NOT NULL DEFAULT ''")
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_skin_cache_user ON skin_image_cache (user_id)'
+    )
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_skin_cache_bands ON skin_image_cache_bands (user_id, band)'
+    )
+    
+    # Raw OCR output of lab report pages (zlib-compressed), for re-parsing without OCR
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lab_ocr_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            health_record_id INTEGER,
+            user_id INTEGER NOT NULL,
+            page_index INTEGER NOT NULL,
+            source TEXT,
+            page INTEGER,
+            image_hash TEXT NOT NULL,
+            ocr_version TEXT NOT NULL,
+            text BLOB NOT NULL,
+            tsv BLOB,
+            lines BLOB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (health_record_id) REFERENCES health_records (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_lab_ocr_hash ON lab_ocr_results (image_hash, ocr_version)'
+    )
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_lab_ocr_record ON lab_ocr_results (health_record_id, page_index)'
+    )
+    
+    # Files already handled by the bulk lab ingestion tool (resume checkpoint)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lab_ingest_checkpoint (
+            path TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            health_record_id INTEGER,
+            status TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (health_record_id) REFERENCES health_records (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    conn.commit()
+    conn.close()
+    if is_new:
         print("Database initialized successfully!")
 
 def close_connection(exception):
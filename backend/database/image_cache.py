@@ -0,0 +1,93 @@
+import json
+import os
+
+# 64-bit hashes are split into 8 bands of 8 bits. Two hashes within Hamming
+# distance 7 must share at least one band exactly (pigeonhole), so an indexed
+# equality lookup on the bands finds every candidate for thresholds below 8.
+HASH_BITS = 64
+BAND_BITS = 8
+NUM_BANDS = HASH_BITS // BAND_BITS
+
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits between two integer hashes"""
+    return bin(hash_a ^ hash_b).count('1')
+
+
+def hash_bands(phash):
+    """Band keys for a hash: band number in the high bits, band value in the low bits"""
+    mask = (1 << BAND_BITS) - 1
+    return [(i << BAND_BITS) | ((phash >> (i * BAND_BITS)) & mask) for i in range(NUM_BANDS)]
+
+
+class SkinImageCache:
+    """Per-user near-duplicate cache of skin analysis results keyed by perceptual hash
+
+    Entries are only reused by the analyzer version that stored them and for
+    ``SKIN_CACHE_MAX_AGE_DAYS`` days.
+    """
+
+    def __init__(self, db, max_age_days=None):
+        self.db = db
+        self.max_age_days = max_age_days or float(os.getenv('SKIN_CACHE_MAX_AGE_DAYS', 30))
+
+    def _max_age(self):
+        return f'-{self.max_age_days:g} days'
+
+    def find(self, user_id, phash, threshold, version):
+        """Return the closest earlier entry from this analyzer version within ``threshold`` bits, or None"""
+        if threshold < NUM_BANDS:
+            bands = hash_bands(phash)
+            rows = self.db.execute(
+                'SELECT c.id, c.phash, c.features, c.result, c.created_at FROM skin_image_cache c '
+                'WHERE c.id IN (SELECT cache_id FROM skin_image_cache_bands '
+                f'WHERE user_id = ? AND band IN ({", ".join("?" * len(bands))})) '
+                "AND c.analyzer_version = ? AND c.created_at >= datetime('now', ?)",
+                (user_id, *bands, version, self._max_age())
+            ).fetchall()
+        else:
+            # Band index cannot guarantee recall this far out; scan the user's hashes
+            rows = self.db.execute(
+                'SELECT id, phash, features, result, created_at FROM skin_image_cache '
+                "WHERE user_id = ? AND analyzer_version = ? AND created_at >= datetime('now', ?)",
+                (user_id, version, self._max_age())
+            ).fetchall()
+
+        best = None
+        for row in rows:
+            distance = hamming_distance(phash, int(row[1], 16))
+            if distance <= threshold and (best is None or distance < best['distance']):
+                best = {
+                    'id': row[0],
+                    'distance': distance,
+                    'features': json.loads(row[2]),
+                    'result': json.loads(row[3]),
+                    'created_at': row[4]
+                }
+        return best
+
+    def store(self, user_id, phash, version, features, result):
+        """Save a freshly analyzed image and return its cache id
+
+        The user's entries from other analyzer versions or past the maximum
+        age can never be reused, so they are dropped here.
+        """
+        stale = ("SELECT id FROM skin_image_cache WHERE user_id = ? "
+                 "AND (analyzer_version != ? OR created_at < datetime('now', ?))")
+        params = (user_id, version, self._max_age())
+        self.db.execute(f'DELETE FROM skin_image_cache_bands WHERE cache_id IN ({stale})', params)
+        self.db.execute(f'DELETE FROM skin_image_cache WHERE id IN ({stale})', params)
+
+        cursor = self.db.execute(
+            'INSERT INTO skin_image_cache (user_id, phash, analyzer_version, features, result) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (user_id, f'{phash:016x}', version, json.dumps(features, default=float),
+             json.dumps(result, default=float))
+        )
+        cache_id = cursor.lastrowid
+        self.db.executemany(
+            'INSERT INTO skin_image_cache_bands (cache_id, user_id, band) VALUES (?, ?, ?)',
+            [(cache_id, user_id, band) for band in hash_bands(phash)]
+        )
+        self.db.commit()
+        return cache_id
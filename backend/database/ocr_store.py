@@ -0,0 +1,85 @@
+import json
+import zlib
+
+
+def compress_text(text):
+    return zlib.compress(text.encode('utf-8'), 6) if text is not None else None
+
+
+def decompress_text(blob):
+    return zlib.decompress(blob).decode('utf-8') if blob is not None else None
+
+
+class LabOcrStore:
+    """Compressed raw OCR output of lab report pages, keyed by image hash and OCR config version"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def save_pages(self, health_record_id, user_id, pages, commit=True):
+        """Store the raw OCR of every page of one analyzed report
+
+        ``commit=False`` leaves the rows in the caller's open transaction.
+        """
+        self.db.executemany(
+            'INSERT INTO lab_ocr_results (health_record_id, user_id, page_index, source, page, image_hash, '
+            'ocr_version, text, tsv, lines) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(health_record_id, user_id, page['index'], page['source'], page['page'], page['image_hash'],
+              page['ocr_version'], compress_text(page['text']), compress_text(page.get('tsv')),
+              compress_text(json.dumps(page['lines'])) if page.get('lines') else None)
+             for page in pages]
+        )
+        if commit:
+            self.db.commit()
+
+    def find(self, image_hash, ocr_version, user_id=None):
+        """Latest stored OCR of an image under this OCR configuration, or None
+
+        With ``user_id``, only that user's stored pages are considered.
+        """
+        query = 'SELECT text, tsv, lines FROM lab_ocr_results WHERE image_hash = ? AND ocr_version = ?'
+        params = [image_hash, ocr_version]
+        if user_id is not None:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+        row = self.db.execute(query + ' ORDER BY id DESC LIMIT 1', params).fetchone()
+        if row is None:
+            return None
+        return {
+            'text': decompress_text(row[0]),
+            'tsv': decompress_text(row[1]),
+            'lines': json.loads(decompress_text(row[2])) if row[2] is not None else None
+        }
+
+    def iter_documents(self, ocr_version=None):
+        """Yield (health_record_id, pages) per report, pages still compressed
+
+        Rows are streamed from the cursor in record order. Without
+        ``ocr_version``, each report uses the OCR version it was stored with
+        most recently.
+        """
+        if ocr_version:
+            rows = self.db.execute(
+                'SELECT health_record_id, page_index, text, lines FROM lab_ocr_results '
+                'WHERE ocr_version = ? AND health_record_id IS NOT NULL '
+                'ORDER BY health_record_id, page_index',
+                (ocr_version,)
+            )
+        else:
+            rows = self.db.execute(
+                'SELECT r.health_record_id, r.page_index, r.text, r.lines FROM lab_ocr_results r '
+                'WHERE r.health_record_id IS NOT NULL AND r.ocr_version = ('
+                'SELECT l.ocr_version FROM lab_ocr_results l WHERE l.health_record_id = r.health_record_id '
+                'ORDER BY l.id DESC LIMIT 1) '
+                'ORDER BY r.health_record_id, r.page_index'
+            )
+
+        record_id, pages = None, []
+        for row in rows:
+            if row[0] != record_id and pages:
+                yield record_id, pages
+                pages = []
+            record_id = row[0]
+            pages.append((row[1], row[2], row[3]))
+        if pages:
+            yield record_id, pages
@@ -0,0 +1,193 @@
+"""Audio decoding for sound analysis: float32 mono at a fixed or native rate.
+
+- ``soundfile`` (libsndfile) decodes WAV, FLAC, OGG/Vorbis/Opus and, with
+  libsndfile >= 1.1, MP3 straight to float32
+- ``ffmpeg`` decodes everything else (m4a/aac, webm, ...) through a pipe as
+  raw float32 samples, downmixed and resampled by ffmpeg itself
+- ``librosa.load`` (audioread) is the last resort when ffmpeg is missing
+
+Resampling only happens when the native rate is not one we accept, with a
+configurable resampler (``SOUND_RESAMPLE``, any librosa ``res_type``, or
+``none`` to always keep the native rate).
+
+``stream`` decodes block by block for long recordings, so the whole signal
+never sits in memory; streamed audio is resampled with soxr's streaming
+resampler.
+"""
+import os
+import shutil
+import subprocess
+
+import librosa
+import numpy as np
+import soundfile as sf
+import soxr
+
+# Containers libsndfile cannot read; these go to ffmpeg directly
+FFMPEG_EXTENSIONS = {'m4a', 'aac', 'mp4', 'webm', 'wma', 'amr', '3gp'}
+
+# librosa soxr res_types -> soxr stream quality; other resamplers stream at HQ
+SOXR_QUALITIES = {'soxr_vhq': 'VHQ', 'soxr_hq': 'HQ', 'soxr_mq': 'MQ', 'soxr_lq': 'LQ', 'soxr_qq': 'QQ'}
+
+
+class AudioLoader:
+    """Decode audio files to float32 mono"""
+
+    def __init__(self, sample_rate=None, resample=None, native_rates=None, ffmpeg=None):
+        self.sample_rate = sample_rate or int(os.getenv('SOUND_SAMPLE_RATE', 22050))
+        self.resample = resample or os.getenv('SOUND_RESAMPLE', 'soxr_hq')
+        # Native rates used as they are, besides the target rate itself
+        if native_rates is None:
+            native_rates = [int(rate) for rate in os.getenv('SOUND_NATIVE_RATES', '').split(',') if rate.strip()]
+        self.native_rates = set(native_rates) | {self.sample_rate}
+        self.ffmpeg = ffmpeg or os.getenv('FFMPEG_BINARY') or shutil.which('ffmpeg')
+        self.ffprobe = shutil.which('ffprobe', path=os.path.dirname(self.ffmpeg)) if self.ffmpeg else None
+
+    def target_rate(self, native_rate):
+        """Rate a recording at ``native_rate`` is analyzed at"""
+        if self.resample == 'none' or native_rate in self.native_rates:
+            return native_rate
+        return self.sample_rate
+
+    def _use_soundfile(self, path):
+        ext = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+        return ext not in FFMPEG_EXTENSIONS
+
+    def load(self, path):
+        """Return (samples, sample_rate): float32 mono samples"""
+        if self._use_soundfile(path):
+            try:
+                return self._load_soundfile(path)
+            except (sf.LibsndfileError, RuntimeError):
+                pass  # Not a format libsndfile knows (e.g. an m4a saved as .wav)
+        if self.ffmpeg:
+            return self._load_ffmpeg(path)
+
+        print("⚠️ ffmpeg not found; decoding with librosa/audioread (slow)")
+        sr = None if self.resample == 'none' else self.sample_rate
+        return librosa.load(path, sr=sr, res_type=self.resample if sr else 'soxr_hq')
+
+    def _load_soundfile(self, path):
+        data, native_rate = sf.read(path, dtype='float32', always_2d=True)
+        y = data[:, 0] if data.shape[1] == 1 else data.mean(axis=1)
+        rate = self.target_rate(native_rate)
+        if rate != native_rate:
+            y = librosa.resample(y, orig_sr=native_rate, target_sr=rate, res_type=self.resample)
+        return np.ascontiguousarray(y, dtype=np.float32), rate
+
+    def duration(self, path):
+        """Length of a recording in seconds, or None if it cannot be read without decoding"""
+        if self._use_soundfile(path):
+            try:
+                return sf.info(path).duration
+            except (sf.LibsndfileError, RuntimeError):
+                pass
+        if not self.ffprobe:
+            return None
+        probe = subprocess.run(
+            [self.ffprobe, '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+            capture_output=True, text=True
+        )
+        try:
+            return float(probe.stdout.strip())
+        except ValueError:
+            return None
+
+    def stream(self, path, block_seconds=10.0):
+        """Return (blocks, sample_rate): an iterator of float32 mono blocks
+
+        Blocks hold about ``block_seconds`` of audio at the analysis rate, so
+        memory does not grow with the length of the recording.
+        """
+        if self._use_soundfile(path):
+            try:
+                info = sf.info(path)
+            except (sf.LibsndfileError, RuntimeError):
+                info = None
+            if info is not None:
+                rate = self.target_rate(info.samplerate)
+                return self._stream_soundfile(path, info.samplerate, rate, block_seconds), rate
+        if self.ffmpeg:
+            rate = self._ffmpeg_rate(path)
+            return self._stream_ffmpeg(path, rate, block_seconds), rate
+
+        # audioread cannot stream resampled audio; decode whole and hand out blocks
+        y, rate = self.load(path)
+        size = int(block_seconds * rate)
+        return (y[start:start + size] for start in range(0, len(y), size)), rate
+
+    def resampler(self, native_rate):
+        """Streaming resampler from ``native_rate`` to its analysis rate, or None if not needed"""
+        rate = self.target_rate(native_rate)
+        if rate == native_rate:
+            return None
+        return soxr.ResampleStream(native_rate, rate, 1, dtype='float32',
+                                   quality=SOXR_QUALITIES.get(self.resample, 'HQ'))
+
+    def _stream_soundfile(self, path, native_rate, rate, block_seconds):
+        resampler = self.resampler(native_rate)
+        blocksize = int(block_seconds * native_rate)
+        for data in sf.blocks(path, blocksize=blocksize, dtype='float32', always_2d=True):
+            y = data[:, 0] if data.shape[1] == 1 else data.mean(axis=1)
+            if resampler is not None:
+                y = resampler.resample_chunk(y)
+            yield np.ascontiguousarray(y, dtype=np.float32)
+        if resampler is not None:
+            # Flush the samples still inside the resampler's filter
+            yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+    def _stream_ffmpeg(self, path, rate, block_seconds):
+        command = [self.ffmpeg, '-nostdin', '-v', 'error', '-i', path,
+                   '-vn', '-ac', '1', '-ar', str(rate), '-f', 'f32le', 'pipe:1']
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        blocksize = int(block_seconds * rate) * 4
+        try:
+            while True:
+                data = process.stdout.read(blocksize)
+                if not data:
+                    break
+                # A read can end mid-sample only at the end of the stream
+                yield np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+            stderr = process.stderr.read()
+            if process.wait() != 0:
+                raise RuntimeError(f"ffmpeg could not decode {os.path.basename(path)}: "
+                                   f"{stderr.decode(errors='replace').strip()}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
+
+    def _native_rate_ffmpeg(self, path):
+        """Sample rate of the first audio stream, via ffprobe"""
+        if not self.ffprobe:
+            return None
+        probe = subprocess.run(
+            [self.ffprobe, '-v', 'error', '-select_streams', 'a:0',
+             '-show_entries', 'stream=sample_rate', '-of', 'csv=p=0', path],
+            capture_output=True, text=True
+        )
+        try:
+            return int(probe.stdout.strip())
+        except ValueError:
+            return None
+
+    def _ffmpeg_rate(self, path):
+        """Rate ffmpeg should decode to"""
+        # Only probe when a native rate could be kept; otherwise ffmpeg resamples
+        if self.resample == 'none' or len(self.native_rates) > 1:
+            native_rate = self._native_rate_ffmpeg(path)
+            if native_rate:
+                return self.target_rate(native_rate)
+        return self.sample_rate
+
+    def _load_ffmpeg(self, path):
+        rate = self._ffmpeg_rate(path)
+        command = [self.ffmpeg, '-nostdin', '-v', 'error', '-i', path,
+                   '-vn', '-ac', '1', '-ar', str(rate), '-f', 'f32le', 'pipe:1']
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg could not decode {os.path.basename(path)}: "
+                               f"{result.stderr.decode(errors='replace').strip()}")
+        return np.frombuffer(result.stdout, dtype=np.float32), rate
@@ -2,17 +2,31 @@ import re
 import random
 import os
 import json
+import threading
+from utils.response_cache import FragmentCache, cached_fragment, clear_fragment_cache
+from .symptom_matcher import SymptomMatcher, normalize_symptom, synonyms_from_database
+from .disease_index import DiseaseIndex
 
 class MedicalChatbot:
     def __init__(self):
         self.model_path = 'models_pretrained/chatbot_model.h5'
         self.disease_db_path = 'data/diseases/disease_database.json'
+        self.disease_index_path = 'data/diseases/disease_index.npz'
+        self.retrieval_top_k = int(os.getenv('CHATBOT_RETRIEVAL_TOP_K', 3))
+        self.retrieval_min_score = float(os.getenv('CHATBOT_RETRIEVAL_MIN_SCORE', 1.0))
         
         # Load disease database
         self.disease_database = self._load_disease_database()
         
         # Enhanced Medical knowledge base from loaded data
-        self.symptoms_database = self._build_symptoms_database()
+        self.symptoms_database = self._build_symptoms_database(self.disease_database)
+        self.symptom_matcher = self._build_symptom_matcher(self.symptoms_database, self.disease_database)
+        self.disease_index = DiseaseIndex.load_or_build(self.disease_database.get('diseases', []),
+                                                        self.disease_index_path)
+        self._reload_lock = threading.Lock()
+        
+        # Medical reports per detected symptom set, least recently used evicted first
+        self._fragment_cache = FragmentCache(maxsize=int(os.getenv('CHATBOT_RESPONSE_CACHE_SIZE', 1024)))
         
         self.greetings = ['hello', 'hi', 'hey', 'greetings']
         self.farewells = ['bye', 'goodbye', 'see you', 'thanks']
@@ -33,14 +47,14 @@ class MedicalChatbot:
             print(f"Error loading disease database: {e}")
             return {'diseases': []}
     
-    def _build_symptoms_database(self):
+    def _build_symptoms_database(self, disease_database):
         """Build symptoms database from disease data"""
         symptoms_db = {}
         
         # Build from loaded disease database
-        for disease in self.disease_database.get('diseases', []):
+        for disease in disease_database.get('diseases', []):
             for symptom in disease.get('symptoms', []):
-                symptom_key = symptom.lower().replace(' ', '_')
+                symptom_key = normalize_symptom(symptom)
                 
                 if symptom_key not in symptoms_db:
                     symptoms_db[symptom_key] = {
@@ -209,6 +223,24 @@ class MedicalChatbot:
                 symptoms_db[symptom]['medications'] = list(existing_meds | new_meds)
         
         return symptoms_db
+    
+    def reload_disease_database(self):
+        """Reload disease_database.json and drop every report built from the old data"""
+        # Everything is built aside while requests keep using the old data
+        disease_database = self._load_disease_database()
+        symptoms_database = self._build_symptoms_database(disease_database)
+        symptom_matcher = self._build_symptom_matcher(symptoms_database, disease_database)
+        disease_index = DiseaseIndex.load_or_build(disease_database.get('diseases', []), self.disease_index_path)
+        
+        with self._reload_lock:
+            self.disease_database, self.symptoms_database, self.symptom_matcher, self.disease_index = (
+                disease_database, symptoms_database, symptom_matcher, disease_index)
+            clear_fragment_cache(self)
+        print(f"✓ Disease database reloaded ({len(symptoms_database)} symptoms)")
+    
+    def _build_symptom_matcher(self, symptoms_database, disease_database):
+        """Compile symptom names and synonyms for single-pass detection"""
+        return SymptomMatcher(symptoms_database, extra_synonyms=synonyms_from_database(disease_database))
         
         self.greetings = ['hello', 'hi', 'hey', 'greetings']
         self.farewells = ['bye', 'goodbye', 'see you', 'thanks']
@@ -239,7 +271,8 @@ class MedicalChatbot:
         if any(word in message_lower for word in ['emergency', 'urgent', 'severe pain', 'can\'t breathe', 'heart attack']):
             return "⚠️ EMERGENCY: Please call emergency services (911) immediately or go to the nearest emergency room. This is a medical emergency that requires immediate professional attention."
         
-        # Analyze symptoms
+        # Analyze symptoms; they come back deduplicated in vocabulary order, so
+        # any wording of the same symptoms gets the same cached report
         detected_symptoms = self._detect_symptoms(message_lower)
         
         if detected_symptoms:
@@ -249,14 +282,9 @@ class MedicalChatbot:
     
     def _detect_symptoms(self, message):
         """Detect symptoms mentioned in message"""
-        detected = []
-        
-        for symptom in self.symptoms_database.keys():
-            if symptom in message:
-                detected.append(symptom)
-        
-        return detected
+        return self.symptom_matcher.find(message)
     
+    @cached_fragment(key=lambda symptoms: frozenset(symptoms))
     def _generate_medical_advice(self, symptoms):
         """Generate comprehensive medical advice based on symptoms"""
         if not symptoms:
@@ -272,9 +300,10 @@ class MedicalChatbot:
         max_severity = 'mild'
         severity_scores = {'mild': 1, 'moderate': 2, 'severe': 3}
         
-        # Analyze each symptom
+        # Analyze each symptom, all against the same database if it is reloaded meanwhile
+        symptoms_database = self.symptoms_database
         for symptom in symptoms:
-            symptom_data = self.symptoms_database.get(symptom, {})
+            symptom_data = symptoms_database.get(symptom, {})
             
             # Count conditions
             for condition in symptom_data.get('conditions', []):
@@ -440,28 +469,28 @@ class MedicalChatbot:
         ])
         
         # Symptom-specific
-        if any(s in symptoms for s in ['fever', 'high_fever']):
+        if any(s in symptoms for s in ['fever', 'high fever']):
             recommendations.extend([
                 'Monitor temperature every 4 hours',
                 'Use cool compresses if fever is high',
                 'Avoid bundling up excessively'
             ])
         
-        if any(s in symptoms for s in ['cough', 'persistent_cough']):
+        if any(s in symptoms for s in ['cough', 'persistent cough']):
             recommendations.extend([
                 'Use humidifier or steam inhalation',
                 'Avoid irritants (smoke, strong odors)',
                 'Try honey for throat soothing (if over 1 year old)'
             ])
         
-        if any(s in symptoms for s in ['nausea', 'vomiting', 'stomach_pain']):
+        if any(s in symptoms for s in ['nausea', 'vomiting', 'stomach pain']):
             recommendations.extend([
                 'Eat bland foods (BRAT diet: Bananas, Rice, Applesauce, Toast)',
                 'Avoid spicy, fatty, or acidic foods',
                 'Small frequent meals instead of large meals'
             ])
         
-        if any(s in symptoms for s in ['headache', 'severe_headache']):
+        if any(s in symptoms for s in ['headache', 'severe headache']):
             recommendations.extend([
                 'Rest in quiet, dark room',
                 'Apply cold or warm compress to head',
@@ -529,6 +558,11 @@ class MedicalChatbot:
     
     def _general_response(self, message):
         """Generate general response for non-symptom queries"""
+        # Conditions whose names, symptoms or descriptions the message mentions
+        related = self.disease_index.search(message, self.retrieval_top_k, self.retrieval_min_score)
+        if related:
+            return self._related_conditions_response(related)
+        
         if 'how' in message and 'work' in message:
             return "I'm an AI medical assistant that analyzes symptoms and provides health advice. I can help with:\n• Skin condition analysis\n• Lab report interpretation\n• Symptom assessment\n• Sound/cough analysis\n\nHow can I help you today?"
         
@@ -547,3 +581,25 @@ class MedicalChatbot:
         ]
         
         return random.choice(responses)
+    
+    def _related_conditions_response(self, related):
+        """Describe the conditions retrieved for a free-text question"""
+        response = "🔎 RELATED CONDITIONS\n"
+        response += "="*50 + "\n\n"
+        
+        for i, (disease, score) in enumerate(related, 1):
+            response += f"{i}. {disease['name']} ({disease.get('severity', 'mild').title()})\n"
+            if disease.get('description'):
+                response += f"   {disease['description']}\n"
+            if disease.get('symptoms'):
+                response += f"   → Symptoms: {', '.join(disease['symptoms'])}\n"
+            if disease.get('medications'):
+                response += f"   → Common treatment: {', '.join(disease['medications'][:3])}\n"
+            if disease.get('duration'):
+                response += f"   → Typical duration: {disease['duration']}\n"
+            response += "\n"
+        
+        response += "Tell me which symptoms you have for a detailed assessment.\n\n"
+        response += "⚠️ This is general information, not a diagnosis. Consult a healthcare professional."
+        
+        return response
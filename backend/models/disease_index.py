@@ -0,0 +1,135 @@
+"""BM25 retrieval over the disease database for free-text chat messages.
+
+Disease names, symptoms and descriptions are tokenized once (words and word
+pairs, English stop words dropped) into a sparse matrix of BM25 weights, one
+row per disease, kept term-major so a message's terms select their postings.
+The message is turned into a sparse term vector and scored against every
+disease with one sparse vector-matrix product. The matrix and
+vocabulary are saved next to the database as a plain .npz file and reused
+for as long as the database content is unchanged.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+# Bump when tokenization or weighting changes, so saved indexes are rebuilt
+INDEX_VERSION = 1
+
+
+def disease_document(disease):
+    """Text indexed for one disease"""
+    return ' '.join([disease.get('name', ''), ' '.join(disease.get('symptoms', [])),
+                     disease.get('description', '')])
+
+
+def _vectorizer():
+    return CountVectorizer(ngram_range=(1, 2), stop_words='english')
+
+
+class DiseaseIndex:
+    """Top-k diseases for a message by BM25 score"""
+
+    def __init__(self, diseases, k1=1.5, b=0.75):
+        self.diseases = list(diseases)
+        self.k1 = k1
+        self.b = b
+        self.fingerprint = self._fingerprint(self.diseases, k1, b)
+        self.analyzer = _vectorizer().build_analyzer()
+        self.vocabulary = {}
+        self.postings = None  # terms x diseases
+
+    @staticmethod
+    def _fingerprint(diseases, k1, b):
+        content = json.dumps({'version': INDEX_VERSION, 'k1': k1, 'b': b, 'diseases': diseases},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def build(self):
+        """Compute BM25 weights for every (disease, term)"""
+        documents = [disease_document(disease) for disease in self.diseases]
+        try:
+            vectorizer = _vectorizer()
+            counts = vectorizer.fit_transform(documents).tocsr().astype(np.float32)
+        except ValueError:
+            # No diseases, or nothing but stop words: nothing to retrieve
+            self.vocabulary, self.postings = {}, None
+            return self
+
+        n_docs = counts.shape[0]
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+        # tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average length)), times idf
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1e-9))
+        tf = counts.data
+        row_norm = np.repeat(norm, np.diff(counts.indptr)).astype(np.float32)
+        counts.data = tf * (self.k1 + 1) / (tf + row_norm) * idf[counts.indices]
+        self.vocabulary = {term: int(index) for term, index in vectorizer.vocabulary_.items()}
+        self.postings = counts.T.tocsr()
+        return self
+
+    def save(self, path):
+        if self.postings is None:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        temporary = path + '.tmp.npz'
+        np.savez(temporary, fingerprint=np.array(self.fingerprint), vocabulary=np.array(vocabulary),
+                 data=self.postings.data, indices=self.postings.indices, indptr=self.postings.indptr,
+                 shape=np.array(self.postings.shape))
+        os.replace(temporary, path)
+
+    def _load(self, path):
+        """Use the saved index at ``path`` if it was built from the same database; returns success"""
+        with np.load(path, allow_pickle=False) as saved:
+            if str(saved['fingerprint']) != self.fingerprint:
+                return False
+            self.vocabulary = {term: index for index, term in enumerate(saved['vocabulary'].tolist())}
+            self.postings = sparse.csr_matrix((saved['data'], saved['indices'], saved['indptr']),
+                                              shape=tuple(saved['shape']))
+        return True
+
+    @classmethod
+    def load_or_build(cls, diseases, path):
+        """Index for ``diseases``, from ``path`` when up to date, otherwise built and saved there"""
+        index = cls(diseases)
+        try:
+            if os.path.exists(path) and index._load(path):
+                print(f"✓ Disease index loaded ({len(index.diseases)} diseases)")
+                return index
+        except Exception as e:
+            print(f"⚠️ Could not read disease index, rebuilding: {e}")
+
+        index.build()
+        print(f"✓ Disease index built ({len(index.diseases)} diseases)")
+        try:
+            index.save(path)
+        except Exception as e:
+            print(f"⚠️ Could not save disease index: {e}")
+        return index
+
+    def search(self, message, top_k=3, min_score=0.0):
+        """[(disease, score)] best first, at most ``top_k``, scoring above ``min_score``"""
+        if self.postings is None:
+            return []
+        # A term counts once however often the message repeats it
+        terms = np.unique([self.vocabulary[term] for term in self.analyzer(message) if term in self.vocabulary])
+        if not len(terms):
+            return []
+        query = sparse.csr_matrix((np.ones(len(terms), dtype=np.float32), terms, [0, len(terms)]),
+                                  shape=(1, self.postings.shape[0]))
+        scores = (query @ self.postings).toarray().ravel()
+
+        if top_k < len(scores):
+            best = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(self.diseases[i], float(scores[i])) for i in best if scores[i] > min_score]
@@ -2,27 +2,147 @@ import cv2
 import numpy as np
 from PIL import Image
 import pytesseract
-import re
 import os
 import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.response_cache import cached_fragment
+from .ocr_engine import OcrEngine, OCR_WHITELIST
+from .lab_parser import LabValueParser, synonyms_from_database
+from .lab_layout import detect_text_lines, find_table_region, lines_in_region
+from .lab_documents import count_pages, iter_pages
+from .lab_quality import QualityGate
+
+# Fixed parts of the lab treatment plan text
+TREATMENT_HEADER = "🏥 COMPREHENSIVE TREATMENT PLAN\n" + "="*60 + "\n\n"
+TREATMENT_SEPARATOR = "─" * 60 + "\n\n"
+TREATMENT_FOOTER = (
+    "🌟 GENERAL HEALTH RECOMMENDATIONS:\n"
+    "   • Follow prescribed medication schedule strictly\n"
+    "   • Keep a health diary to track symptoms\n"
+    "   • Schedule follow-up tests as recommended\n"
+    "   • Maintain healthy diet and exercise routine\n"
+    "   • Avoid self-medication\n"
+    "   • Report any side effects to your doctor\n\n"
+    "⚠️ MEDICAL DISCLAIMER:\n"
+    "This analysis is for informational purposes only.\n"
+    "Always consult qualified healthcare professionals before\n"
+    "starting any medication or treatment plan.\n"
+)
+
+# OCR preprocessing variants, cheapest first ('layout' reads only the detected text lines)
+OCR_PASSES = ('layout', 'otsu', 'upscaled_otsu', 'preprocessed')
+
+# Preprocessing profiles for the 'preprocessed' OCR pass (LAB_PREPROCESS_PROFILE)
+PREPROCESS_PROFILES = {
+    'fast': {'target_height': 1200, 'interpolation': cv2.INTER_LINEAR, 'denoise': None, 'threshold': 'otsu'},
+    'balanced': {'target_height': 1500, 'interpolation': cv2.INTER_CUBIC, 'denoise': 'bilateral', 'threshold': 'otsu'},
+    'accurate': {'target_height': 1500, 'interpolation': cv2.INTER_CUBIC, 'denoise': 'nlmeans', 'threshold': 'adaptive'}
+}
+
+# Header row of Tesseract TSV output
+TSV_HEADER = 'level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext'
+
+# Plausible values per test; anything outside is treated as an OCR error
+REASONABLE_RANGES = {
+    'glucose': (20, 500),
+    'cholesterol': (50, 500),
+    'hdl': (10, 200),
+    'ldl': (10, 300),
+    'triglycerides': (20, 1000),
+    'hemoglobin': (5, 25),
+    'wbc': (1000, 50000),
+    'rbc': (2, 10),
+    'platelets': (50000, 1000000),
+    'creatinine': (0.1, 15),
+    'alt': (1, 500),
+    'ast': (1, 500)
+}
+
+
+def estimate_skew(binary, max_side=400, max_angle=5.0):
+    """Skew angle (degrees) of a binarized page, text white on black
+
+    Rotates a downsampled copy over candidate angles and keeps the one whose
+    horizontal projection profile is sharpest (text lines fall into rows).
+    Returns the angle to pass to ``cv2.getRotationMatrix2D`` to deskew.
+    """
+    scale = max_side / max(binary.shape)
+    small = cv2.resize(binary, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else binary
+    h, w = small.shape
+    center = (w / 2, h / 2)
+    
+    def score(angle):
+        M = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(small, M, (w, h), flags=cv2.INTER_NEAREST)
+        rows = rotated.sum(axis=1, dtype=np.float64)
+        return np.square(np.diff(rows)).sum()
+    
+    coarse = max(np.arange(-max_angle, max_angle + 0.25, 0.5), key=score)
+    return round(float(max(np.arange(coarse - 0.4, coarse + 0.45, 0.1), key=score)), 2)
 
 class LabAnalyzer:
-    def __init__(self):
+    def __init__(self, enable_ocr=True):
         self.model_path = 'models_pretrained/lab_model.h5'
         self.lab_db_path = 'data/lab_results/lab_test_database.json'
         
         # Configure Tesseract path (check project folder first)
         self._setup_tesseract_path()
         
-        # Configure Tesseract path (check project folder first)
-        self._setup_tesseract_path()
+        # Warm Tesseract pool; availability is probed once here
+        # (enable_ocr=False gives a parse/analyze-only instance, e.g. for re-parse jobs)
+        self.ocr = OcrEngine(probe=enable_ocr)
+        if self.ocr.available:
+            print(f"✓ OCR engine ready: Tesseract {self.ocr.version} ({self.ocr.backend}, "
+                  f"{self.ocr.pool_size if self.ocr.backend != 'cli' else 1} instance(s))")
+        
+        # A pass is accepted when both its mean word confidence and its number
+        # of parsed lab values reach these; otherwise the costlier passes run
+        self.ocr_min_confidence = float(os.getenv('OCR_MIN_CONFIDENCE', 80))
+        self.ocr_min_values = int(os.getenv('OCR_MIN_VALUES', 3))
+        self.preprocess_profile = os.getenv('LAB_PREPROCESS_PROFILE', 'balanced')
+        if self.preprocess_profile not in PREPROCESS_PROFILES:
+            print(f"⚠️ Unknown LAB_PREPROCESS_PROFILE '{self.preprocess_profile}', using 'balanced'")
+            self.preprocess_profile = 'balanced'
+        if os.getenv('LAB_LAYOUT_OCR', 'true').lower() == 'true':
+            self.ocr_passes = OCR_PASSES
+        else:
+            self.ocr_passes = tuple(variant for variant in OCR_PASSES if variant != 'layout')
+        # Passes run together in each escalation tier after the first pass
+        self.ocr_tier_size = max(1, int(os.getenv('LAB_OCR_TIER_SIZE', 2)))
+        
+        # Multi-page documents: render resolution and pages OCR'd (and held in memory) at once
+        self.pdf_dpi = int(os.getenv('LAB_PDF_DPI', 300))
+        self.page_workers = int(os.getenv('LAB_PAGE_WORKERS', 0)) or self.ocr.pool_size
+        
+        # Cheap thumbnail check that turns away unreadable pages before OCR
+        self.quality_gate = QualityGate() if os.getenv('LAB_QUALITY_GATE', 'true').lower() == 'true' else None
+        
+        # Identifies everything that affects the raw OCR output of a page
+        self.ocr_config_version = hashlib.sha1(json.dumps({
+            'tesseract': self.ocr.version,
+            'passes': self.ocr_passes,
+            'profile': self.preprocess_profile,
+            'whitelist': OCR_WHITELIST,
+            'min_confidence': self.ocr_min_confidence,
+            'min_values': self.ocr_min_values,
+            'tier_size': self.ocr_tier_size,
+            'pdf_dpi': self.pdf_dpi
+        }, sort_keys=True).encode()).hexdigest()[:12]
         
         # Load lab test database
         self.lab_test_database = self._load_lab_database()
         
+        # Single-pass value parser; extra synonyms can come from the database
+        self.value_parser = LabValueParser(extra_synonyms=synonyms_from_database(self.lab_test_database))
+        
         # Normal ranges for common lab tests (from loaded data + defaults)
         self.normal_ranges = self._build_normal_ranges()
         
+        # Result key -> database test entry, for every key we can produce
+        self.test_index = self._build_test_index()
+        
         self.load_model()
     
     def _setup_tesseract_path(self):
@@ -113,254 +233,521 @@ class LabAnalyzer:
         except Exception as e:
             print(f"Model loading error: {e}")
     
-    def preprocess_image(self, image_path):
+    def preprocess_image(self, image_path, profile=None):
         """Enhanced preprocessing for better OCR accuracy"""
         img = cv2.imread(image_path)
-        
-        # Convert to grayscale
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return self.preprocess_gray(gray, profile)[0]
+    
+    def preprocess_gray(self, gray, profile=None):
+        """Run a preprocessing profile on a grayscale image
+        
+        Returns the binarized, deskewed image and the time spent in each
+        stage in milliseconds.
+        """
+        settings = PREPROCESS_PROFILES[profile or self.preprocess_profile]
+        timings = {}
         
         # Resize for better OCR (if too small)
+        start = time.perf_counter()
         height, width = gray.shape
         if height < 1000:
-            scale = 1500 / height
-            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-        
-        # Denoise first
-        denoised = cv2.fastNlMeansDenoising(gray, h=10)
-        
-        # Adaptive thresholding (better than fixed threshold)
-        thresh = cv2.adaptiveThreshold(
-            denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
-        )
-        
-        # Morphological operations to clean up
-        kernel = np.ones((1, 1), np.uint8)
-        morph = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-        
-        # Deskew if needed
-        coords = np.column_stack(np.where(morph > 0))
-        if len(coords) > 0:
-            angle = cv2.minAreaRect(coords)[-1]
-            if angle < -45:
-                angle = 90 + angle
-            if abs(angle) > 0.5:  # Only rotate if significant skew
-                (h, w) = morph.shape
-                center = (w // 2, h // 2)
-                M = cv2.getRotationMatrix2D(center, angle, 1.0)
-                morph = cv2.warpAffine(morph, M, (w, h), 
-                                      flags=cv2.INTER_CUBIC, 
-                                      borderMode=cv2.BORDER_REPLICATE)
-        
-        return morph
+            scale = settings['target_height'] / height
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=settings['interpolation'])
+        timings['resize'] = (time.perf_counter() - start) * 1000
+        
+        # Denoise: bilateral is a fraction of the cost of non-local means
+        start = time.perf_counter()
+        if settings['denoise'] == 'nlmeans':
+            gray = cv2.fastNlMeansDenoising(gray, h=10)
+        elif settings['denoise'] == 'bilateral':
+            gray = cv2.bilateralFilter(gray, 5, 50, 50)
+        timings['denoise'] = (time.perf_counter() - start) * 1000
+        
+        # Threshold to black text on white
+        start = time.perf_counter()
+        if settings['threshold'] == 'adaptive':
+            thresh = cv2.adaptiveThreshold(
+                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                cv2.THRESH_BINARY, 31, 15
+            )
+        else:
+            _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        timings['threshold'] = (time.perf_counter() - start) * 1000
+        
+        # Deskew if needed (angle estimated on a downsampled copy)
+        start = time.perf_counter()
+        angle = estimate_skew(255 - thresh)
+        if abs(angle) > 0.5:  # Only rotate if significant skew
+            (h, w) = thresh.shape
+            M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+            thresh = cv2.warpAffine(thresh, M, (w, h),
+                                    flags=cv2.INTER_NEAREST,
+                                    borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+        timings['deskew'] = (time.perf_counter() - start) * 1000
+        
+        return thresh, {stage: round(ms, 2) for stage, ms in timings.items()}
     
-    def extract_text(self, image_path):
-        """Enhanced text extraction with multiple OCR passes"""
+    def _ocr_pass(self, variant, gray):
+        """Preprocess the image for one OCR variant, recognise it and parse the values"""
+        if variant == 'layout':
+            return self._layout_ocr_pass(gray)
+        
+        details = {}
+        if variant == 'preprocessed':
+            img, timings = self.preprocess_gray(gray)
+            details = {'profile': self.preprocess_profile, 'preprocess_ms': timings}
+        else:
+            if variant == 'upscaled_otsu' and gray.shape[0] < 1000:
+                scale = 1500 / gray.shape[0]
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+            _, img = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+        result = self.ocr.image_to_data(img, psm=6, whitelist=OCR_WHITELIST)
+        result['variant'] = variant
+        result['details'] = details
+        result['lab_values'] = self.parse_lab_values(result['text'])
+        return result
+    
+    def _ocr_line(self, gray, box):
+        """OCR one text line crop as a single line (psm 7)"""
+        x, y, w, h = box
+        crop = gray[y:y + h, x:x + w]
+        scale = 1.0
+        if h < 48:
+            # Tesseract reads best with roughly 30 px capitals
+            scale = 48 / h
+            crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        _, crop = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        crop = cv2.copyMakeBorder(crop, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=255)
+        result = self.ocr.image_to_data(crop, psm=7, whitelist=OCR_WHITELIST)
+        result['tsv'] = self._line_tsv_to_page(result['tsv'], box, scale, border=10)
+        return result
+    
+    @staticmethod
+    def _line_tsv_to_page(tsv, box, scale, border):
+        """Map TSV rows of a line crop back to page coordinates (header row dropped)"""
+        rows = []
+        for row in tsv.splitlines()[1:]:
+            fields = row.split('\t')
+            if len(fields) < 12 or fields[0] == '1':
+                continue
+            left, top, width, height = (int(v) for v in fields[6:10])
+            fields[6] = str(int(box[0] + (left - border) / scale))
+            fields[7] = str(int(box[1] + (top - border) / scale))
+            fields[8] = str(int(width / scale))
+            fields[9] = str(int(height / scale))
+            rows.append(fields)
+        return rows
+    
+    def _layout_ocr_pass(self, gray):
+        """OCR only the text lines of the results table, line crops in parallel"""
+        start = time.perf_counter()
+        boxes = detect_text_lines(gray)
+        region = find_table_region(boxes)
+        if region:
+            boxes = lines_in_region(boxes, region)
+        layout_ms = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        workers = self.ocr.pool_size if self.ocr.backend != 'cli' else 1
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            line_results = list(executor.map(lambda box: self._ocr_line(gray, box), boxes))
+        ocr_ms = (time.perf_counter() - start) * 1000
+        
+        lines = []
+        confidences = []
+        tsv = [TSV_HEADER]
+        for number, (box, line) in enumerate(zip(boxes, line_results), start=1):
+            # Each line crop becomes its own block of the page TSV
+            tsv += ['\t'.join([fields[0], '1', str(number)] + fields[3:]) for fields in line['tsv']]
+            text = ' '.join(line['text'].split())
+            if text:
+                lines.append({'text': text, 'bbox': [int(v) for v in box], 'confidence': line['mean_confidence']})
+                confidences += line['word_confidences']
+        
+        lab_values, sources = self.parse_lab_lines(lines)
+        return {
+            'variant': 'layout',
+            'text': '\n'.join(line['text'] for line in lines),
+            'tsv': '\n'.join(tsv),
+            'lines': lines,
+            'word_confidences': confidences,
+            'mean_confidence': round(sum(confidences) / len(confidences), 2) if confidences else 0.0,
+            'lab_values': lab_values,
+            'value_sources': sources,
+            'details': {
+                'lines_read': len(boxes),
+                'table_region': [int(v) for v in region] if region else None,
+                'layout_ms': round(layout_ms, 2),
+                'line_ocr_ms': round(ocr_ms, 2)
+            }
+        }
+    
+    def _pass_accepted(self, result):
+        return (result['mean_confidence'] >= self.ocr_min_confidence
+                and len(result['lab_values']) >= self.ocr_min_values)
+    
+    def run_ocr(self, image_path):
+        """Confidence-driven OCR of an image file (see ``run_ocr_gray``)"""
+        img = cv2.imread(image_path)
+        if img is None:
+            print(f"OCR error: could not read {image_path}")
+            return {'text': '', 'lab_values': {}, 'strategy': 'unavailable', 'passes': []}
+        return self.run_ocr_gray(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    
+    def run_ocr_gray(self, gray):
+        """Confidence-driven OCR: cheap pass first, escalate only when needed
+        
+        Returns a dict with the chosen ``text`` and ``lab_values``, the
+        ``strategy`` used and a summary of every pass that ran.
+        """
+        empty = {'text': '', 'lab_values': {}, 'strategy': 'unavailable', 'passes': []}
         try:
-            # Check if Tesseract is available
-            try:
-                import pytesseract
-                # Test if tesseract is accessible
-                pytesseract.get_tesseract_version()
-                tesseract_available = True
-            except:
-                tesseract_available = False
+            if not self.ocr.available:
+                # Demo mode: Return empty text (will use demo data)
                 print("⚠️ Tesseract OCR not available. Using demo mode.")
                 print("   To enable OCR: Run install_tesseract.bat")
-            
-            if tesseract_available:
-                # First pass: Standard preprocessing
-                processed_img = self.preprocess_image(image_path)
-                
-                # Configure Tesseract for better accuracy
-                custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.:/-%() '
-                text1 = pytesseract.image_to_string(processed_img, config=custom_config)
-                
-                # Second pass: Different preprocessing
-                img = cv2.imread(image_path)
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                text2 = pytesseract.image_to_string(binary, config=custom_config)
-                
-                # Combine results (take longer text as it's likely more complete)
-                text = text1 if len(text1) > len(text2) else text2
-                
-                print(f"✓ Extracted text length: {len(text)} characters")
-                if len(text) > 0:
-                    print(f"  Preview: {text[:200]}")
-                
-                return text
-            else:
-                # Demo mode: Return empty string (will use demo data)
                 print("  Using demo data for analysis")
-                return ""
+                return empty
+            
+            results = [self._ocr_pass(self.ocr_passes[0], gray)]
+            accepted = [r for r in results if self._pass_accepted(r)]
+            strategy = 'single_pass'
+            escalations = self.ocr_passes[1:]
+            for start in range(0, len(escalations), self.ocr_tier_size):
+                if accepted:
+                    break
+                # The passes of one tier run concurrently across the OCR pool
+                tier = escalations[start:start + self.ocr_tier_size]
+                with ThreadPoolExecutor(max_workers=len(tier)) as executor:
+                    tier_results = list(executor.map(lambda v: self._ocr_pass(v, gray), tier))
+                results += tier_results
+                accepted = [r for r in tier_results if self._pass_accepted(r)]
+                strategy = 'escalated'
+            
+            # Most parsed values wins, then the most confident recognition;
+            # an accepted pass is preferred over the ones that fell short
+            best = max(accepted or results, key=lambda r: (len(r['lab_values']), r['mean_confidence']))
+            text = best['text']
+            
+            print(f"✓ Extracted text length: {len(text)} characters "
+                  f"({strategy}, {best['variant']}, confidence {best['mean_confidence']:.1f})")
+            if len(text) > 0:
+                print(f"  Preview: {text[:200]}")
+            
+            return {
+                'text': text,
+                'tsv': best.get('tsv'),
+                'lab_values': best['lab_values'],
+                'strategy': strategy,
+                'selected_pass': best['variant'],
+                'lines': best.get('lines'),
+                'value_sources': best.get('value_sources'),
+                'passes': [{
+                    'variant': r['variant'],
+                    'mean_confidence': r['mean_confidence'],
+                    'values_found': len(r['lab_values']),
+                    **r['details']
+                } for r in results]
+            }
                 
         except Exception as e:
             print(f"OCR error: {e}")
-            return ""
+            return empty
+    
+    def extract_text(self, image_path):
+        """Extract text using the confidence-driven OCR passes"""
+        return self.run_ocr(image_path)['text']
     
     def parse_lab_values(self, text):
-        """Enhanced parsing with multiple pattern matching"""
-        results = {}
-        
-        # Comprehensive patterns for lab values (multiple variations)
-        patterns = {
-            'glucose': [
-                r'glucose[:\s]+(\d+\.?\d*)',
-                r'blood\s+sugar[:\s]+(\d+\.?\d*)',
-                r'fasting\s+glucose[:\s]+(\d+\.?\d*)',
-                r'glu[:\s]+(\d+\.?\d*)',
-                r'bs[:\s]+(\d+\.?\d*)'
-            ],
-            'cholesterol': [
-                r'total\s+cholesterol[:\s]+(\d+\.?\d*)',
-                r'cholesterol[:\s]+(\d+\.?\d*)',
-                r'chol[:\s]+(\d+\.?\d*)',
-                r't\.chol[:\s]+(\d+\.?\d*)'
-            ],
-            'hdl': [
-                r'hdl[:\s-]+cholesterol[:\s]+(\d+\.?\d*)',
-                r'hdl[:\s]+(\d+\.?\d*)',
-                r'hdl-c[:\s]+(\d+\.?\d*)'
-            ],
-            'ldl': [
-                r'ldl[:\s-]+cholesterol[:\s]+(\d+\.?\d*)',
-                r'ldl[:\s]+(\d+\.?\d*)',
-                r'ldl-c[:\s]+(\d+\.?\d*)'
-            ],
-            'triglycerides': [
-                r'triglycerides[:\s]+(\d+\.?\d*)',
-                r'trig[:\s]+(\d+\.?\d*)',
-                r'tg[:\s]+(\d+\.?\d*)'
-            ],
-            'hemoglobin': [
-                r'hemoglobin[:\s]+(\d+\.?\d*)',
-                r'haemoglobin[:\s]+(\d+\.?\d*)',
-                r'hgb[:\s]+(\d+\.?\d*)',
-                r'hb[:\s]+(\d+\.?\d*)'
-            ],
-            'wbc': [
-                r'white\s+blood\s+cell[s]?[:\s]+(\d+\.?\d*)',
-                r'wbc[:\s]+(\d+\.?\d*)',
-                r'leukocyte[s]?[:\s]+(\d+\.?\d*)',
-                r'tc[:\s]+(\d+\.?\d*)'
-            ],
-            'rbc': [
-                r'red\s+blood\s+cell[s]?[:\s]+(\d+\.?\d*)',
-                r'rbc[:\s]+(\d+\.?\d*)',
-                r'erythrocyte[s]?[:\s]+(\d+\.?\d*)'
-            ],
-            'platelets': [
-                r'platelet[s]?[:\s]+(\d+\.?\d*)',
-                r'plt[:\s]+(\d+\.?\d*)',
-                r'thrombocyte[s]?[:\s]+(\d+\.?\d*)'
-            ],
-            'creatinine': [
-                r'creatinine[:\s]+(\d+\.?\d*)',
-                r'creat[:\s]+(\d+\.?\d*)',
-                r'cr[:\s]+(\d+\.?\d*)'
-            ],
-            'alt': [
-                r'alt[:\s]+(\d+\.?\d*)',
-                r'sgpt[:\s]+(\d+\.?\d*)',
-                r'alanine\s+aminotransferase[:\s]+(\d+\.?\d*)'
-            ],
-            'ast': [
-                r'ast[:\s]+(\d+\.?\d*)',
-                r'sgot[:\s]+(\d+\.?\d*)',
-                r'aspartate\s+aminotransferase[:\s]+(\d+\.?\d*)'
-            ]
-        }
-        
-        text_lower = text.lower()
-        
-        # Try all patterns for each test
-        for test_name, pattern_list in patterns.items():
-            for pattern in pattern_list:
-                match = re.search(pattern, text_lower)
-                if match:
-                    try:
-                        value = float(match.group(1))
-                        # Validate reasonable ranges
-                        if self._is_reasonable_value(test_name, value):
-                            results[test_name] = value
-                            break  # Found valid value, move to next test
-                    except:
-                        pass
+        """Parse lab values from OCR text in a single pass over the text"""
+        results = self.value_parser.parse(text, accept=self._is_reasonable_value)
         
         print(f"Parsed {len(results)} lab values: {list(results.keys())}")
         return results
     
+    def parse_lab_lines(self, lines):
+        """Parse line-structured OCR output; also returns where each value was read"""
+        results, sources = self.value_parser.parse_lines(lines, accept=self._is_reasonable_value)
+        
+        print(f"Parsed {len(results)} lab values: {list(results.keys())}")
+        return results, sources
+    
     def _is_reasonable_value(self, test_name, value):
         """Validate if value is in reasonable range (catch OCR errors)"""
-        reasonable_ranges = {
-            'glucose': (20, 500),
-            'cholesterol': (50, 500),
-            'hdl': (10, 200),
-            'ldl': (10, 300),
-            'triglycerides': (20, 1000),
-            'hemoglobin': (5, 25),
-            'wbc': (1000, 50000),
-            'rbc': (2, 10),
-            'platelets': (50000, 1000000),
-            'creatinine': (0.1, 15),
-            'alt': (1, 500),
-            'ast': (1, 500)
-        }
-        
-        if test_name in reasonable_ranges:
-            min_val, max_val = reasonable_ranges[test_name]
+        if test_name in REASONABLE_RANGES:
+            min_val, max_val = REASONABLE_RANGES[test_name]
             return min_val <= value <= max_val
         
         return True  # If not in list, accept it
     
+    def check_quality(self, gray):
+        """Quality gate verdict for a page, or None when the gate is disabled"""
+        if self.quality_gate is None or not self.ocr.available:
+            return None
+        return self.quality_gate.check(gray)
+    
+    def _quality_rejection(self, checks):
+        """Error response when no page passed the quality gate"""
+        message = checks[0]['message']
+        return {
+            'error': message,
+            'quality': checks,
+            'diagnosis': 'Image quality check failed',
+            'treatment': message,
+            'severity': 'unknown'
+        }
+    
     def analyze(self, image_path):
         """Analyze lab report image"""
         try:
-            # Extract text from image
-            text = self.extract_text(image_path)
-            
-            # Parse lab values
-            lab_values = self.parse_lab_values(text)
-            
-            # If no values found, use demo data
-            if not lab_values:
-                print("⚠️ No lab values extracted from image.")
-                print("   Using demo data for demonstration.")
-                print("   To analyze real images: Install Tesseract OCR (run install_tesseract.bat)")
-                
-                # Generate realistic demo data
-                import random
-                lab_values = {
-                    'glucose': random.randint(85, 180),
-                    'cholesterol': random.randint(160, 250),
-                    'hdl': random.randint(35, 65),
-                    'ldl': random.randint(80, 160),
-                    'hemoglobin': round(random.uniform(11.5, 16.5), 1)
-                }
-                print(f"   Demo values: {lab_values}")
+            img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            quality = self.check_quality(img) if img is not None else None
+            if quality and not quality['passed']:
+                return self._quality_rejection([quality])
             
-            # Analyze results
-            analysis = self._analyze_values(lab_values)
+            # Extract text and lab values from image
+            ocr = self.run_ocr(image_path)
+            return self._build_result(dict(ocr['lab_values']), {
+                'strategy': ocr['strategy'],
+                'selected_pass': ocr.get('selected_pass'),
+                'value_sources': ocr.get('value_sources'),
+                'passes': ocr['passes']
+            })
             
+        except Exception as e:
             return {
-                'diagnosis': analysis['diagnosis'],
-                'treatment': analysis['treatment'],
-                'severity': analysis['severity'],
-                'lab_values': lab_values,
-                'abnormal_values': analysis['abnormal_values'],
-                'recommendations': analysis['recommendations']
+                'error': str(e),
+                'diagnosis': 'Analysis failed',
+                'treatment': 'Please upload a clearer image of your lab report',
+                'severity': 'unknown'
             }
+    
+    def analyze_document(self, paths, progress=None, ocr_sink=None, ocr_lookup=None):
+        """Analyze a lab report made of several images and/or multi-page PDFs
+        
+        Pages are rendered one at a time and OCR'd in parallel, with at most
+        ``page_workers`` pages in memory. Values from all pages are merged
+        (the first page reporting a test wins) before the analysis.
+        ``progress`` is called with an event dict after every page;
+        ``ocr_sink`` receives each page's raw OCR output (text, TSV, lines)
+        with its image hash and OCR config version, for storage.
+        ``ocr_lookup(image_hash, ocr_version)`` may return a page's stored
+        raw OCR (as ``LabOcrStore.find`` does); such pages are parsed again
+        instead of OCR'd.
+        Pages failing the quality gate are skipped; if none pass, an error
+        with the gate's message and metrics is returned instead.
+        Milliseconds spent per stage (summed over pages) are reported in
+        ``ocr['timings_ms']``.
+        """
+        try:
+            total = count_pages(paths)
+            pages = iter_pages(paths, dpi=self.pdf_dpi)
+            done = []
+            rejected = []
+            timings = {'render': 0.0, 'quality': 0.0, 'ocr': 0.0, 'analysis': 0.0}
+            
+            def ocr_page(image, stored):
+                start = time.perf_counter()
+                ocr = self._reuse_ocr(stored) if stored else self.run_ocr_gray(image)
+                return ocr, (time.perf_counter() - start) * 1000
+            
+            def find_stored(image_hash):
+                if ocr_lookup is None:
+                    return None
+                try:
+                    return ocr_lookup(image_hash, self.ocr_config_version)
+                except Exception as e:
+                    print(f"  ⚠️ Stored OCR lookup failed, running OCR: {e}")
+                    return None
+            
+            with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+                pending = {}
+                
+                def submit_next():
+                    while True:
+                        start = time.perf_counter()
+                        page = next(pages, None)
+                        timings['render'] += (time.perf_counter() - start) * 1000
+                        if page is None:
+                            return
+                        image = page.pop('image')
+                        start = time.perf_counter()
+                        quality = self.check_quality(image)
+                        timings['quality'] += (time.perf_counter() - start) * 1000
+                        if quality and not quality['passed']:
+                            print(f"  ⚠️ {page['source']} p.{page['page']} rejected: {quality['gate']}")
+                            rejected.append({'source': page['source'], 'page': page['page'], **quality})
+                            if progress:
+                                progress({
+                                    'event': 'page',
+                                    'done': len(done) + len(rejected),
+                                    'total': total,
+                                    'source': page['source'],
+                                    'page': page['page'],
+                                    'rejected': quality['gate'],
+                                    'message': quality['message']
+                                })
+                            continue
+                        page['index'] = len(done) + len(pending)
+                        page['image_hash'] = hashlib.sha256(
+                            f"{image.shape}".encode() + image.tobytes()).hexdigest()
+                        stored = find_stored(page['image_hash'])
+                        pending[executor.submit(ocr_page, image, stored)] = page
+                        return
+                
+                for _ in range(self.page_workers):
+                    submit_next()
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        page = pending.pop(future)
+                        page['ocr'], ocr_ms = future.result()
+                        timings['ocr'] += ocr_ms
+                        done.append(page)
+                        submit_next()
+                        
+                        if ocr_sink and page['ocr']['strategy'] != 'unavailable':
+                            ocr_sink({
+                                'index': page['index'],
+                                'source': page['source'],
+                                'page': page['page'],
+                                'image_hash': page['image_hash'],
+                                'ocr_version': self.ocr_config_version,
+                                'text': page['ocr']['text'],
+                                'tsv': page['ocr'].get('tsv'),
+                                'lines': page['ocr'].get('lines')
+                            })
+                        
+                        values_found = len(page['ocr']['lab_values'])
+                        print(f"  Page {len(done) + len(rejected)}/{total} ({page['source']} p.{page['page']}): "
+                              f"{values_found} values")
+                        if progress:
+                            progress({
+                                'event': 'page',
+                                'done': len(done) + len(rejected),
+                                'total': total,
+                                'source': page['source'],
+                                'page': page['page'],
+                                'values_found': values_found
+                            })
+            
+            if rejected and not done:
+                rejection = self._quality_rejection(rejected)
+                rejection['ocr'] = {'timings_ms': {stage: round(ms, 2) for stage, ms in timings.items()}}
+                return rejection
+            
+            lab_values = {}
+            value_sources = {}
+            for page in sorted(done, key=lambda p: p['index']):
+                page_sources = page['ocr'].get('value_sources') or {}
+                for test, value in page['ocr']['lab_values'].items():
+                    if test not in lab_values:
+                        lab_values[test] = value
+                        value_sources[test] = {'source': page['source'], 'page': page['page'],
+                                               **page_sources.get(test, {})}
+            
+            start = time.perf_counter()
+            result = self._build_result(lab_values, {
+                'value_sources': value_sources,
+                'pages': [{
+                    'source': page['source'],
+                    'page': page['page'],
+                    'strategy': page['ocr']['strategy'],
+                    'selected_pass': page['ocr'].get('selected_pass'),
+                    'values_found': len(page['ocr']['lab_values'])
+                } for page in sorted(done, key=lambda p: p['index'])],
+                'rejected_pages': [{
+                    'source': page['source'],
+                    'page': page['page'],
+                    'gate': page['gate'],
+                    'message': page['message']
+                } for page in rejected]
+            })
+            timings['analysis'] = (time.perf_counter() - start) * 1000
+            result['ocr']['timings_ms'] = {stage: round(ms, 2) for stage, ms in timings.items()}
+            return result
             
         except Exception as e:
             return {
                 'error': str(e),
                 'diagnosis': 'Analysis failed',
-                'treatment': 'Please upload a clearer image of your lab report',
+                'treatment': 'Please upload clearer images or a readable PDF of your lab report',
                 'severity': 'unknown'
             }
     
+    def _reuse_ocr(self, stored):
+        """``run_ocr_gray``-shaped result from a page's stored raw OCR, parsed again"""
+        if stored.get('lines'):
+            lab_values, sources = self.parse_lab_lines(stored['lines'])
+        else:
+            lab_values, sources = self.parse_lab_values(stored['text']), None
+        return {
+            'text': stored['text'],
+            'tsv': stored.get('tsv'),
+            'lab_values': lab_values,
+            'strategy': 'stored',
+            'selected_pass': None,
+            'lines': stored.get('lines'),
+            'value_sources': sources,
+            'passes': []
+        }
+    
+    def reanalyze_ocr(self, pages):
+        """Parse and analyze stored raw OCR pages again, without running OCR
+        
+        ``pages`` are dicts with ``text`` and optionally ``lines``, in page
+        order. Returns None when no lab values are found.
+        """
+        lab_values = {}
+        for page in pages:
+            if page.get('lines'):
+                values, _ = self.parse_lab_lines(page['lines'])
+            else:
+                values = self.parse_lab_values(page['text'])
+            for test, value in values.items():
+                lab_values.setdefault(test, value)
+        
+        if not lab_values:
+            return None
+        
+        analysis = self._analyze_values(lab_values)
+        analysis['lab_values'] = lab_values
+        return analysis
+    
+    def _build_result(self, lab_values, ocr_info):
+        """Analysis response for extracted lab values"""
+        # If no values found, use demo data
+        if not lab_values:
+            print("⚠️ No lab values extracted from image.")
+            print("   Using demo data for demonstration.")
+            print("   To analyze real images: Install Tesseract OCR (run install_tesseract.bat)")
+            
+            # Generate realistic demo data
+            import random
+            lab_values = {
+                'glucose': random.randint(85, 180),
+                'cholesterol': random.randint(160, 250),
+                'hdl': random.randint(35, 65),
+                'ldl': random.randint(80, 160),
+                'hemoglobin': round(random.uniform(11.5, 16.5), 1)
+            }
+            print(f"   Demo values: {lab_values}")
+        
+        # Analyze results
+        analysis = self._analyze_values(lab_values)
+        
+        return {
+            'diagnosis': analysis['diagnosis'],
+            'treatment': analysis['treatment'],
+            'severity': analysis['severity'],
+            'lab_values': lab_values,
+            'abnormal_values': analysis['abnormal_values'],
+            'recommendations': analysis['recommendations'],
+            'ocr': ocr_info
+        }
+    
     def _analyze_values(self, lab_values):
         """Analyze lab values and provide diagnosis"""
         abnormal_values = []
@@ -409,324 +796,341 @@ class LabAnalyzer:
         }
     
     def _get_treatment(self, abnormal_values):
-        """Get comprehensive treatment with medications and symptoms"""
+        """Get comprehensive treatment with medications and symptoms
+        
+        Only the value lines are formatted per report; every section comes
+        from the fragment cache, keyed on the test's status band rather than
+        its raw value.
+        """
         if not abnormal_values:
             return '✅ All values normal. Continue healthy lifestyle.'
         
-        response = "🏥 COMPREHENSIVE TREATMENT PLAN\n"
-        response += "="*60 + "\n\n"
-        
+        parts = [TREATMENT_HEADER]
         for item in abnormal_values:
             test = item['test']
             status = item['status']
             value = item['value']
-            normal_range = item['normal_range']
-            
-            response += f"📊 {test.upper().replace('_', ' ')}: {value} ({status.upper()})\n"
-            response += f"   Normal Range: {normal_range}\n\n"
-            
-            # Get detailed info from database
-            db_info = self._get_test_info_from_db(test)
-            
-            if test == 'glucose':
-                if status == 'high':
-                    response += "🔴 CONDITION: Hyperglycemia / Possible Diabetes\n\n"
-                    response += "😷 SYMPTOMS YOU MAY EXPERIENCE:\n"
-                    response += "   • Increased thirst and frequent urination\n"
-                    response += "   • Extreme hunger despite eating\n"
-                    response += "   • Unexplained weight loss\n"
-                    response += "   • Fatigue and weakness\n"
-                    response += "   • Blurred vision\n"
-                    response += "   • Slow-healing wounds\n"
-                    response += "   • Tingling in hands/feet\n\n"
-                    
-                    response += "💊 MEDICATIONS (Consult doctor before taking):\n"
-                    if value > 126:
-                        response += "   1. Metformin 500mg\n"
-                        response += "      → Dosage: Start 500mg once daily with dinner\n"
-                        response += "      → Increase to 500mg twice daily after 1 week\n"
-                        response += "      → Maximum: 2000mg daily\n"
-                        response += "      → Take with food to reduce stomach upset\n\n"
-                        
-                        response += "   2. Glimepiride 1-2mg (if Metformin insufficient)\n"
-                        response += "      → Dosage: 1mg once daily before breakfast\n"
-                        response += "      → Can increase to 2-4mg if needed\n\n"
-                        
-                        response += "   3. Insulin (if severe)\n"
-                        response += "      → Type: Rapid-acting or long-acting\n"
-                        response += "      → Dosage: Doctor will determine based on levels\n\n"
-                    else:
-                        response += "   1. Lifestyle modifications first (diet + exercise)\n"
-                        response += "   2. Metformin 500mg if lifestyle changes insufficient\n\n"
-                    
-                    response += "🏥 URGENT ACTIONS:\n"
-                    response += "   • Consult endocrinologist within 48 hours\n"
-                    response += "   • Start blood glucose monitoring (fasting + post-meal)\n"
-                    response += "   • HbA1c test to assess 3-month average\n\n"
-                    
-                elif status == 'low':
-                    response += "⚠️ CONDITION: Hypoglycemia (Low Blood Sugar)\n\n"
-                    response += "😷 SYMPTOMS YOU MAY EXPERIENCE:\n"
-                    response += "   • Shakiness and trembling\n"
-                    response += "   • Sweating and chills\n"
-                    response += "   • Dizziness and confusion\n"
-                    response += "   • Rapid heartbeat\n"
-                    response += "   • Hunger and irritability\n"
-                    response += "   • Headache\n\n"
-                    
-                    response += "💊 IMMEDIATE TREATMENT:\n"
-                    response += "   1. Glucose tablets (15-20g)\n"
-                    response += "      → Chew 3-4 tablets immediately\n"
-                    response += "      → Recheck blood sugar after 15 minutes\n\n"
-                    
-                    response += "   2. Fast-acting carbs (if no glucose tablets):\n"
-                    response += "      → 4 oz (120ml) fruit juice\n"
-                    response += "      → 1 tablespoon honey or sugar\n"
-                    response += "      → 5-6 pieces of hard candy\n\n"
-                    
-                    response += "   3. Adjust diabetes medication (if on treatment)\n"
-                    response += "      → Consult doctor to reduce dosage\n\n"
-            
-            elif test == 'cholesterol' or test == 'ldl':
-                if status == 'high':
-                    response += "🔴 CONDITION: Hypercholesterolemia / High Cholesterol\n\n"
-                    response += "😷 SYMPTOMS (Often Silent - No Symptoms Until Complications):\n"
-                    response += "   • Usually no symptoms until:\n"
-                    response += "   • Chest pain (angina) - if coronary artery disease\n"
-                    response += "   • Heart attack symptoms\n"
-                    response += "   • Stroke symptoms\n"
-                    response += "   • Xanthomas (cholesterol deposits under skin)\n"
-                    response += "   • Corneal arcus (white ring around iris)\n\n"
-                    
-                    response += "💊 MEDICATIONS:\n"
-                    response += "   1. Atorvastatin (Lipitor) 10-80mg\n"
-                    response += "      → Dosage: Start 10-20mg once daily at bedtime\n"
-                    response += "      → Can increase to 40-80mg if needed\n"
-                    response += "      → Take consistently, preferably at night\n"
-                    response += "      → Monitor liver enzymes every 3 months\n\n"
-                    
-                    response += "   2. Rosuvastatin (Crestor) 5-40mg\n"
-                    response += "      → Dosage: Start 5-10mg once daily\n"
-                    response += "      → More potent than Atorvastatin\n"
-                    response += "      → Can take any time of day\n\n"
-                    
-                    response += "   3. Ezetimibe (Zetia) 10mg\n"
-                    response += "      → Dosage: 10mg once daily\n"
-                    response += "      → Can combine with statin\n"
-                    response += "      → Reduces cholesterol absorption\n\n"
-                    
-                    response += "   4. Omega-3 Fish Oil 1000-2000mg\n"
-                    response += "      → Dosage: 1000mg twice daily with meals\n"
-                    response += "      → Helps reduce triglycerides\n\n"
-                    
-                    response += "🏥 URGENT ACTIONS:\n"
-                    response += "   • Consult cardiologist within 1 week\n"
-                    response += "   • Lipid panel recheck in 6-8 weeks after starting medication\n"
-                    response += "   • Cardiac risk assessment (stress test if needed)\n\n"
             
-            elif test == 'hemoglobin':
-                if status == 'low':
-                    response += "⚠️ CONDITION: Anemia (Low Hemoglobin)\n\n"
-                    response += "😷 SYMPTOMS YOU MAY EXPERIENCE:\n"
-                    response += "   • Fatigue and weakness\n"
-                    response += "   • Pale skin, lips, and nail beds\n"
-                    response += "   • Shortness of breath\n"
-                    response += "   • Dizziness and lightheadedness\n"
-                    response += "   • Cold hands and feet\n"
-                    response += "   • Rapid or irregular heartbeat\n"
-                    response += "   • Headaches\n"
-                    response += "   • Difficulty concentrating\n\n"
-                    
-                    response += "💊 MEDICATIONS:\n"
-                    response += "   1. Ferrous Sulfate 325mg (65mg elemental iron)\n"
-                    response += "      → Dosage: 1 tablet 2-3 times daily\n"
-                    response += "      → Take on empty stomach (or with vitamin C)\n"
-                    response += "      → Avoid taking with calcium, tea, coffee\n"
-                    response += "      → Side effects: Dark stools, constipation\n\n"
-                    
-                    response += "   2. Vitamin B12 (Cyanocobalamin) 1000mcg\n"
-                    response += "      → Dosage: 1000mcg once daily (oral or sublingual)\n"
-                    response += "      → Or 1000mcg injection weekly (if deficient)\n"
-                    response += "      → Essential for red blood cell production\n\n"
-                    
-                    response += "   3. Folic Acid 1mg\n"
-                    response += "      → Dosage: 1mg once daily\n"
-                    response += "      → Important for DNA synthesis\n"
-                    response += "      → Often combined with iron\n\n"
-                    
-                    response += "   4. Vitamin C 500mg\n"
-                    response += "      → Dosage: 500mg with iron supplement\n"
-                    response += "      → Enhances iron absorption\n\n"
-                    
-                    response += "🏥 URGENT ACTIONS:\n"
-                    response += "   • Consult hematologist to determine cause\n"
-                    response += "   • Complete blood count (CBC) with iron studies\n"
-                    response += "   • Check for internal bleeding (stool test)\n"
-                    response += "   • Recheck hemoglobin in 4-6 weeks\n\n"
-            
-            elif test == 'wbc':
-                if status == 'high':
-                    response += "🔴 CONDITION: Leukocytosis (High White Blood Cells)\n\n"
-                    response += "😷 SYMPTOMS (Depends on underlying cause):\n"
-                    response += "   • Fever and chills\n"
-                    response += "   • Body aches and fatigue\n"
-                    response += "   • Night sweats\n"
-                    response += "   • Swollen lymph nodes\n"
-                    response += "   • Difficulty breathing\n"
-                    response += "   • Abdominal pain or fullness\n"
-                    response += "   • Easy bruising or bleeding (if leukemia)\n\n"
-                    
-                    response += "💊 TREATMENT (Based on cause):\n"
-                    response += "   IF INFECTION:\n"
-                    response += "   1. Amoxicillin 500mg\n"
-                    response += "      → Dosage: 500mg three times daily for 7-10 days\n"
-                    response += "      → For bacterial infections\n\n"
-                    
-                    response += "   2. Azithromycin (Z-Pack) 250mg\n"
-                    response += "      → Day 1: 500mg (2 tablets)\n"
-                    response += "      → Days 2-5: 250mg once daily\n\n"
-                    
-                    response += "   3. Ibuprofen 400mg (for inflammation)\n"
-                    response += "      → Dosage: 400mg every 6-8 hours with food\n\n"
-                    
-                    response += "🏥 URGENT ACTIONS:\n"
-                    response += "   • Consult doctor immediately\n"
-                    response += "   • Blood culture if fever present\n"
-                    response += "   • Chest X-ray if respiratory symptoms\n"
-                    response += "   • Rule out leukemia (if very high or persistent)\n\n"
-                
-                elif status == 'low':
-                    response += "⚠️ CONDITION: Leukopenia (Low White Blood Cells)\n\n"
-                    response += "😷 SYMPTOMS:\n"
-                    response += "   • Frequent infections\n"
-                    response += "   • Fever and chills\n"
-                    response += "   • Mouth sores and ulcers\n"
-                    response += "   • Fatigue\n"
-                    response += "   • Pneumonia or other infections\n\n"
-                    
-                    response += "💊 TREATMENT:\n"
-                    response += "   1. G-CSF (Filgrastim) injection (if severe)\n"
-                    response += "      → Stimulates white blood cell production\n"
-                    response += "      → Administered by healthcare provider\n\n"
-                    
-                    response += "   2. Vitamin supplements:\n"
-                    response += "      → Vitamin B12, Folate, Zinc\n"
-                    response += "      → Boost immune system\n\n"
-                    
-                    response += "   3. Antibiotics (if infection develops)\n\n"
-                    
-                    response += "🏥 URGENT ACTIONS:\n"
-                    response += "   • Consult hematologist\n"
-                    response += "   • Avoid sick people and crowds\n"
-                    response += "   • Practice strict hygiene\n"
-                    response += "   • Monitor for signs of infection\n\n"
-            
-            elif test == 'creatinine':
-                if status == 'high':
-                    response += "🔴 CONDITION: Elevated Creatinine / Possible Kidney Dysfunction\n\n"
-                    response += "😷 SYMPTOMS:\n"
-                    response += "   • Fatigue and weakness\n"
-                    response += "   • Swelling in legs, ankles, feet (edema)\n"
-                    response += "   • Decreased urine output\n"
-                    response += "   • Shortness of breath\n"
-                    response += "   • Nausea and vomiting\n"
-                    response += "   • Confusion and difficulty concentrating\n"
-                    response += "   • Chest pain or pressure\n\n"
-                    
-                    response += "💊 MEDICATIONS:\n"
-                    response += "   1. ACE Inhibitors (Lisinopril) 5-40mg\n"
-                    response += "      → Dosage: Start 5-10mg once daily\n"
-                    response += "      → Protects kidneys, lowers blood pressure\n"
-                    response += "      → Monitor potassium levels\n\n"
-                    
-                    response += "   2. Diuretics (Furosemide) 20-80mg\n"
-                    response += "      → Dosage: 20-40mg once or twice daily\n"
-                    response += "      → Reduces fluid retention\n"
-                    response += "      → Take in morning to avoid nighttime urination\n\n"
-                    
-                    response += "   3. Sodium Bicarbonate 650mg\n"
-                    response += "      → Dosage: 650mg 2-3 times daily\n"
-                    response += "      → Reduces acid buildup\n\n"
-                    
-                    response += "🏥 URGENT ACTIONS:\n"
-                    response += "   • Consult nephrologist immediately\n"
-                    response += "   • Complete metabolic panel + eGFR\n"
-                    response += "   • Kidney ultrasound\n"
-                    response += "   • Reduce protein intake\n"
-                    response += "   • Stop NSAIDs (ibuprofen, naproxen)\n"
-                    response += "   • Control blood pressure and diabetes\n\n"
-            
-            elif test == 'alt' or test == 'ast':
-                if status == 'high':
-                    response += "🔴 CONDITION: Elevated Liver Enzymes / Possible Liver Damage\n\n"
-                    response += "😷 SYMPTOMS:\n"
-                    response += "   • Fatigue and weakness\n"
-                    response += "   • Jaundice (yellowing of skin/eyes)\n"
-                    response += "   • Dark urine\n"
-                    response += "   • Pale stools\n"
-                    response += "   • Abdominal pain (right upper quadrant)\n"
-                    response += "   • Nausea and vomiting\n"
-                    response += "   • Loss of appetite\n"
-                    response += "   • Easy bruising\n\n"
-                    
-                    response += "💊 TREATMENT:\n"
-                    response += "   1. STOP all hepatotoxic substances:\n"
-                    response += "      → Alcohol (complete abstinence)\n"
-                    response += "      → Acetaminophen (Tylenol)\n"
-                    response += "      → Certain antibiotics\n"
-                    response += "      → Herbal supplements\n\n"
-                    
-                    response += "   2. Milk Thistle (Silymarin) 150-300mg\n"
-                    response += "      → Dosage: 150mg 2-3 times daily\n"
-                    response += "      → Liver protective supplement\n\n"
-                    
-                    response += "   3. Vitamin E 400-800 IU\n"
-                    response += "      → Dosage: 400 IU once daily\n"
-                    response += "      → Antioxidant for liver health\n\n"
+            parts.append(f"📊 {test.upper().replace('_', ' ')}: {value} ({status.upper()})\n"
+                         f"   Normal Range: {item['normal_range']}\n\n")
+            parts.append(self._get_treatment_section(test, status, value))
+            parts.append(TREATMENT_SEPARATOR)
+        parts.append(TREATMENT_FOOTER)
+        
+        return ''.join(parts)
+    
+    @cached_fragment(key=lambda test, status, value: (test, status, test == 'glucose' and value > 126))
+    def _get_treatment_section(self, test, status, value):
+        """Condition, symptoms and medication text for one abnormal test"""
+        response = ""
+        
+        # Get detailed info from database
+        db_info = self._get_test_info_from_db(test)
+        
+        if test == 'glucose':
+            if status == 'high':
+                response += "🔴 CONDITION: Hyperglycemia / Possible Diabetes\n\n"
+                response += "😷 SYMPTOMS YOU MAY EXPERIENCE:\n"
+                response += "   • Increased thirst and frequent urination\n"
+                response += "   • Extreme hunger despite eating\n"
+                response += "   • Unexplained weight loss\n"
+                response += "   • Fatigue and weakness\n"
+                response += "   • Blurred vision\n"
+                response += "   • Slow-healing wounds\n"
+                response += "   • Tingling in hands/feet\n\n"
+                
+                response += "💊 MEDICATIONS (Consult doctor before taking):\n"
+                if value > 126:
+                    response += "   1. Metformin 500mg\n"
+                    response += "      → Dosage: Start 500mg once daily with dinner\n"
+                    response += "      → Increase to 500mg twice daily after 1 week\n"
+                    response += "      → Maximum: 2000mg daily\n"
+                    response += "      → Take with food to reduce stomach upset\n\n"
                     
-                    response += "   4. Ursodeoxycholic Acid (if prescribed)\n"
-                    response += "      → For certain liver conditions\n\n"
+                    response += "   2. Glimepiride 1-2mg (if Metformin insufficient)\n"
+                    response += "      → Dosage: 1mg once daily before breakfast\n"
+                    response += "      → Can increase to 2-4mg if needed\n\n"
                     
-                    response += "🏥 URGENT ACTIONS:\n"
-                    response += "   • Consult hepatologist immediately\n"
-                    response += "   • Complete liver function panel\n"
-                    response += "   • Hepatitis screening (A, B, C)\n"
-                    response += "   • Liver ultrasound or FibroScan\n"
-                    response += "   • Review all medications with doctor\n\n"
-            
-            # Add database medications if available
-            if db_info and 'medications' in db_info:
-                response += "📚 ADDITIONAL MEDICATIONS FROM DATABASE:\n"
-                for med in db_info['medications'].get(status, []):
-                    response += f"   • {med}\n"
-                response += "\n"
+                    response += "   3. Insulin (if severe)\n"
+                    response += "      → Type: Rapid-acting or long-acting\n"
+                    response += "      → Dosage: Doctor will determine based on levels\n\n"
+                else:
+                    response += "   1. Lifestyle modifications first (diet + exercise)\n"
+                    response += "   2. Metformin 500mg if lifestyle changes insufficient\n\n"
+                
+                response += "🏥 URGENT ACTIONS:\n"
+                response += "   • Consult endocrinologist within 48 hours\n"
+                response += "   • Start blood glucose monitoring (fasting + post-meal)\n"
+                response += "   • HbA1c test to assess 3-month average\n\n"
+                
+            elif status == 'low':
+                response += "⚠️ CONDITION: Hypoglycemia (Low Blood Sugar)\n\n"
+                response += "😷 SYMPTOMS YOU MAY EXPERIENCE:\n"
+                response += "   • Shakiness and trembling\n"
+                response += "   • Sweating and chills\n"
+                response += "   • Dizziness and confusion\n"
+                response += "   • Rapid heartbeat\n"
+                response += "   • Hunger and irritability\n"
+                response += "   • Headache\n\n"
+                
+                response += "💊 IMMEDIATE TREATMENT:\n"
+                response += "   1. Glucose tablets (15-20g)\n"
+                response += "      → Chew 3-4 tablets immediately\n"
+                response += "      → Recheck blood sugar after 15 minutes\n\n"
+                
+                response += "   2. Fast-acting carbs (if no glucose tablets):\n"
+                response += "      → 4 oz (120ml) fruit juice\n"
+                response += "      → 1 tablespoon honey or sugar\n"
+                response += "      → 5-6 pieces of hard candy\n\n"
+                
+                response += "   3. Adjust diabetes medication (if on treatment)\n"
+                response += "      → Consult doctor to reduce dosage\n\n"
+        
+        elif test == 'cholesterol' or test == 'ldl':
+            if status == 'high':
+                response += "🔴 CONDITION: Hypercholesterolemia / High Cholesterol\n\n"
+                response += "😷 SYMPTOMS (Often Silent - No Symptoms Until Complications):\n"
+                response += "   • Usually no symptoms until:\n"
+                response += "   • Chest pain (angina) - if coronary artery disease\n"
+                response += "   • Heart attack symptoms\n"
+                response += "   • Stroke symptoms\n"
+                response += "   • Xanthomas (cholesterol deposits under skin)\n"
+                response += "   • Corneal arcus (white ring around iris)\n\n"
+                
+                response += "💊 MEDICATIONS:\n"
+                response += "   1. Atorvastatin (Lipitor) 10-80mg\n"
+                response += "      → Dosage: Start 10-20mg once daily at bedtime\n"
+                response += "      → Can increase to 40-80mg if needed\n"
+                response += "      → Take consistently, preferably at night\n"
+                response += "      → Monitor liver enzymes every 3 months\n\n"
+                
+                response += "   2. Rosuvastatin (Crestor) 5-40mg\n"
+                response += "      → Dosage: Start 5-10mg once daily\n"
+                response += "      → More potent than Atorvastatin\n"
+                response += "      → Can take any time of day\n\n"
+                
+                response += "   3. Ezetimibe (Zetia) 10mg\n"
+                response += "      → Dosage: 10mg once daily\n"
+                response += "      → Can combine with statin\n"
+                response += "      → Reduces cholesterol absorption\n\n"
+                
+                response += "   4. Omega-3 Fish Oil 1000-2000mg\n"
+                response += "      → Dosage: 1000mg twice daily with meals\n"
+                response += "      → Helps reduce triglycerides\n\n"
+                
+                response += "🏥 URGENT ACTIONS:\n"
+                response += "   • Consult cardiologist within 1 week\n"
+                response += "   • Lipid panel recheck in 6-8 weeks after starting medication\n"
+                response += "   • Cardiac risk assessment (stress test if needed)\n\n"
+        
+        elif test == 'hemoglobin':
+            if status == 'low':
+                response += "⚠️ CONDITION: Anemia (Low Hemoglobin)\n\n"
+                response += "😷 SYMPTOMS YOU MAY EXPERIENCE:\n"
+                response += "   • Fatigue and weakness\n"
+                response += "   • Pale skin, lips, and nail beds\n"
+                response += "   • Shortness of breath\n"
+                response += "   • Dizziness and lightheadedness\n"
+                response += "   • Cold hands and feet\n"
+                response += "   • Rapid or irregular heartbeat\n"
+                response += "   • Headaches\n"
+                response += "   • Difficulty concentrating\n\n"
+                
+                response += "💊 MEDICATIONS:\n"
+                response += "   1. Ferrous Sulfate 325mg (65mg elemental iron)\n"
+                response += "      → Dosage: 1 tablet 2-3 times daily\n"
+                response += "      → Take on empty stomach (or with vitamin C)\n"
+                response += "      → Avoid taking with calcium, tea, coffee\n"
+                response += "      → Side effects: Dark stools, constipation\n\n"
+                
+                response += "   2. Vitamin B12 (Cyanocobalamin) 1000mcg\n"
+                response += "      → Dosage: 1000mcg once daily (oral or sublingual)\n"
+                response += "      → Or 1000mcg injection weekly (if deficient)\n"
+                response += "      → Essential for red blood cell production\n\n"
+                
+                response += "   3. Folic Acid 1mg\n"
+                response += "      → Dosage: 1mg once daily\n"
+                response += "      → Important for DNA synthesis\n"
+                response += "      → Often combined with iron\n\n"
+                
+                response += "   4. Vitamin C 500mg\n"
+                response += "      → Dosage: 500mg with iron supplement\n"
+                response += "      → Enhances iron absorption\n\n"
+                
+                response += "🏥 URGENT ACTIONS:\n"
+                response += "   • Consult hematologist to determine cause\n"
+                response += "   • Complete blood count (CBC) with iron studies\n"
+                response += "   • Check for internal bleeding (stool test)\n"
+                response += "   • Recheck hemoglobin in 4-6 weeks\n\n"
+        
+        elif test == 'wbc':
+            if status == 'high':
+                response += "🔴 CONDITION: Leukocytosis (High White Blood Cells)\n\n"
+                response += "😷 SYMPTOMS (Depends on underlying cause):\n"
+                response += "   • Fever and chills\n"
+                response += "   • Body aches and fatigue\n"
+                response += "   • Night sweats\n"
+                response += "   • Swollen lymph nodes\n"
+                response += "   • Difficulty breathing\n"
+                response += "   • Abdominal pain or fullness\n"
+                response += "   • Easy bruising or bleeding (if leukemia)\n\n"
+                
+                response += "💊 TREATMENT (Based on cause):\n"
+                response += "   IF INFECTION:\n"
+                response += "   1. Amoxicillin 500mg\n"
+                response += "      → Dosage: 500mg three times daily for 7-10 days\n"
+                response += "      → For bacterial infections\n\n"
+                
+                response += "   2. Azithromycin (Z-Pack) 250mg\n"
+                response += "      → Day 1: 500mg (2 tablets)\n"
+                response += "      → Days 2-5: 250mg once daily\n\n"
+                
+                response += "   3. Ibuprofen 400mg (for inflammation)\n"
+                response += "      → Dosage: 400mg every 6-8 hours with food\n\n"
+                
+                response += "🏥 URGENT ACTIONS:\n"
+                response += "   • Consult doctor immediately\n"
+                response += "   • Blood culture if fever present\n"
+                response += "   • Chest X-ray if respiratory symptoms\n"
+                response += "   • Rule out leukemia (if very high or persistent)\n\n"
             
-            response += "─" * 60 + "\n\n"
-        
-        # General recommendations
-        response += "🌟 GENERAL HEALTH RECOMMENDATIONS:\n"
-        response += "   • Follow prescribed medication schedule strictly\n"
-        response += "   • Keep a health diary to track symptoms\n"
-        response += "   • Schedule follow-up tests as recommended\n"
-        response += "   • Maintain healthy diet and exercise routine\n"
-        response += "   • Avoid self-medication\n"
-        response += "   • Report any side effects to your doctor\n\n"
-        
-        response += "⚠️ MEDICAL DISCLAIMER:\n"
-        response += "This analysis is for informational purposes only.\n"
-        response += "Always consult qualified healthcare professionals before\n"
-        response += "starting any medication or treatment plan.\n"
+            elif status == 'low':
+                response += "⚠️ CONDITION: Leukopenia (Low White Blood Cells)\n\n"
+                response += "😷 SYMPTOMS:\n"
+                response += "   • Frequent infections\n"
+                response += "   • Fever and chills\n"
+                response += "   • Mouth sores and ulcers\n"
+                response += "   • Fatigue\n"
+                response += "   • Pneumonia or other infections\n\n"
+                
+                response += "💊 TREATMENT:\n"
+                response += "   1. G-CSF (Filgrastim) injection (if severe)\n"
+                response += "      → Stimulates white blood cell production\n"
+                response += "      → Administered by healthcare provider\n\n"
+                
+                response += "   2. Vitamin supplements:\n"
+                response += "      → Vitamin B12, Folate, Zinc\n"
+                response += "      → Boost immune system\n\n"
+                
+                response += "   3. Antibiotics (if infection develops)\n\n"
+                
+                response += "🏥 URGENT ACTIONS:\n"
+                response += "   • Consult hematologist\n"
+                response += "   • Avoid sick people and crowds\n"
+                response += "   • Practice strict hygiene\n"
+                response += "   • Monitor for signs of infection\n\n"
+        
+        elif test == 'creatinine':
+            if status == 'high':
+                response += "🔴 CONDITION: Elevated Creatinine / Possible Kidney Dysfunction\n\n"
+                response += "😷 SYMPTOMS:\n"
+                response += "   • Fatigue and weakness\n"
+                response += "   • Swelling in legs, ankles, feet (edema)\n"
+                response += "   • Decreased urine output\n"
+                response += "   • Shortness of breath\n"
+                response += "   • Nausea and vomiting\n"
+                response += "   • Confusion and difficulty concentrating\n"
+                response += "   • Chest pain or pressure\n\n"
+                
+                response += "💊 MEDICATIONS:\n"
+                response += "   1. ACE Inhibitors (Lisinopril) 5-40mg\n"
+                response += "      → Dosage: Start 5-10mg once daily\n"
+                response += "      → Protects kidneys, lowers blood pressure\n"
+                response += "      → Monitor potassium levels\n\n"
+                
+                response += "   2. Diuretics (Furosemide) 20-80mg\n"
+                response += "      → Dosage: 20-40mg once or twice daily\n"
+                response += "      → Reduces fluid retention\n"
+                response += "      → Take in morning to avoid nighttime urination\n\n"
+                
+                response += "   3. Sodium Bicarbonate 650mg\n"
+                response += "      → Dosage: 650mg 2-3 times daily\n"
+                response += "      → Reduces acid buildup\n\n"
+                
+                response += "🏥 URGENT ACTIONS:\n"
+                response += "   • Consult nephrologist immediately\n"
+                response += "   • Complete metabolic panel + eGFR\n"
+                response += "   • Kidney ultrasound\n"
+                response += "   • Reduce protein intake\n"
+                response += "   • Stop NSAIDs (ibuprofen, naproxen)\n"
+                response += "   • Control blood pressure and diabetes\n\n"
+        
+        elif test == 'alt' or test == 'ast':
+            if status == 'high':
+                response += "🔴 CONDITION: Elevated Liver Enzymes / Possible Liver Damage\n\n"
+                response += "😷 SYMPTOMS:\n"
+                response += "   • Fatigue and weakness\n"
+                response += "   • Jaundice (yellowing of skin/eyes)\n"
+                response += "   • Dark urine\n"
+                response += "   • Pale stools\n"
+                response += "   • Abdominal pain (right upper quadrant)\n"
+                response += "   • Nausea and vomiting\n"
+                response += "   • Loss of appetite\n"
+                response += "   • Easy bruising\n\n"
+                
+                response += "💊 TREATMENT:\n"
+                response += "   1. STOP all hepatotoxic substances:\n"
+                response += "      → Alcohol (complete abstinence)\n"
+                response += "      → Acetaminophen (Tylenol)\n"
+                response += "      → Certain antibiotics\n"
+                response += "      → Herbal supplements\n\n"
+                
+                response += "   2. Milk Thistle (Silymarin) 150-300mg\n"
+                response += "      → Dosage: 150mg 2-3 times daily\n"
+                response += "      → Liver protective supplement\n\n"
+                
+                response += "   3. Vitamin E 400-800 IU\n"
+                response += "      → Dosage: 400 IU once daily\n"
+                response += "      → Antioxidant for liver health\n\n"
+                
+                response += "   4. Ursodeoxycholic Acid (if prescribed)\n"
+                response += "      → For certain liver conditions\n\n"
+                
+                response += "🏥 URGENT ACTIONS:\n"
+                response += "   • Consult hepatologist immediately\n"
+                response += "   • Complete liver function panel\n"
+                response += "   • Hepatitis screening (A, B, C)\n"
+                response += "   • Liver ultrasound or FibroScan\n"
+                response += "   • Review all medications with doctor\n\n"
+        
+        # Add database medications if available
+        if db_info and 'medications' in db_info:
+            response += "📚 ADDITIONAL MEDICATIONS FROM DATABASE:\n"
+            for med in db_info['medications'].get(status, []):
+                response += f"   • {med}\n"
+            response += "\n"
         
         return response
     
-    def _get_test_info_from_db(self, test_name):
-        """Get test information from database"""
-        for test in self.lab_test_database.get('tests', []):
-            db_test_name = test['name'].lower().split('(')[0].strip()
+    def _build_test_index(self):
+        """Resolve every known result key to its database test once, at load time
+        
+        Keys are the parser's tests, the normal range keys and each test's
+        own key; anything else is resolved on first use and remembered.
+        """
+        # Lowercase names without the '(...)' qualifier, in database order
+        self._db_test_names = [(test['name'].lower().split('(')[0].strip(), test)
+                               for test in self.lab_test_database.get('tests', [])]
+        
+        keys = list(self.value_parser.tests) + list(self.normal_ranges)
+        keys += [test.get('key') or name.replace(' ', '_') for name, test in self._db_test_names]
+        return {key: self._match_test(key) for key in keys}
+    
+    def _match_test(self, test_name):
+        """First database test whose name contains the key, or is contained in it"""
+        for db_test_name, test in self._db_test_names:
             if test_name.replace('_', ' ') in db_test_name or db_test_name in test_name:
                 return test
         return None
     
+    def _get_test_info_from_db(self, test_name):
+        """Get test information from database"""
+        try:
+            return self.test_index[test_name]
+        except KeyError:
+            test = self.test_index[test_name] = self._match_test(test_name)
+            return test
+    
     def _determine_severity(self, abnormal_values):
         """Determine overall severity"""
         if len(abnormal_values) == 0:
@@ -738,6 +1142,7 @@ class LabAnalyzer:
         else:
             return 'severe'
     
+    @cached_fragment(key=lambda abnormal_values: tuple(sorted({item['test'] for item in abnormal_values})))
     def _get_recommendations(self, abnormal_values):
         """Get comprehensive lifestyle recommendations"""
         recommendations = [
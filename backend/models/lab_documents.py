@@ -0,0 +1,67 @@
+"""Page source for lab report uploads: images and (multi-page) PDFs.
+
+PDF pages are rasterized one at a time, only when they are requested, so a
+long document never has more than a few rendered pages in memory.
+"""
+import os
+
+import cv2
+import numpy as np
+
+PDF_EXTENSIONS = {'pdf'}
+
+
+def is_pdf(path):
+    return path.rsplit('.', 1)[-1].lower() in PDF_EXTENSIONS
+
+
+def _pymupdf():
+    try:
+        import pymupdf
+    except ImportError:
+        try:
+            import fitz as pymupdf  # PyMuPDF before 1.24
+        except ImportError:
+            raise RuntimeError("PDF lab reports need PyMuPDF (pip install pymupdf)")
+    return pymupdf
+
+
+def _open_pdf(path):
+    return _pymupdf().open(path)
+
+
+def count_pages(paths):
+    """Total number of pages across images (one page each) and PDFs"""
+    total = 0
+    for path in paths:
+        if is_pdf(path):
+            with _open_pdf(path) as document:
+                total += document.page_count
+        else:
+            total += 1
+    return total
+
+
+def iter_pages(paths, dpi=300, max_side=4000):
+    """Yield one page at a time: {'source', 'page', 'image'} with a grayscale image
+
+    PDF pages are rendered at ``dpi`` straight to grayscale, lowered if
+    needed so the longest side stays within ``max_side`` pixels.
+    """
+    for path in paths:
+        source = os.path.basename(path)
+        if not is_pdf(path):
+            image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise ValueError(f"Could not read image {source}")
+            yield {'source': source, 'page': 1, 'image': image}
+            continue
+
+        pymupdf = _pymupdf()
+        with pymupdf.open(path) as document:
+            for number, page in enumerate(document, start=1):
+                longest_inch = max(page.rect.width, page.rect.height) / 72
+                page_dpi = min(dpi, int(max_side / longest_inch)) if longest_inch else dpi
+                pixmap = page.get_pixmap(dpi=page_dpi, colorspace=pymupdf.csGRAY, alpha=False)
+                image = np.frombuffer(pixmap.samples, np.uint8).reshape(pixmap.height, pixmap.stride)
+                yield {'source': source, 'page': number, 'image': image[:, :pixmap.width].copy()}
@@ -0,0 +1,96 @@
+"""Layout analysis for lab report images.
+
+Finds text lines with morphology on a downsampled, binarized copy of the page
+and picks out the results table, so OCR only has to read those line crops
+instead of the whole page (logos, headers, footers, blank margins).
+"""
+import cv2
+import numpy as np
+
+
+def detect_text_lines(gray, max_width=1000, padding=4):
+    """Bounding boxes (x, y, w, h) of text lines in full-resolution pixels, top to bottom
+
+    Characters are smeared horizontally with a closing so each line becomes
+    one connected component; logos (too tall), rules (too flat) and specks
+    are dropped by size relative to the median line height, and pieces of the
+    same table row are joined.
+    """
+    height, width = gray.shape
+    scale = min(1.0, max_width / width)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+
+    _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+
+    kernel_width = max(9, small.shape[1] // 40)
+    smeared = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, 1)))
+    smeared = cv2.dilate(smeared, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 1)))
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(smeared, connectivity=8)
+    boxes = [tuple(stats[i, :4]) for i in range(1, count)
+             if stats[i, cv2.CC_STAT_HEIGHT] >= 4 and stats[i, cv2.CC_STAT_WIDTH] >= 8]
+    if not boxes:
+        return []
+
+    median_height = float(np.median([h for _, _, _, h in boxes]))
+    boxes = [box for box in boxes if 0.4 * median_height <= box[3] <= 2.5 * median_height]
+
+    lines = []
+    for x, y, w, h in _merge_rows(boxes):
+        x0 = max(0, int(x / scale) - padding)
+        y0 = max(0, int(y / scale) - padding)
+        x1 = min(width, int((x + w) / scale) + padding)
+        y1 = min(height, int((y + h) / scale) + padding)
+        lines.append((x0, y0, x1 - x0, y1 - y0))
+    return lines
+
+
+def _merge_rows(boxes):
+    """Join boxes that share a row (table columns) into one box per row, top to bottom"""
+    rows = []
+    for x, y, w, h in sorted(boxes, key=lambda box: box[1] + box[3] / 2):
+        if rows:
+            rx, ry, rw, rh = rows[-1]
+            overlap = min(ry + rh, y + h) - max(ry, y)
+            if overlap > 0.5 * min(rh, h):
+                x0, y0 = min(rx, x), min(ry, y)
+                rows[-1] = (x0, y0, max(rx + rw, x + w) - x0, max(ry + rh, y + h) - y0)
+                continue
+        rows.append((x, y, w, h))
+    return rows
+
+
+def find_table_region(lines, min_rows=3):
+    """Bounding box (x, y, w, h) of the block of lines forming the results table, or None
+
+    Lines are grouped into blocks separated by vertical gaps larger than two
+    median line heights; the block with the most lines is taken as the
+    table. Single-line blocks (titles, footers) never qualify.
+    """
+    if len(lines) < min_rows:
+        return None
+
+    median_height = float(np.median([h for _, _, _, h in lines]))
+    blocks = [[lines[0]]]
+    for line in lines[1:]:
+        previous = blocks[-1][-1]
+        if line[1] - (previous[1] + previous[3]) > 2 * median_height:
+            blocks.append([])
+        blocks[-1].append(line)
+
+    table = max(blocks, key=len)
+    if len(table) < min_rows:
+        return None
+
+    x0 = min(x for x, _, _, _ in table)
+    y0 = min(y for _, y, _, _ in table)
+    x1 = max(x + w for x, _, w, _ in table)
+    y1 = max(y + h for _, y, _, h in table)
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+def lines_in_region(lines, region):
+    """Lines whose vertical centre falls inside the region"""
+    _, ry, _, rh = region
+    return [line for line in lines if ry <= line[1] + line[3] / 2 <= ry + rh]
@@ -0,0 +1,170 @@
+"""Single-pass lab value parser.
+
+All synonyms are compiled into one regex, factored by common prefix like a
+trie, so the OCR text is scanned once however many tests and synonyms are
+loaded; each match is resolved to its tests through a lookup table.
+
+Unlike the previous per-pattern search, a label must start a word, so 'cr'
+is no longer read inside 'SCr' ('scr' is a synonym of its own instead).
+With only the built-in tests the single regex is about 1.3-1.4x slower than
+the per-pattern search on a long text; it pays off as the database adds
+tests (about 15x faster with 500 extra tests).
+"""
+import bisect
+import re
+
+# Built-in synonyms per test, in priority order (earlier synonyms win);
+# a trailing '(s)' makes the singular and plural one synonym
+DEFAULT_SYNONYMS = {
+    'glucose': ['glucose', 'blood sugar', 'fasting glucose', 'glu', 'bs'],
+    'cholesterol': ['total cholesterol', 'cholesterol', 'chol', 't.chol'],
+    'hdl': ['hdl cholesterol', 'hdl', 'hdl-c'],
+    'ldl': ['ldl cholesterol', 'ldl', 'ldl-c'],
+    'triglycerides': ['triglycerides', 'trig', 'tg'],
+    'hemoglobin': ['hemoglobin', 'haemoglobin', 'hgb', 'hb'],
+    'wbc': ['white blood cell(s)', 'wbc', 'leukocyte(s)', 'tc'],
+    'rbc': ['red blood cell(s)', 'rbc', 'erythrocyte(s)'],
+    'platelets': ['platelet(s)', 'plt', 'thrombocyte(s)'],
+    'creatinine': ['creatinine', 'creat', 'cr', 'scr'],
+    'alt': ['alt', 'sgpt', 'alanine aminotransferase'],
+    'ast': ['ast', 'sgot', 'aspartate aminotransferase']
+}
+
+_SEPARATORS = re.compile(r'[\s\-:]+')
+
+
+def normalize_label(label):
+    """Lowercase a label and treat whitespace, hyphens and colons alike ('HDL-C' == 'hdl c')"""
+    return ' '.join(word for word in _SEPARATORS.split(label.lower()) if word)
+
+
+def synonyms_from_database(lab_test_database):
+    """Synonym lists from lab_test_database.json
+
+    Each test may carry a ``synonyms`` list (written as in DEFAULT_SYNONYMS)
+    and a ``key`` naming the result field; without ``key`` the name is turned
+    into one the same way the normal ranges are keyed
+    ('WBC (White Blood Cells)' -> 'wbc').
+    """
+    synonyms = {}
+    for test in lab_test_database.get('tests', []):
+        if not test.get('synonyms'):
+            continue
+        key = test.get('key') or test['name'].lower().split('(')[0].strip().replace(' ', '_')
+        synonyms.setdefault(key, []).extend(test['synonyms'])
+    return synonyms
+
+
+def _trie_pattern(labels):
+    """Regex matching any of the labels, with shared prefixes factored out"""
+    trie = {}
+    for label in labels:
+        node = trie
+        for char in label:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = []
+        for char, child in sorted(node.items()):
+            if char:
+                branches.append((r'[\s\-:]+' if char == ' ' else re.escape(char)) + build(child))
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A label may end here: the longer continuation is still tried first
+        return f'(?:{pattern})?' if '' in node else pattern
+
+    return build(trie)
+
+
+class LabValueParser:
+    """Extracts lab values from OCR text in one linear scan"""
+
+    def __init__(self, synonyms=None, extra_synonyms=None):
+        # normalized label -> [(test, priority)]
+        self.table = {}
+        self.tests = []
+        self._priorities = {}
+        for source in (synonyms or DEFAULT_SYNONYMS, extra_synonyms or {}):
+            for test, labels in source.items():
+                if test not in self.tests:
+                    self.tests.append(test)
+                for label in labels:
+                    self._add(test, label)
+
+        # A label also counts for every synonym it ends with, as the
+        # per-pattern search did: 'ldl cholesterol' is read for 'cholesterol' too
+        self.matches = {}
+        for label in self.table:
+            words = label.split(' ')
+            self.matches[label] = [entry for start in range(len(words))
+                                   for entry in self.table.get(' '.join(words[start:]), ())]
+
+        # Label at the start of a word, then ':'/whitespace, then the number
+        self.pattern = re.compile(
+            rf'(?<![a-z.\-])({_trie_pattern(self.table)})[:\s]+(\d+\.?\d*)'
+        )
+
+    def _add(self, test, label):
+        label = normalize_label(label)
+        spellings = [label[:-3], label[:-3] + 's'] if label.endswith('(s)') else [label]
+        priority = self._priorities.get(test, 0)
+        added = False
+        for spelling in spellings:
+            entries = self.table.setdefault(spelling, [])
+            if all(existing != test for existing, _ in entries):
+                entries.append((test, priority))
+                added = True
+        if added:
+            self._priorities[test] = priority + 1
+
+    def candidates(self, text):
+        """First (value, offset) seen for each (test, synonym priority), in one pass over the text"""
+        found = {}
+        for match in self.pattern.finditer(text.lower()):
+            for entry in self.matches[normalize_label(match.group(1))]:
+                found.setdefault(entry, (match.group(2), match.start()))
+        return found
+
+    def _select(self, text, accept):
+        by_test = {}
+        for (test, priority), (raw, offset) in self.candidates(text).items():
+            by_test.setdefault(test, []).append((priority, raw, offset))
+
+        selected = {}
+        for test in self.tests:
+            for _, raw, offset in sorted(by_test.get(test, ())):
+                value = float(raw)
+                if accept is None or accept(test, value):
+                    selected[test] = (value, offset)
+                    break
+        return selected
+
+    def parse(self, text, accept=None):
+        """Map of test -> value
+
+        For each test, synonyms are tried in priority order using their first
+        occurrence; ``accept(test, value)`` can reject implausible values, in
+        which case the next synonym is tried.
+        """
+        return {test: value for test, (value, _) in self._select(text, accept).items()}
+
+    def parse_lines(self, lines, accept=None):
+        """Parse line-structured OCR output (dicts with ``text`` and ``bbox``)
+
+        Returns the values, as ``parse`` would for the joined text, and for
+        each test the line and bounding box it was read from.
+        """
+        starts = []
+        offset = 0
+        for line in lines:
+            starts.append(offset)
+            offset += len(line['text']) + 1
+
+        values, sources = {}, {}
+        for test, (value, position) in self._select('\n'.join(line['text'] for line in lines), accept).items():
+            index = bisect.bisect_right(starts, position) - 1
+            values[test] = value
+            sources[test] = {'line': index, 'text': lines[index]['text'], 'bbox': lines[index]['bbox']}
+        return values, sources
@@ -0,0 +1,130 @@
+"""Pre-flight quality gate for lab report images.
+
+Measures a small thumbnail in a few milliseconds so that blurry, badly
+exposed, tiny or non-document images are rejected with an actionable
+message before any preprocessing or OCR runs.
+"""
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# Gate name -> message shown to the user when it fires
+GATE_MESSAGES = {
+    'too_small': 'The image resolution is too low to read. Please upload a larger photo or scan.',
+    'too_dark': 'The image is too dark. Please retake the photo in better light.',
+    'overexposed': 'The image is overexposed. Please avoid glare or direct light on the report.',
+    'low_contrast': 'The image has too little contrast to read the text. Please retake it in even light.',
+    'blurry': 'The image is blurry. Please hold the camera steady and make sure the report is in focus.',
+    'not_a_document': 'This does not look like a lab report. Please upload a photo or scan of the report page.'
+}
+
+
+class QualityThresholds:
+    """Quality gate thresholds, configurable through LAB_QUALITY_* environment variables"""
+
+    def __init__(self):
+        self.min_side = int(os.getenv('LAB_QUALITY_MIN_SIDE', 400))
+        self.min_brightness = float(os.getenv('LAB_QUALITY_MIN_BRIGHTNESS', 60))
+        self.max_brightness = float(os.getenv('LAB_QUALITY_MAX_BRIGHTNESS', 230))
+        self.min_contrast = float(os.getenv('LAB_QUALITY_MIN_CONTRAST', 50))
+        self.min_sharpness = float(os.getenv('LAB_QUALITY_MIN_SHARPNESS', 100))
+        self.min_edge_density = float(os.getenv('LAB_QUALITY_MIN_EDGE_DENSITY', 0.005))
+        self.max_edge_density = float(os.getenv('LAB_QUALITY_MAX_EDGE_DENSITY', 0.25))
+        self.max_ink_ratio = float(os.getenv('LAB_QUALITY_MAX_INK_RATIO', 0.35))
+        self.max_stroke_spread = float(os.getenv('LAB_QUALITY_MAX_STROKE_SPREAD', 2.5))
+        self.thumbnail_side = int(os.getenv('LAB_QUALITY_THUMBNAIL', 512))
+
+
+class QualityGate:
+    """Thumbnail checks run in order; the first failing check rejects the image"""
+
+    def __init__(self, thresholds=None):
+        self.thresholds = thresholds or QualityThresholds()
+        self.checked = 0
+        self.fired = {gate: 0 for gate in GATE_MESSAGES}
+        self._lock = threading.Lock()
+
+    def measure(self, gray):
+        """Quality metrics of a grayscale image, computed on a thumbnail"""
+        height, width = gray.shape
+        scale = self.thresholds.thumbnail_side / max(height, width)
+        thumb = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+
+        edges = cv2.Canny(thumb, 50, 150)
+
+        # Printed text is a little dark ink on a light page, in strokes of
+        # near-constant width: twice the distance to the background along the
+        # stroke centres (local maxima of the distance transform). The spread
+        # is the 10th-90th percentile range over the median width.
+        _, ink = cv2.threshold(thumb, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        # Contrast is the gap between the mean ink and mean paper levels of
+        # that split, so a page with little text is not penalized for it
+        ink_pixels = np.count_nonzero(ink)
+        if 0 < ink_pixels < ink.size:
+            contrast = cv2.mean(thumb, mask=cv2.bitwise_not(ink))[0] - cv2.mean(thumb, mask=ink)[0]
+        else:
+            contrast = 0.0
+        distance = cv2.distanceTransform(ink, cv2.DIST_L2, 3)
+        centres = (distance > 0) & (distance >= cv2.dilate(distance, np.ones((3, 3), np.uint8)))
+        widths = 2 * distance[centres]
+        if widths.size:
+            p10, median, p90 = np.percentile(widths, [10, 50, 90])
+            stroke_spread = float((p90 - p10) / median)
+        else:
+            stroke_spread = 0.0
+
+        return {
+            'width': int(width),
+            'height': int(height),
+            'brightness': round(float(thumb.mean()), 2),
+            'contrast': round(float(contrast), 2),
+            'sharpness': round(float(cv2.Laplacian(thumb, cv2.CV_64F).var()), 2),
+            'edge_density': round(float(np.count_nonzero(edges)) / edges.size, 4),
+            'ink_ratio': round(float(ink_pixels) / ink.size, 4),
+            'stroke_spread': round(stroke_spread, 3)
+        }
+
+    def check(self, gray):
+        """Return {'passed', 'gate', 'message', 'metrics'} for an image"""
+        metrics = self.measure(gray)
+        t = self.thresholds
+
+        if min(metrics['width'], metrics['height']) < t.min_side:
+            gate = 'too_small'
+        elif metrics['brightness'] < t.min_brightness:
+            gate = 'too_dark'
+        elif metrics['contrast'] < t.min_contrast:
+            # Faint text is overexposure only on a page brighter than the limit
+            gate = 'overexposed' if metrics['brightness'] > t.max_brightness else 'low_contrast'
+        elif metrics['sharpness'] < t.min_sharpness:
+            gate = 'blurry'
+        elif (not t.min_edge_density <= metrics['edge_density'] <= t.max_edge_density
+              or metrics['ink_ratio'] > t.max_ink_ratio
+              or metrics['stroke_spread'] > t.max_stroke_spread):
+            gate = 'not_a_document'
+        else:
+            gate = None
+
+        with self._lock:
+            self.checked += 1
+            if gate:
+                self.fired[gate] += 1
+
+        return {
+            'passed': gate is None,
+            'gate': gate,
+            'message': GATE_MESSAGES.get(gate),
+            'metrics': metrics
+        }
+
+    def stats(self):
+        """How often each gate fired since startup"""
+        with self._lock:
+            return {
+                'checked': self.checked,
+                'rejected': sum(self.fired.values()),
+                'fired': dict(self.fired),
+                'rejection_rate': round(sum(self.fired.values()) / self.checked, 4) if self.checked else 0.0
+            }
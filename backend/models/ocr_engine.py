@@ -0,0 +1,293 @@
+"""Warm Tesseract OCR engine shared by the lab analyzer.
+
+Keeps a pool of long-lived, already-initialised Tesseract instances so each
+OCR call only recognises text: no process spawn, no temp files and no reload
+of the traineddata. Backends, in order of preference:
+
+- ``tesserocr``: Python bindings to the Tesseract C++ API
+- ``capi``: the Tesseract C API loaded from libtesseract through ctypes
+- ``cli``: pytesseract, one ``tesseract`` process per call (fallback only)
+
+Availability is probed once when the engine is created.
+"""
+import atexit
+import ctypes
+import ctypes.util
+import glob
+import os
+import queue
+from contextlib import contextmanager
+
+import numpy as np
+
+# Characters allowed in lab report text
+OCR_WHITELIST = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.:/-%() '
+
+
+class _CApiTesseract:
+    """One Tesseract instance driven through the C API (libtesseract) via ctypes"""
+
+    def __init__(self, lib, lang, datapath=None):
+        self.lib = lib
+        self.handle = lib.TessBaseAPICreate()
+        if lib.TessBaseAPIInit3(self.handle, datapath.encode() if datapath else None, lang.encode()) != 0:
+            lib.TessBaseAPIDelete(self.handle)
+            raise RuntimeError(f"Tesseract C API could not load language '{lang}'")
+
+    @staticmethod
+    def load_library(tesseract_cmd=None):
+        """Locate and load libtesseract, declaring the C signatures we use"""
+        candidates = []
+        found = ctypes.util.find_library('tesseract')
+        if found:
+            candidates.append(found)
+        candidates += ['libtesseract.so.5', 'libtesseract.so.4', 'libtesseract.dylib']
+        if tesseract_cmd and os.path.dirname(tesseract_cmd):
+            candidates += sorted(glob.glob(os.path.join(os.path.dirname(tesseract_cmd), 'libtesseract*.dll')))
+
+        lib = None
+        for name in candidates:
+            try:
+                lib = ctypes.CDLL(name)
+                break
+            except OSError:
+                continue
+        if lib is None:
+            raise OSError("libtesseract not found")
+
+        handle = ctypes.c_void_p
+        lib.TessBaseAPICreate.restype = handle
+        lib.TessBaseAPIDelete.argtypes = [handle]
+        lib.TessBaseAPIInit3.argtypes = [handle, ctypes.c_char_p, ctypes.c_char_p]
+        lib.TessBaseAPIInit3.restype = ctypes.c_int
+        lib.TessBaseAPISetPageSegMode.argtypes = [handle, ctypes.c_int]
+        lib.TessBaseAPISetVariable.argtypes = [handle, ctypes.c_char_p, ctypes.c_char_p]
+        lib.TessBaseAPISetVariable.restype = ctypes.c_int
+        lib.TessBaseAPISetImage.argtypes = [handle, ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                                            ctypes.c_int, ctypes.c_int]
+        lib.TessBaseAPIGetUTF8Text.argtypes = [handle]
+        lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p
+        lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIRecognize.argtypes = [handle, ctypes.c_void_p]
+        lib.TessBaseAPIRecognize.restype = ctypes.c_int
+        lib.TessBaseAPIGetTsvText.argtypes = [handle, ctypes.c_int]
+        lib.TessBaseAPIGetTsvText.restype = ctypes.c_void_p
+        lib.TessBaseAPIMeanTextConf.argtypes = [handle]
+        lib.TessBaseAPIMeanTextConf.restype = ctypes.c_int
+        lib.TessVersion.restype = ctypes.c_char_p
+        return lib
+
+    def _set_image(self, image, psm, whitelist):
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+
+        self.lib.TessBaseAPISetPageSegMode(self.handle, psm)
+        self.lib.TessBaseAPISetVariable(self.handle, b'tessedit_char_whitelist', (whitelist or '').encode())
+        self.lib.TessBaseAPISetImage(self.handle, image.ctypes.data, width, height, channels,
+                                     image.strides[0])
+
+    def _take_text(self, text_ptr):
+        if not text_ptr:
+            return ''
+        try:
+            return ctypes.string_at(text_ptr).decode('utf-8', errors='replace')
+        finally:
+            self.lib.TessDeleteText(text_ptr)
+
+    def recognize(self, image, psm, whitelist):
+        self._set_image(image, psm, whitelist)
+        return self._take_text(self.lib.TessBaseAPIGetUTF8Text(self.handle))
+
+    def recognize_data(self, image, psm, whitelist):
+        """Recognise once and return (text, tsv)"""
+        self._set_image(image, psm, whitelist)
+        self.lib.TessBaseAPIRecognize(self.handle, None)
+        text = self._take_text(self.lib.TessBaseAPIGetUTF8Text(self.handle))
+        return text, self._take_text(self.lib.TessBaseAPIGetTsvText(self.handle, 0))
+
+    def close(self):
+        if self.handle:
+            self.lib.TessBaseAPIDelete(self.handle)
+            self.handle = None
+
+
+class _TesserocrTesseract:
+    """One Tesseract instance from the tesserocr bindings"""
+
+    def __init__(self, lang, datapath=None):
+        import tesserocr
+        kwargs = {'lang': lang}
+        if datapath:
+            kwargs['path'] = datapath
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+
+    def recognize(self, image, psm, whitelist):
+        from PIL import Image
+        self.api.SetPageSegMode(psm)
+        self.api.SetVariable('tessedit_char_whitelist', whitelist or '')
+        self.api.SetImage(Image.fromarray(np.ascontiguousarray(image, dtype=np.uint8)))
+        return self.api.GetUTF8Text()
+
+    def recognize_data(self, image, psm, whitelist):
+        """Recognise once and return (text, tsv)"""
+        text = self.recognize(image, psm, whitelist)
+        return text, self.api.GetTSVText(0)
+
+    def close(self):
+        self.api.End()
+
+
+class OcrEngine:
+    """Pool of warm Tesseract instances with a pytesseract fallback"""
+
+    def __init__(self, pool_size=None, lang='eng', datapath=None, probe=True):
+        self.lang = lang
+        self.datapath = datapath or os.getenv('TESSDATA_PREFIX')
+        self.pool_size = pool_size or int(os.getenv('OCR_POOL_SIZE', 0)) or min(4, os.cpu_count() or 1)
+        self.backend = None
+        self.version = None
+        self._pool = queue.Queue()
+        self._instances = []
+        if probe:
+            self._probe()
+        if self._instances:
+            atexit.register(self.close)
+
+    @property
+    def available(self):
+        return self.backend is not None
+
+    def _probe(self):
+        """Pick the best available backend and warm up its instances"""
+        import pytesseract
+        tesseract_cmd = pytesseract.pytesseract.tesseract_cmd
+
+        try:
+            self._fill_pool(lambda: _TesserocrTesseract(self.lang, self.datapath))
+            import tesserocr
+            self.backend, self.version = 'tesserocr', tesserocr.tesseract_version().split()[1]
+            return
+        except Exception:
+            self._close_instances()
+
+        try:
+            lib = _CApiTesseract.load_library(tesseract_cmd)
+            self._fill_pool(lambda: _CApiTesseract(lib, self.lang, self.datapath))
+            self.backend, self.version = 'capi', lib.TessVersion().decode()
+            return
+        except Exception:
+            self._close_instances()
+
+        try:
+            self.version = str(pytesseract.get_tesseract_version())
+            self.backend = 'cli'
+        except Exception:
+            self.backend = None
+
+    def _fill_pool(self, factory):
+        for _ in range(self.pool_size):
+            instance = factory()
+            self._instances.append(instance)
+            self._pool.put(instance)
+
+    def _close_instances(self):
+        for instance in self._instances:
+            try:
+                instance.close()
+            except Exception:
+                pass
+        self._instances = []
+        self._pool = queue.Queue()
+
+    @contextmanager
+    def _instance(self):
+        instance = self._pool.get()
+        try:
+            yield instance
+        finally:
+            self._pool.put(instance)
+
+    def image_to_string(self, image, psm=6, whitelist=OCR_WHITELIST):
+        """Recognise text in an in-memory image (numpy array)"""
+        if self.backend is None:
+            raise RuntimeError("Tesseract OCR is not available")
+
+        if self.backend == 'cli':
+            import pytesseract
+            config = f'--oem 3 --psm {psm}'
+            if whitelist:
+                config += f' -c tessedit_char_whitelist={whitelist}'
+            return pytesseract.image_to_string(image, lang=self.lang, config=config)
+
+        with self._instance() as instance:
+            return instance.recognize(image, psm, whitelist)
+
+    def image_to_data(self, image, psm=6, whitelist=OCR_WHITELIST):
+        """Recognise text and word-level data (Tesseract TSV) in one pass
+
+        Returns a dict with ``text``, ``tsv``, ``word_confidences`` and
+        ``mean_confidence`` (0-100, averaged over recognised words).
+        """
+        if self.backend is None:
+            raise RuntimeError("Tesseract OCR is not available")
+
+        if self.backend == 'cli':
+            import pytesseract
+            config = f'--oem 3 --psm {psm}'
+            if whitelist:
+                config += f' -c tessedit_char_whitelist={whitelist}'
+            tsv = pytesseract.image_to_data(image, lang=self.lang, config=config)
+            text = tsv_to_text(tsv)
+        else:
+            with self._instance() as instance:
+                text, tsv = instance.recognize_data(image, psm, whitelist)
+
+        confidences = [word['conf'] for word in parse_tsv(tsv) if word['text'].strip()]
+        return {
+            'text': text,
+            'tsv': tsv,
+            'word_confidences': confidences,
+            'mean_confidence': round(sum(confidences) / len(confidences), 2) if confidences else 0.0
+        }
+
+    def close(self):
+        self._close_instances()
+
+
+def parse_tsv(tsv):
+    """Word rows (level 5) of Tesseract TSV output as dicts"""
+    words = []
+    for line in tsv.splitlines():
+        fields = line.split('\t')
+        if len(fields) < 12 or fields[0] != '5':
+            continue
+        try:
+            words.append({
+                'block': int(fields[2]),
+                'par': int(fields[3]),
+                'line': int(fields[4]),
+                'left': int(fields[6]),
+                'top': int(fields[7]),
+                'width': int(fields[8]),
+                'height': int(fields[9]),
+                'conf': float(fields[10]),
+                'text': fields[11]
+            })
+        except ValueError:
+            continue
+    return words
+
+
+def tsv_to_text(tsv):
+    """Rebuild plain text, one line per Tesseract text line, from TSV output"""
+    lines = []
+    current_key = None
+    for word in parse_tsv(tsv):
+        key = (word['block'], word['par'], word['line'])
+        if key != current_key:
+            lines.append([])
+            current_key = key
+        if word['text'].strip():
+            lines[-1].append(word['text'])
+    return '\n'.join(' '.join(words) for words in lines if words)
@@ -3,10 +3,34 @@ import numpy as np
 from PIL import Image
 import os
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from utils.response_cache import cached_fragment
+from .skin_inference import MicroBatcher, find_model_file, load_backend, to_probabilities
+
+# Bump whenever feature extraction, classification or the response format changes,
+# so near-duplicate uploads are not answered with results from older code
+SKIN_PIPELINE_VERSION = 2
 
 class SkinAnalyzer:
-    def __init__(self):
-        self.model_path = 'models_pretrained/skin_model.h5'
+    def __init__(self, inference_backend=None):
+        self.model_path = os.getenv('SKIN_MODEL_PATH', 'models_pretrained/skin_model.h5')
+        self.model_backend = os.getenv('SKIN_MODEL_BACKEND', 'auto')
+        self.quantize = os.getenv('SKIN_MODEL_QUANTIZE', '').lower() == 'int8'
+        self.batch_max_size = int(os.getenv('SKIN_BATCH_MAX_SIZE', 4))
+        self.batch_max_wait_ms = float(os.getenv('SKIN_BATCH_MAX_WAIT_MS', 5))
+        self.inference_timeout = float(os.getenv('SKIN_INFERENCE_TIMEOUT_SECONDS', 10))
+        self.duplicate_threshold = int(os.getenv('SKIN_DUPLICATE_THRESHOLD', 6))
+        self.roi_enabled = os.getenv('SKIN_ROI_ENABLED', 'true').lower() != 'false'
+        
+        # Tiled multi-threaded feature extraction for full-resolution images
+        self.tiled_mode = os.getenv('SKIN_TILED_MODE', 'auto').lower()  # auto | on | off
+        self.tiled_min_pixels = int(os.getenv('SKIN_TILED_MIN_PIXELS', 4000000))
+        self.tile_size = int(os.getenv('SKIN_TILE_SIZE', 1024))
+        self.tile_overlap = 16
+        self.tile_workers = int(os.getenv('SKIN_TILE_WORKERS', 0)) or os.cpu_count() or 1
+        self.inference_backend = inference_backend
+        self.inference = None
         self.skin_db_path = 'data/skin_images/skin_disease_database.json'
         
         # Load skin disease database
@@ -25,8 +49,10 @@ class SkinAnalyzer:
         
         # Build treatments from loaded data
         self.treatments = self._build_treatments()
+        self.medication_index = self._build_medication_index()
         
         self.load_model()
+        self.analyzer_version = self._analyzer_version()
     
     def _load_skin_database(self):
         """Load skin disease database from JSON file"""
@@ -78,25 +104,83 @@ class SkinAnalyzer:
         
         self.load_model()
     
+    def _analyzer_version(self):
+        """Identifies everything that affects an analysis result, for the near-duplicate cache"""
+        model = None
+        if self.inference is not None:
+            model_file = find_model_file(self.model_path) if self.inference_backend is None else None
+            model = {
+                'backend': self.inference.backend.name,
+                'file': model_file,
+                'mtime': os.path.getmtime(model_file) if model_file else None,
+                'quantize': self.quantize
+            }
+        return hashlib.sha1(json.dumps({
+            'pipeline': SKIN_PIPELINE_VERSION,
+            'roi': self.roi_enabled,
+            'model': model,
+            'database': self.skin_disease_database
+        }, sort_keys=True, default=str).encode()).hexdigest()[:12]
+    
     def load_model(self):
-        """Load the pre-trained model"""
+        """Load the pre-trained model into the CPU inference runtime"""
         try:
-            # In production, load actual TensorFlow/PyTorch model
-            # self.model = tf.keras.models.load_model(self.model_path)
-            print("Skin analysis model loaded (demo mode)")
+            backend = self.inference_backend
+            if backend is None:
+                model_file = find_model_file(self.model_path)
+                if model_file is None:
+                    print("Skin analysis model loaded (demo mode)")
+                    return
+                backend = load_backend(model_file, backend=self.model_backend, quantize=self.quantize)
+            
+            self.inference = MicroBatcher(
+                backend,
+                max_batch_size=self.batch_max_size,
+                max_wait_ms=self.batch_max_wait_ms,
+                timeout_seconds=self.inference_timeout
+            )
+            print(f"Skin analysis model loaded ({backend.name} backend, "
+                  f"batch<={self.batch_max_size}, wait<={self.batch_max_wait_ms}ms)")
         except Exception as e:
+            self.inference = None
             print(f"Model loading error: {e}")
             print("Running in demo mode with rule-based analysis")
     
     def preprocess_image(self, image_path):
         """Preprocess image for model input"""
         img = cv2.imread(image_path)
+        return np.expand_dims(self._prepare_model_input(img), axis=0)
+    
+    def _prepare_model_input(self, img):
+        """Convert a BGR image to a single (224, 224, 3) float32 model sample"""
         img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         img = cv2.resize(img, (224, 224))
-        img = img / 255.0
-        return np.expand_dims(img, axis=0)
+        return img.astype(np.float32) / 255.0
     
-    def analyze(self, image_path):
+    def _model_classification(self, img):
+        """Classify with the loaded model; returns None to fall back to rules"""
+        if self.inference is None:
+            return None
+        try:
+            probs = to_probabilities(self.inference.predict(self._prepare_model_input(img)))
+            predicted_class = int(np.argmax(probs))
+            if predicted_class not in self.diseases:
+                return None
+            return predicted_class, float(probs[predicted_class])
+        except TimeoutError:
+            print(f"⚠️ Model inference took over {self.inference_timeout:g}s; using rule-based analysis")
+            return None
+        except Exception as e:
+            print(f"Model inference error: {e}")
+            return None
+    
+    def compute_phash(self, gray):
+        """64-bit difference hash (dHash) of a grayscale image"""
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return int(''.join('1' if bit else '0' for bit in bits), 2)
+    
+    def analyze(self, image_path, user_id=None, image_cache=None):
         """Analyze skin condition from image with enhanced accuracy"""
         try:
             # Load and preprocess image
@@ -104,16 +188,48 @@ class SkinAnalyzer:
             if img is None:
                 raise Exception("Failed to load image")
             
-            # Multiple color space analysis
-            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-            lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             
-            # Enhanced feature extraction
-            features = self._extract_advanced_features(img, hsv, lab, gray)
+            # Near-duplicate of an earlier upload by the same user: reuse its result
+            phash = None
+            if image_cache is not None and user_id is not None:
+                phash = self.compute_phash(gray)
+                cached = image_cache.find(user_id, phash, self.duplicate_threshold, self.analyzer_version)
+                if cached is not None:
+                    response = dict(cached['result'])
+                    response['reused'] = True
+                    response['reused_from'] = {
+                        'id': cached['id'],
+                        'hash_distance': cached['distance'],
+                        'analyzed_at': cached['created_at']
+                    }
+                    return response
+            
+            # Restrict feature extraction to the lesion region
+            roi = self._detect_lesion_roi(img) if self.roi_enabled else None
+            if roi is not None:
+                x, y, w, h = roi['x'], roi['y'], roi['width'], roi['height']
+                region, region_gray = img[y:y + h, x:x + w], gray[y:y + h, x:x + w]
+            else:
+                region, region_gray = img, gray
             
-            # Multi-stage analysis
-            predicted_class, confidence = self._advanced_classification(features)
+            # Enhanced feature extraction
+            if self._use_tiled_extraction(region):
+                features = self._extract_tiled_features(region, region_gray)
+            else:
+                # Multiple color space analysis
+                hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
+                lab = cv2.cvtColor(region, cv2.COLOR_BGR2LAB)
+                features = self._extract_advanced_features(region, hsv, lab, region_gray)
+            
+            # Model prediction when available, rule-based engine as fallback
+            model_result = self._model_classification(img)
+            if model_result is not None:
+                predicted_class, confidence = model_result
+                engine = 'model'
+            else:
+                predicted_class, confidence = self._advanced_classification(features)
+                engine = 'rule_based'
             
             diagnosis = self.diseases[predicted_class]
             treatment = self.treatments[diagnosis]
@@ -138,11 +254,17 @@ class SkinAnalyzer:
                     'texture_quality': features['texture_quality'],
                     'border_regularity': features['border_regularity'],
                     'symmetry': features['symmetry'],
-                    'size_assessment': features['size_assessment']
+                    'size_assessment': features['size_assessment'],
+                    'roi': roi
                 },
-                'confidence_breakdown': features['confidence_factors']
+                'confidence_breakdown': features['confidence_factors'],
+                'analysis_engine': engine
             }
             
+            if phash is not None:
+                image_cache.store(user_id, phash, self.analyzer_version, features, response)
+            response['reused'] = False
+            
             return response
             
         except Exception as e:
@@ -154,6 +276,62 @@ class SkinAnalyzer:
                 'confidence': 0
             }
     
+    def _detect_lesion_roi(self, img, max_side=256, padding=0.15):
+        """Locate the lesion on a thumbnail and return its bounding box in full-resolution pixels"""
+        height, width = img.shape[:2]
+        scale = min(1.0, max_side / max(height, width))
+        if scale < 1.0:
+            thumb = cv2.resize(img, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            thumb = img
+        th, tw = thumb.shape[:2]
+        
+        # Lesions are darker and/or redder than the surrounding skin
+        l, a, _ = cv2.split(cv2.cvtColor(thumb, cv2.COLOR_BGR2LAB))
+        _, dark = cv2.threshold(l, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        _, red = cv2.threshold(a, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+        # Same Canny settings as feature extraction, dilated to close lesion borders
+        edges = cv2.Canny(cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY), 50, 150)
+        edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+        
+        mask = cv2.bitwise_or(cv2.bitwise_or(dark, red), edges)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+        
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+        
+        # Prefer the largest blob that does not run into the frame (background, clothing)
+        def touches_border(contour):
+            x, y, w, h = cv2.boundingRect(contour)
+            return x <= 1 or y <= 1 or x + w >= tw - 1 or y + h >= th - 1
+        
+        inner = [c for c in contours if not touches_border(c)]
+        largest = max(inner or contours, key=cv2.contourArea)
+        x, y, w, h = cv2.boundingRect(largest)
+        
+        # Too small to be a lesion or covering the whole frame: analyze everything
+        coverage = (w * h) / float(tw * th)
+        if coverage < 0.01 or coverage > 0.9:
+            return None
+        
+        pad_x, pad_y = int(w * padding), int(h * padding)
+        x0 = max(0, int((x - pad_x) / scale))
+        y0 = max(0, int((y - pad_y) / scale))
+        x1 = min(width, int(np.ceil((x + w + pad_x) / scale)))
+        y1 = min(height, int(np.ceil((y + h + pad_y) / scale)))
+        
+        return {
+            'x': x0,
+            'y': y0,
+            'width': x1 - x0,
+            'height': y1 - y0,
+            'coverage': round((x1 - x0) * (y1 - y0) / float(width * height), 4)
+        }
+    
     def _extract_advanced_features(self, img, hsv, lab, gray):
         """Extract comprehensive features for accurate analysis"""
         features = {}
@@ -192,6 +370,20 @@ class SkinAnalyzer:
         features['edge_strength'] = np.mean(edges[edges > 0]) if np.any(edges > 0) else 0
         
         # 5. Shape Analysis
+        self._add_shape_features(features, edges)
+        
+        # 6. Color Distribution
+        hist_h = cv2.calcHist([hsv], [0], None, [180], [0, 180])
+        hist_s = cv2.calcHist([hsv], [1], None, [256], [0, 256])
+        features['hue_entropy'] = self._calculate_entropy(hist_h)
+        features['saturation_entropy'] = self._calculate_entropy(hist_s)
+        
+        self._add_derived_features(features)
+        
+        return features
+    
+    def _add_shape_features(self, features, edges):
+        """Contour area, perimeter and circularity of the largest edge contour"""
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         if contours:
             largest_contour = max(contours, key=cv2.contourArea)
@@ -207,13 +399,9 @@ class SkinAnalyzer:
             features['contour_area'] = 0
             features['contour_perimeter'] = 0
             features['circularity'] = 0
-        
-        # 6. Color Distribution
-        hist_h = cv2.calcHist([hsv], [0], None, [180], [0, 180])
-        hist_s = cv2.calcHist([hsv], [1], None, [256], [0, 256])
-        features['hue_entropy'] = self._calculate_entropy(hist_h)
-        features['saturation_entropy'] = self._calculate_entropy(hist_s)
-        
+    
+    def _add_derived_features(self, features):
+        """Categorical descriptors and confidence factors from the raw statistics"""
         # 7. Derived Features
         features['color_uniformity'] = 'uniform' if features['std_saturation'] < 40 else 'varied'
         features['texture_quality'] = 'smooth' if features['texture_variance'] < 800 else 'rough'
@@ -227,9 +415,111 @@ class SkinAnalyzer:
             'feature_clarity': min(100, features['edge_strength'] * 2),
             'color_consistency': max(0, 100 - features['std_saturation'])
         }
-        
-        return features
     
+    def _use_tiled_extraction(self, img):
+        """Decide whether an image is large enough for tiled extraction"""
+        if self.tiled_mode == 'on':
+            return True
+        if self.tiled_mode == 'off':
+            return False
+        return img.shape[0] * img.shape[1] >= self.tiled_min_pixels
+
+    def _extract_tiled_features(self, img, gray):
+        """Extract the same features as _extract_advanced_features from overlapping tiles in parallel
+
+        Each tile returns partial sums, sums of squares and histograms over its
+        core (non-overlapping) area; the overlap only feeds the Sobel and
+        Laplacian neighbourhoods. Canny runs once on the whole frame alongside
+        the tiles, since its hysteresis follows edges across tile borders.
+        OpenCV releases the GIL, so the work runs concurrently in a thread pool.
+        """
+        height, width = gray.shape
+        step = self.tile_size
+        tiles = [(y, x, min(y + step, height), min(x + step, width))
+                 for y in range(0, height, step) for x in range(0, width, step)]
+
+        with ThreadPoolExecutor(max_workers=self.tile_workers) as pool:
+            canny = pool.submit(cv2.Canny, gray, 50, 150)
+            partials = list(pool.map(lambda t: self._tile_statistics(img, gray, *t), tiles))
+            edges = canny.result()
+
+        total = {}
+        for partial in partials:
+            for key, value in partial.items():
+                total[key] = total[key] + value if key in total else value
+
+        n = float(height * width)
+
+        def mean(key):
+            return total[key] / n
+
+        def std(key):
+            return np.sqrt(max(0.0, total[key + '_sq'] / n - mean(key) ** 2))
+
+        features = {}
+        features['avg_hue'] = mean('h')
+        features['avg_saturation'] = mean('s')
+        features['avg_value'] = mean('v')
+        features['std_hue'] = std('h')
+        features['std_saturation'] = std('s')
+        features['std_value'] = std('v')
+        features['avg_lightness'] = mean('l')
+        features['avg_a'] = mean('a')
+        features['avg_b'] = mean('b')
+        features['texture_variance'] = std('gray') ** 2
+        features['texture_complexity'] = std('laplacian') ** 2
+        features['avg_gradient'] = mean('gradient')
+        edge_count = np.count_nonzero(edges)
+        features['edge_density'] = edge_count / n
+        features['edge_strength'] = edges.sum(dtype=np.float64) / edge_count if edge_count else 0
+
+        self._add_shape_features(features, edges)
+
+        features['hue_entropy'] = self._calculate_entropy(total['hist_h'])
+        features['saturation_entropy'] = self._calculate_entropy(total['hist_s'])
+
+        self._add_derived_features(features)
+
+        return features
+
+    def _tile_statistics(self, img, gray, y0, x0, y1, x1):
+        """Partial feature statistics for one tile core [y0:y1, x0:x1]"""
+        pad = self.tile_overlap
+        height, width = gray.shape
+        py0, px0 = max(0, y0 - pad), max(0, x0 - pad)
+        py1, px1 = min(height, y1 + pad), min(width, x1 + pad)
+        core = (slice(y0 - py0, y1 - py0), slice(x0 - px0, x1 - px0))
+
+        stats = {}
+
+        # Per-pixel colour statistics only need the core
+        hsv = cv2.cvtColor(img[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+        lab = cv2.cvtColor(img[y0:y1, x0:x1], cv2.COLOR_BGR2LAB)
+        for name, channel in zip(('h', 's', 'v'), cv2.split(hsv)):
+            channel = channel.astype(np.float64)
+            stats[name] = channel.sum()
+            stats[name + '_sq'] = np.square(channel).sum()
+        for name, channel in zip(('l', 'a', 'b'), cv2.split(lab)):
+            stats[name] = channel.sum(dtype=np.float64)
+        stats['hist_h'] = cv2.calcHist([hsv], [0], None, [180], [0, 180])
+        stats['hist_s'] = cv2.calcHist([hsv], [1], None, [256], [0, 256])
+
+        # Neighbourhood operators run on the padded tile, measured on the core
+        padded = gray[py0:py1, px0:px1]
+        core_gray = padded[core].astype(np.float64)
+        stats['gray'] = core_gray.sum()
+        stats['gray_sq'] = np.square(core_gray).sum()
+
+        laplacian = cv2.Laplacian(padded, cv2.CV_64F)[core]
+        stats['laplacian'] = laplacian.sum()
+        stats['laplacian_sq'] = np.square(laplacian).sum()
+
+        sobelx = cv2.Sobel(padded, cv2.CV_64F, 1, 0, ksize=3)[core]
+        sobely = cv2.Sobel(padded, cv2.CV_64F, 0, 1, ksize=3)[core]
+        stats['gradient'] = np.sqrt(sobelx**2 + sobely**2).sum()
+
+        return stats
+
     def _calculate_texture_complexity(self, gray):
         """Calculate texture complexity"""
         # Use Laplacian variance as texture measure
@@ -390,14 +680,13 @@ class SkinAnalyzer:
         else:
             return 'mild'
     
-    def _get_detailed_medications(self, diagnosis):
-        """Get detailed medication list from database"""
-        medications = []
+    def _build_medication_index(self):
+        """Condition name -> medication list, database entries first, then defaults"""
+        index = {}
         
-        # Try to get from loaded database
+        # First database entry with a given name wins, as with a linear scan
         for condition in self.skin_disease_database.get('conditions', []):
-            if condition['name'] == diagnosis:
-                return condition.get('medications', [])
+            index.setdefault(condition['name'], condition.get('medications', []))
         
         # Fallback to default
         default_meds = {
@@ -410,8 +699,16 @@ class SkinAnalyzer:
             'Fungal Infection': ['Clotrimazole 1% cream', 'Miconazole 2% cream', 'Terbinafine 1% cream', 'Fluconazole 150mg (oral)']
         }
         
-        return default_meds.get(diagnosis, [])
+        for diagnosis, medications in default_meds.items():
+            index.setdefault(diagnosis, medications)
+        
+        return index
+    
+    def _get_detailed_medications(self, diagnosis):
+        """Get detailed medication list from database"""
+        return self.medication_index.get(diagnosis, [])
     
+    @cached_fragment()
     def _get_symptoms_for_condition(self, diagnosis):
         """Get symptoms associated with skin condition"""
         symptoms_map = {
@@ -483,6 +780,7 @@ class SkinAnalyzer:
         
         return symptoms_map.get(diagnosis, ['Consult dermatologist for proper diagnosis'])
     
+    @cached_fragment(key=lambda diagnosis, severity, medications: (diagnosis, severity))
     def _get_comprehensive_treatment(self, diagnosis, severity, medications):
         """Get comprehensive treatment plan with medications and dosages"""
         if diagnosis == 'Healthy Skin':
@@ -697,6 +995,7 @@ class SkinAnalyzer:
         
         return treatment
     
+    @cached_fragment()
     def _get_recommendations(self, diagnosis):
         """Get additional recommendations"""
         general_tips = [
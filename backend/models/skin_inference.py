@@ -0,0 +1,323 @@
+"""CPU inference runtime for the skin classification model.
+
+A backend wraps one converted model file (ONNX, TFLite, Keras or a small
+NumPy weight archive) behind ``predict(batch)``. ``MicroBatcher`` sits in
+front of a backend and merges concurrent requests into one forward pass.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+# Extensions tried next to the configured model path, in order of preference
+MODEL_EXTENSIONS = ['.onnx', '.tflite', '.h5', '.keras', '.npz']
+
+
+class InferenceBackend:
+    """Base class for model backends"""
+    name = 'base'
+
+    def predict(self, batch):
+        """Run one forward pass over a (N, H, W, C) float32 batch"""
+        raise NotImplementedError
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime backend (CPU execution provider)"""
+    name = 'onnx'
+
+    def __init__(self, model_path, quantize=False, num_threads=None):
+        import onnxruntime as ort
+
+        if quantize:
+            model_path = self._quantized_copy(model_path)
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _quantized_copy(self, model_path):
+        """Dynamically quantize weights to int8 once and reuse the file"""
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        quantized_path = os.path.splitext(model_path)[0] + '.int8.onnx'
+        if not os.path.exists(quantized_path) or \
+                os.path.getmtime(quantized_path) < os.path.getmtime(model_path):
+            quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: batch.astype(np.float32)})[0]
+
+
+class TFLiteBackend(InferenceBackend):
+    """TFLite interpreter backend (tflite_runtime or full TensorFlow)"""
+    name = 'tflite'
+
+    def __init__(self, model_path=None, model_content=None, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, model_content=model_content,
+                                       num_threads=num_threads)
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self.input_index, batch.astype(np.float32))
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+class KerasBackend(InferenceBackend):
+    """Keras .h5 backend, optionally converted to an int8 TFLite model in memory"""
+    name = 'keras'
+
+    def __init__(self, model_path, quantize=False, num_threads=None):
+        import tensorflow as tf
+
+        model = tf.keras.models.load_model(model_path, compile=False)
+        self._tflite = None
+        if quantize:
+            converter = tf.lite.TFLiteConverter.from_keras_model(model)
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            self._tflite = TFLiteBackend(model_content=converter.convert(), num_threads=num_threads)
+            self.name = 'keras-tflite-int8'
+        else:
+            if num_threads:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            self.model = model
+
+    def predict(self, batch):
+        if self._tflite is not None:
+            return self._tflite.predict(batch)
+        return np.asarray(self.model(batch.astype(np.float32), training=False))
+
+
+class NumpyBackend(InferenceBackend):
+    """Small pooled MLP stored as a .npz archive
+
+    Needs nothing beyond NumPy, so it doubles as the randomly initialised
+    model used to exercise the runtime on CPU-only machines.
+    """
+    name = 'numpy'
+
+    def __init__(self, weights, pool_size=16, quantize=False):
+        self.pool_size = int(pool_size)
+        self.b1 = np.asarray(weights['b1'], dtype=np.float32)
+        self.b2 = np.asarray(weights['b2'], dtype=np.float32)
+        self.quantized = quantize
+        if quantize:
+            self.w1, self.s1 = self._quantize(weights['w1'])
+            self.w2, self.s2 = self._quantize(weights['w2'])
+        else:
+            self.w1 = np.asarray(weights['w1'], dtype=np.float32)
+            self.w2 = np.asarray(weights['w2'], dtype=np.float32)
+
+    @classmethod
+    def from_file(cls, model_path, quantize=False):
+        with np.load(model_path) as data:
+            weights = {key: data[key] for key in ('w1', 'b1', 'w2', 'b2')}
+            pool_size = int(data['pool_size']) if 'pool_size' in data else 16
+        return cls(weights, pool_size=pool_size, quantize=quantize)
+
+    @classmethod
+    def random(cls, num_classes=8, input_shape=(224, 224, 3), hidden=64, pool_size=16,
+               seed=0, quantize=False):
+        """Build a randomly initialised model with the skin model's input/output shape"""
+        rng = np.random.default_rng(seed)
+        height, width, channels = input_shape
+        n_inputs = (height // pool_size) * (width // pool_size) * channels
+        weights = {
+            'w1': rng.normal(0, 1 / np.sqrt(n_inputs), (n_inputs, hidden)),
+            'b1': np.zeros(hidden),
+            'w2': rng.normal(0, 1 / np.sqrt(hidden), (hidden, num_classes)),
+            'b2': np.zeros(num_classes)
+        }
+        return cls(weights, pool_size=pool_size, quantize=quantize)
+
+    def save(self, model_path):
+        w1 = self.w1.astype(np.float32) * self.s1 if self.quantized else self.w1
+        w2 = self.w2.astype(np.float32) * self.s2 if self.quantized else self.w2
+        np.savez(model_path, w1=w1, b1=self.b1, w2=w2, b2=self.b2, pool_size=self.pool_size)
+
+    @staticmethod
+    def _quantize(weight):
+        """Symmetric per-output-channel int8 quantization"""
+        weight = np.asarray(weight, dtype=np.float32)
+        scale = np.abs(weight).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        return np.round(weight / scale).astype(np.int8), scale.astype(np.float32)
+
+    def predict(self, batch):
+        n, height, width, channels = batch.shape
+        p = self.pool_size
+        pooled = batch[:, :height // p * p, :width // p * p].astype(np.float32)
+        pooled = pooled.reshape(n, height // p, p, width // p, p, channels).mean(axis=(2, 4))
+        x = pooled.reshape(n, -1)
+
+        if self.quantized:
+            hidden = (x @ self.w1.astype(np.float32)) * self.s1 + self.b1
+        else:
+            hidden = x @ self.w1 + self.b1
+        hidden = np.maximum(hidden, 0)
+
+        if self.quantized:
+            logits = (hidden @ self.w2.astype(np.float32)) * self.s2 + self.b2
+        else:
+            logits = hidden @ self.w2 + self.b2
+        return to_probabilities(logits)
+
+
+def find_model_file(model_path):
+    """Return the configured model file or a converted sibling with the same stem"""
+    if os.path.exists(model_path):
+        return model_path
+    stem = os.path.splitext(model_path)[0]
+    for ext in MODEL_EXTENSIONS:
+        if os.path.exists(stem + ext):
+            return stem + ext
+    return None
+
+
+def load_backend(model_path, backend='auto', quantize=False, num_threads=None):
+    """Create an inference backend for a model file"""
+    if backend == 'auto':
+        ext = os.path.splitext(model_path)[1].lower()
+        backend = {
+            '.onnx': 'onnx',
+            '.tflite': 'tflite',
+            '.h5': 'keras',
+            '.keras': 'keras',
+            '.npz': 'numpy'
+        }.get(ext)
+        if backend is None:
+            raise ValueError(f"Unsupported model format: {model_path}")
+
+    if backend == 'onnx':
+        return OnnxBackend(model_path, quantize=quantize, num_threads=num_threads)
+    if backend == 'tflite':
+        # TFLite models are quantized when converted, not at load time
+        return TFLiteBackend(model_path=model_path, num_threads=num_threads)
+    if backend == 'keras':
+        return KerasBackend(model_path, quantize=quantize, num_threads=num_threads)
+    if backend == 'numpy':
+        return NumpyBackend.from_file(model_path, quantize=quantize)
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+
+def to_probabilities(output):
+    """Apply softmax unless the output already looks like a probability vector"""
+    output = np.asarray(output, dtype=np.float32)
+    sums = output.sum(axis=-1, keepdims=True)
+    if np.all(output >= 0) and np.allclose(sums, 1.0, atol=1e-3):
+        return output
+    shifted = output - output.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class MicroBatcher:
+    """Collect concurrent requests into batches for one forward pass
+
+    A batch is flushed when it reaches ``max_batch_size`` or when the first
+    queued request has waited ``max_wait_ms``, whichever comes first.
+    ``predict`` gives up after ``timeout_seconds`` so a stuck worker cannot
+    hold a request forever.
+    """
+
+    def __init__(self, backend, max_batch_size=4, max_wait_ms=5.0, timeout_seconds=10.0):
+        self.backend = backend
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.timeout = float(timeout_seconds)
+        self.stats = {'batches': 0, 'samples': 0, 'max_batch': 0}
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='skin-micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, sample):
+        """Queue a single (H, W, C) sample and return a Future for its output row"""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        if not self._thread.is_alive():
+            raise RuntimeError("MicroBatcher worker is not running")
+        future = Future()
+        self._queue.put((np.asarray(sample, dtype=np.float32), future))
+        return future
+
+    def predict(self, sample, timeout=None):
+        """Blocking helper around ``submit``; raises TimeoutError after ``timeout`` (default: the batcher's)"""
+        future = self.submit(sample)
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError("Skin model inference timed out")
+
+    def close(self):
+        """Stop the worker after draining queued requests"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stop = False
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch):
+        # Requests that already timed out were cancelled: skip them
+        batch = [(sample, future) for sample, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        futures = [future for _, future in batch]
+        try:
+            outputs = self.backend.predict(np.stack([sample for sample, _ in batch]))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        self.stats['batches'] += 1
+        self.stats['samples'] += len(batch)
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+        for future, output in zip(futures, outputs):
+            future.set_result(output)
@@ -1,14 +1,50 @@
-import librosa
 import numpy as np
 import soundfile as sf
 import os
 import json
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils.response_cache import cached_fragment
+from .sound_features import extract_signal_features, StreamingFeatures
+from .sound_events import EventDetector, frame_rms, extract_event_features
+from .audio_io import AudioLoader
+
+# Analyzer of each analyze_batch worker process
+_batch_analyzer = None
+
+
+def _init_batch_worker():
+    global _batch_analyzer
+    _batch_analyzer = SoundAnalyzer()
+
+
+def _analyze_in_worker(audio_path):
+    return _batch_analyzer.analyze(audio_path)
+
 
 class SoundAnalyzer:
     def __init__(self):
         self.model_path = 'models_pretrained/sound_model.h5'
         self.respiratory_db_path = 'data/respiratory_sounds/respiratory_database.json'
         
+        # Decoder: soundfile / ffmpeg to float32 mono, resampled only when needed
+        self.audio_loader = AudioLoader()
+        
+        # Recordings longer than this are decoded and analyzed block by block,
+        # with a timeline of segment summaries
+        self.stream_seconds = float(os.getenv('SOUND_STREAM_SECONDS', 300))
+        self.timeline_seconds = float(os.getenv('SOUND_TIMELINE_SECONDS', 30))
+        
+        # Silence trimming: spectral features only run on detected cough/breath events
+        if os.getenv('SOUND_EVENT_DETECTION', 'true').lower() == 'true':
+            self.event_detector = EventDetector()
+        else:
+            self.event_detector = None
+        
+        # Worker processes for analyze_batch (0 = one per CPU)
+        self.batch_workers = int(os.getenv('SOUND_BATCH_WORKERS', 0)) or os.cpu_count() or 1
+        
         # Load respiratory database
         self.respiratory_database = self._load_respiratory_database()
         
@@ -24,6 +60,10 @@ class SoundAnalyzer:
         # Build treatments from loaded data
         self.treatments = self._build_treatments()
         
+        # Set by warmup(); the app reports ready only after it
+        self.ready = False
+        self.warmup_seconds = None
+        
         self.load_model()
     
     def _load_respiratory_database(self):
@@ -83,34 +123,59 @@ class SoundAnalyzer:
         except Exception as e:
             print(f"Model loading error: {e}")
     
+    def warmup(self):
+        """Analyze a short synthetic recording so the first real request does not pay for
+        lazy imports, numba compilation, resampler and filter setup; returns the seconds taken"""
+        start = time.perf_counter()
+        
+        # 3 s of breathing noise with one cough, at a rate that needs resampling
+        rate = 44100 if self.audio_loader.target_rate(44100) != 44100 else 48000
+        rng = np.random.default_rng(0)
+        t = np.arange(3 * rate) / rate
+        y = 0.005 * rng.standard_normal(t.size)
+        cough = (t >= 1) & (t < 1.3)
+        y[cough] += 0.3 * np.exp(-(t[cough] - 1) / 0.08) * rng.standard_normal(cough.sum())
+        
+        fd, path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        try:
+            sf.write(path, y.astype(np.float32), rate)
+            # Upload path (decode, events, features, rules) and streaming path
+            result = self.analyze(path)
+            if 'error' in result:
+                raise RuntimeError(result['error'])
+            self.extract_features_streaming(path, block_seconds=1.0)
+        finally:
+            os.remove(path)
+        
+        self.warmup_seconds = round(time.perf_counter() - start, 3)
+        self.ready = True
+        return self.warmup_seconds
+    
     def extract_features(self, audio_path):
         """Extract audio features for analysis"""
         try:
-            # Load audio file
-            y, sr = librosa.load(audio_path, sr=22050)
+            # Long recordings never get loaded whole
+            duration = self.audio_loader.duration(audio_path)
+            if duration and duration > self.stream_seconds:
+                return self.extract_features_streaming(audio_path)
             
-            # Extract features
-            features = {}
-            
-            # MFCCs (Mel-frequency cepstral coefficients)
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            features['mfcc_mean'] = np.mean(mfccs, axis=1)
-            features['mfcc_std'] = np.std(mfccs, axis=1)
-            
-            # Spectral features
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)
-            features['spectral_centroid_mean'] = np.mean(spectral_centroids)
-            
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
-            features['spectral_rolloff_mean'] = np.mean(spectral_rolloff)
+            # Load audio file
+            y, sr = self.audio_loader.load(audio_path)
             
-            # Zero crossing rate
-            zcr = librosa.feature.zero_crossing_rate(y)
-            features['zcr_mean'] = np.mean(zcr)
+            if self.event_detector is not None:
+                # One cheap RMS pass finds the events; silence never reaches the STFT
+                rms = frame_rms(y)
+                events = self.event_detector.detect(rms, sr, len(y))
+                if events:
+                    return extract_event_features(y, sr, events, rms)
             
-            # RMS Energy
-            rms = librosa.feature.rms(y=y)
-            features['rms_mean'] = np.mean(rms)
+            # MFCCs, spectral centroid/rolloff, zero crossing rate and RMS
+            # energy, all from one framing and one STFT of the signal
+            features = extract_signal_features(y, sr)
+            if self.event_detector is not None:
+                # Nothing stood out from the background: the whole recording is analyzed
+                features['events'] = []
             
             return features
             
@@ -118,6 +183,14 @@ class SoundAnalyzer:
             print(f"Feature extraction error: {e}")
             return None
     
+    def extract_features_streaming(self, audio_path, block_seconds=10.0):
+        """Extract the same features block by block in constant memory, plus a timeline"""
+        blocks, sr = self.audio_loader.stream(audio_path, block_seconds)
+        stream = StreamingFeatures(sr, segment_seconds=self.timeline_seconds)
+        for block in blocks:
+            stream.update(block)
+        return stream.finish()
+    
     def analyze(self, audio_path):
         """Analyze respiratory sound"""
         try:
@@ -127,46 +200,97 @@ class SoundAnalyzer:
             if features is None:
                 raise Exception("Failed to extract audio features")
             
-            # In production, use actual model prediction
-            # prediction = self.model.predict(features)
-            # predicted_class = np.argmax(prediction)
-            # confidence = float(prediction[predicted_class])
-            
-            # Demo mode: Rule-based analysis
-            predicted_class, confidence = self._rule_based_analysis(features)
-            
-            diagnosis = self.conditions[predicted_class]
-            treatment = self.treatments[diagnosis]
-            
-            # Determine severity
-            if predicted_class == 0:
-                severity = 'none'
-            elif predicted_class in [1, 2, 5]:
-                severity = 'moderate'
-            else:
-                severity = 'severe'
-            
-            return {
-                'diagnosis': diagnosis,
-                'confidence': round(confidence * 100, 2),
-                'treatment': treatment,
-                'severity': severity,
-                'recommendations': self._get_recommendations(diagnosis),
-                'audio_features': {
-                    'spectral_centroid': float(features['spectral_centroid_mean']),
-                    'rms_energy': float(features['rms_mean']),
-                    'zero_crossing_rate': float(features['zcr_mean'])
-                }
-            }
+            return self.analyze_features(features)
             
         except Exception as e:
-            return {
-                'error': str(e),
-                'diagnosis': 'Analysis failed',
-                'treatment': 'Please upload a clear audio recording of breathing or coughing',
-                'severity': 'unknown',
-                'confidence': 0
+            return self._error_result(str(e))
+    
+    def analyze_batch(self, audio_paths, workers=None):
+        """analyze for many recordings, in order, spread over worker processes
+        
+        Feature extraction is CPU-bound numpy/FFT work, so clips are analyzed
+        in parallel by ``workers`` processes (default ``batch_workers``),
+        each with its own analyzer; one worker analyzes them in this process.
+        """
+        workers = min(workers or self.batch_workers, len(audio_paths))
+        if workers <= 1:
+            return [self.analyze(audio_path) for audio_path in audio_paths]
+        
+        # Several clips per task keep the inter-process overhead small
+        chunksize = max(1, len(audio_paths) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker) as pool:
+            return list(pool.map(_analyze_in_worker, audio_paths, chunksize=chunksize))
+    
+    def _error_result(self, message):
+        return {
+            'error': message,
+            'diagnosis': 'Analysis failed',
+            'treatment': 'Please upload a clear audio recording of breathing or coughing',
+            'severity': 'unknown',
+            'confidence': 0
+        }
+    
+    def analyze_features(self, features):
+        """Diagnosis, treatment and recommendations from extracted features"""
+        # In production, use actual model prediction
+        # prediction = self.model.predict(features)
+        # predicted_class = np.argmax(prediction)
+        # confidence = float(prediction[predicted_class])
+        
+        # Demo mode: Rule-based analysis
+        predicted_class, confidence = self._rule_based_analysis(features)
+        
+        diagnosis = self.conditions[predicted_class]
+        treatment = self.treatments[diagnosis]
+        
+        # Determine severity
+        if predicted_class == 0:
+            severity = 'none'
+        elif predicted_class in [1, 2, 5]:
+            severity = 'moderate'
+        else:
+            severity = 'severe'
+        
+        result = {
+            'diagnosis': diagnosis,
+            'confidence': round(confidence * 100, 2),
+            'treatment': treatment,
+            'severity': severity,
+            'recommendations': self._get_recommendations(diagnosis),
+            'audio_features': {
+                'spectral_centroid': float(features['spectral_centroid_mean']),
+                'rms_energy': float(features['rms_mean']),
+                'zero_crossing_rate': float(features['zcr_mean'])
+            }
+        }
+        
+        # Streamed recordings: the same rules per segment
+        if 'timeline' in features:
+            result['audio_features']['duration'] = features['duration']
+            result['timeline'] = [self._segment_entry(segment) for segment in features['timeline']]
+        
+        # Detected cough/breath events, each read with the same rules
+        if 'events' in features:
+            result['events'] = {
+                'count': len(features['events']),
+                'seconds': round(sum(event['end'] - event['start'] for event in features['events']), 2),
+                'items': [self._segment_entry(event) for event in features['events']]
             }
+        
+        return result
+    
+    def _segment_entry(self, segment):
+        """Rule-based reading of one timeline segment or sound event"""
+        predicted_class, confidence = self._rule_based_analysis(segment)
+        return {
+            'start': segment['start'],
+            'end': segment['end'],
+            'diagnosis': self.conditions[predicted_class],
+            'confidence': round(confidence * 100, 2),
+            'spectral_centroid': segment['spectral_centroid_mean'],
+            'rms_energy': segment['rms_mean'],
+            'zero_crossing_rate': segment['zcr_mean']
+        }
     
     def _rule_based_analysis(self, features):
         """Simple rule-based analysis for demo"""
@@ -185,6 +309,7 @@ class SoundAnalyzer:
         else:
             return 0, 0.80  # Default to healthy
     
+    @cached_fragment()
     def _get_recommendations(self, diagnosis):
         """Get comprehensive health recommendations"""
         general_tips = [
@@ -0,0 +1,109 @@
+"""Energy-based detection of cough and breath events in a recording.
+
+One cheap pass computes the RMS of every analysis frame from a cumulative
+sum of squares. Frames louder than the recording's noise floor by
+``SOUND_EVENT_THRESHOLD_DB`` are sound; runs of them, closed over short gaps
+and padded a little, are the events. Silence and background noise between
+events never reach the STFT, so feature extraction costs scale with how
+much is going on in a recording rather than with its length.
+"""
+import os
+
+import numpy as np
+
+from .sound_features import N_FFT, HOP_LENGTH, frame_features, summarize_features
+
+
+def frame_rms(y, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    """RMS of the same centred frames the features use, without framing the signal"""
+    padded = np.pad(np.asarray(y, dtype=np.float32), n_fft // 2)
+    n_frames = 1 + (len(padded) - n_fft) // hop_length
+    if n_fft % hop_length == 0:
+        # A frame is n_fft / hop_length whole hops: add up per-hop energies
+        hops = n_frames - 1 + n_fft // hop_length
+        blocks = padded[:hops * hop_length].reshape(hops, hop_length)
+        hop_energy = np.einsum('ij,ij->i', blocks, blocks, dtype=np.float64)
+        energy = np.concatenate(([0.0], np.cumsum(hop_energy)))
+        steps = n_fft // hop_length
+        frame_energy = energy[steps:steps + n_frames] - energy[:n_frames]
+    else:
+        energy = np.concatenate(([0.0], np.cumsum(np.square(padded, dtype=np.float64))))
+        starts = np.arange(n_frames) * hop_length
+        frame_energy = energy[starts + n_fft] - energy[starts]
+    return np.sqrt(np.maximum(frame_energy, 0.0) / n_fft).astype(np.float32)
+
+
+class EventDetector:
+    """Find sound events from frame RMS; settings come from SOUND_EVENT_* environment variables"""
+
+    def __init__(self, hop_length=HOP_LENGTH):
+        self.hop_length = hop_length
+        self.threshold_db = float(os.getenv('SOUND_EVENT_THRESHOLD_DB', 10))
+        self.min_level_db = float(os.getenv('SOUND_EVENT_MIN_LEVEL_DB', -50))
+        self.noise_percentile = float(os.getenv('SOUND_EVENT_NOISE_PERCENTILE', 20))
+        self.min_seconds = float(os.getenv('SOUND_EVENT_MIN_SECONDS', 0.1))
+        self.gap_seconds = float(os.getenv('SOUND_EVENT_GAP_SECONDS', 0.3))
+        self.pad_seconds = float(os.getenv('SOUND_EVENT_PAD_SECONDS', 0.1))
+
+    def detect(self, rms, sr, n_samples):
+        """Events as (start_sample, end_sample) pairs, in order and not overlapping"""
+        level = 20 * np.log10(np.maximum(rms, 1e-10))
+        # Quiet frames set the noise floor; events must stand out from it
+        threshold = max(np.percentile(level, self.noise_percentile) + self.threshold_db, self.min_level_db)
+        active = np.concatenate(([0], (level > threshold).astype(np.int8), [0]))
+        edges = np.flatnonzero(np.diff(active))
+        runs = list(zip(edges[::2], edges[1::2]))  # [first, last + 1) frames
+
+        # Close short gaps, then drop what is still too short to be an event
+        gap = self.gap_seconds * sr / self.hop_length
+        merged = []
+        for first, end in runs:
+            if merged and first - merged[-1][1] < gap:
+                merged[-1][1] = end
+            else:
+                merged.append([first, end])
+        min_frames = self.min_seconds * sr / self.hop_length
+        merged = [run for run in merged if run[1] - run[0] >= min_frames]
+
+        # Frame j is centred on sample j * hop_length; pad and clip to the signal
+        pad = int(self.pad_seconds * sr)
+        events = []
+        for first, end in merged:
+            start = max(0, first * self.hop_length - pad)
+            stop = min(n_samples, (end - 1) * self.hop_length + pad)
+            if events and start <= events[-1][1]:
+                events[-1] = (events[-1][0], stop)
+            elif stop > start:
+                events.append((start, stop))
+        return events
+
+
+def extract_event_features(y, sr, events, rms):
+    """Recording-level features from the detected events only, plus a summary per event
+
+    MFCCs, spectral centroid and rolloff and zero-crossing rate are pooled
+    over the frames of all events. RMS stays the mean over the whole
+    recording (``rms``, from ``frame_rms``), the overall loudness the
+    analysis rules expect.
+    """
+    frames = []
+    summaries = []
+    for start, stop in events:
+        event = frame_features(y[start:stop], sr)
+        frames.append(event)
+        summaries.append({
+            'start': round(start / sr, 2),
+            'end': round(stop / sr, 2),
+            'spectral_centroid_mean': float(np.mean(event['centroid'])),
+            'spectral_rolloff_mean': float(np.mean(event['rolloff'])),
+            'zcr_mean': float(np.mean(event['zcr'])),
+            'rms_mean': float(np.mean(event['rms'])),
+            'rms_peak': float(np.max(event['rms']))
+        })
+
+    pooled = {name: np.concatenate([event[name] for event in frames], axis=-1) for name in frames[0]}
+    features = summarize_features(pooled)
+    features['rms_mean'] = np.mean(rms)
+    features['duration'] = round(len(y) / sr, 2)
+    features['events'] = summaries
+    return features
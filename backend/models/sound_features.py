@@ -0,0 +1,316 @@
+"""Respiratory sound features from a single framing of the signal.
+
+The signal is cut into centred frames once. RMS and zero-crossing rate are
+read from that framing directly, and one float32 magnitude STFT of the same
+frames gives the mel spectrogram / MFCCs, spectral centroid and rolloff, so
+the transform runs once per recording instead of once per feature. Values
+match the separate librosa feature calls with their default frame length,
+hop and padding, within float32 tolerance.
+
+``StreamingFeatures`` computes the same features block by block with running
+statistics, so memory stays constant however long the recording is.
+"""
+import copy
+from functools import lru_cache
+
+import librosa
+import numpy as np
+import scipy.fft
+
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 13
+TOP_DB = 80.0
+
+# Per-frame feature -> prefix of its summary keys
+SUMMARY_NAMES = {
+    'mfcc': 'mfcc',
+    'centroid': 'spectral_centroid',
+    'rolloff': 'spectral_rolloff',
+    'zcr': 'zcr',
+    'rms': 'rms'
+}
+
+
+@lru_cache(maxsize=8)
+def _mel_basis(sr, n_fft, n_mels):
+    return librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels, dtype=np.float32)
+
+
+@lru_cache(maxsize=8)
+def _window(n_fft):
+    return librosa.filters.get_window('hann', n_fft, fftbins=True).astype(np.float32)
+
+
+def _is_negative(y):
+    # Samples within 1e-10 of zero count as positive, as in librosa.zero_crossings
+    return np.asarray(y) < -1e-10
+
+
+def frame_signal(y, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    """Centred frames, shape (n_fft, n_frames), zero-padded at both ends like librosa"""
+    padded = np.pad(np.asarray(y, dtype=np.float32), n_fft // 2)
+    return librosa.util.frame(padded, frame_length=n_fft, hop_length=hop_length)
+
+
+def _block_features(padded, negative, sr, n_fft, hop_length, n_mfcc, db_max=None):
+    """Features of every complete frame of an already padded stretch of signal
+
+    ``negative`` is the sign mask of the same stretch, edge-padded as librosa
+    does for the zero-crossing rate. Log-mel values are floored ``TOP_DB``
+    below ``db_max`` (or the maximum of this stretch); the maximum actually
+    used is returned with the features, which also carry each frame's
+    loudest log-mel value (``mel_max``).
+    """
+    # One frame per row: each row is a contiguous stretch of the signal
+    frames = np.swapaxes(librosa.util.frame(padded, frame_length=n_fft, hop_length=hop_length), -1, -2)
+    n_frames = frames.shape[-2]
+
+    # Time-domain features straight from the frames
+    rms = np.sqrt(np.einsum('...ij,...ij->...i', frames, frames) / n_fft)
+    changes = np.cumsum(negative[..., 1:] != negative[..., :-1], axis=-1)
+    crossings = np.concatenate((np.zeros(changes.shape[:-1] + (1,), dtype=changes.dtype), changes), axis=-1)
+    starts = np.arange(n_frames) * hop_length
+    zcr = (crossings[..., starts + n_fft - 1] - crossings[..., starts]).astype(np.float32) / n_fft
+
+    # One magnitude STFT for every spectral feature
+    spectrum = np.abs(scipy.fft.rfft(frames * _window(n_fft), axis=-1))
+    mel = np.square(spectrum) @ _mel_basis(sr, n_fft, N_MELS).T
+    log_mel = 10.0 * np.log10(np.maximum(1e-10, mel))
+    mel_max = log_mel.max(axis=-1)
+    db_max = mel_max.max(axis=-1) if db_max is None else np.maximum(db_max, mel_max.max(axis=-1))
+    log_mel = np.maximum(log_mel, np.asarray(db_max - TOP_DB)[..., None, None])
+    mfcc = np.swapaxes(scipy.fft.dct(log_mel, axis=-1, type=2, norm='ortho')[..., :n_mfcc], -1, -2)
+
+    # Centroid: magnitude-weighted mean frequency (0 for silent frames)
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft).astype(np.float32)
+    total = spectrum.sum(axis=-1)
+    centroid = (spectrum @ freqs) / np.where(total > np.finfo(np.float32).tiny, total, 1)
+
+    # Rolloff: lowest frequency below which 85% of the magnitude lies
+    cumulative = np.cumsum(spectrum, axis=-1)
+    rolloff = freqs[np.argmax(cumulative >= 0.85 * cumulative[..., -1:], axis=-1)]
+
+    return {
+        'mfcc': mfcc,
+        'centroid': centroid,
+        'rolloff': rolloff,
+        'zcr': zcr,
+        'rms': rms,
+        'mel_max': mel_max
+    }, db_max
+
+
+def frame_features(y, sr, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mfcc=N_MFCC):
+    """Per-frame features: mfcc (n_mfcc, n_frames); centroid, rolloff, zcr and rms (n_frames,)"""
+    y = np.asarray(y, dtype=np.float32)
+    padded = np.pad(y, n_fft // 2)
+    negative = np.pad(_is_negative(y), n_fft // 2, mode='edge')
+    features = _block_features(padded, negative, sr, n_fft, hop_length, n_mfcc)[0]
+    del features['mel_max']
+    return features
+
+
+def summarize_features(frames):
+    """Recording-level features, as SoundAnalyzer.extract_features returns them"""
+    return {
+        'mfcc_mean': np.mean(frames['mfcc'], axis=1),
+        'mfcc_std': np.std(frames['mfcc'], axis=1),
+        'spectral_centroid_mean': np.mean(frames['centroid']),
+        'spectral_rolloff_mean': np.mean(frames['rolloff']),
+        'zcr_mean': np.mean(frames['zcr']),
+        'rms_mean': np.mean(frames['rms'])
+    }
+
+
+def extract_signal_features(y, sr):
+    """Recording-level features of a mono signal"""
+    return summarize_features(frame_features(y, sr))
+
+
+class RunningStats:
+    """Mean and standard deviation over the last axis, merged batch by batch (Chan et al.)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape[-1] == 0:
+            return
+        mean = values.mean(axis=-1)
+        self.merge(values.shape[-1], mean, np.square(values - mean[..., None]).sum(axis=-1))
+
+    def merge(self, count, mean, m2):
+        """Add a batch given by its size, mean and sum of squared deviations"""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / total
+        self.m2 = self.m2 + m2 + np.square(delta) * self.count * count / total
+        self.count = total
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.count) if self.count else 0.0
+
+
+class FeatureStats:
+    """Running means and stds of per-frame features"""
+
+    def __init__(self, names=SUMMARY_NAMES):
+        self.stats = {name: RunningStats() for name in names}
+
+    def update(self, features):
+        for name, stats in self.stats.items():
+            stats.update(features[name])
+
+    def summary(self):
+        summary = {}
+        for name, stats in self.stats.items():
+            prefix = SUMMARY_NAMES[name]
+            summary[f'{prefix}_mean'] = np.float32(stats.mean)
+            summary[f'{prefix}_std'] = np.float32(stats.std)
+        return summary
+
+
+class StreamingFeatures:
+    """Block-by-block feature extraction with constant memory
+
+    Feed float32 mono blocks of any size to ``update`` and call ``finish``
+    at the end. Frames are the same centred frames ``frame_features`` uses;
+    only the samples of frames not yet complete are kept between blocks.
+
+    MFCCs floor the log-mel spectrum 80 dB below the loudest value of the
+    whole recording, which is only known at the end. Frames entirely below
+    the floor so far (silence) are counted and added at the end with the
+    final floor, exactly as the whole-signal path computes them; frames
+    only partly below it use the running maximum, which can differ slightly
+    if the recording gets much louder later on.
+
+    With ``segment_seconds``, a summary per segment is kept for a timeline.
+    """
+
+    def __init__(self, sr, segment_seconds=None, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mfcc=N_MFCC):
+        self.sr = sr
+        self.segment_seconds = segment_seconds
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mfcc = n_mfcc
+
+        self.total = FeatureStats()
+        self.timeline = []
+        self._floored_frames = 0
+        self._segment = None
+        self._segment_index = 0
+
+        self._signal = None
+        self._negative = None
+        self._last_negative = False
+        self._frames_done = 0
+        self._samples = 0
+        self._db_max = None
+
+    @property
+    def seconds(self):
+        """Audio received so far, in seconds"""
+        return self._samples / self.sr
+
+    def update(self, block):
+        block = np.asarray(block, dtype=np.float32)
+        if block.size == 0:
+            return
+        negative = _is_negative(block)
+        if self._signal is None:
+            # Centre the first frame: zeros before the signal, edge padding for ZCR
+            half = self.n_fft // 2
+            self._signal = np.zeros(half, dtype=np.float32)
+            self._negative = np.full(half, negative[0])
+        self._signal = np.concatenate((self._signal, block))
+        self._negative = np.concatenate((self._negative, negative))
+        self._last_negative = negative[-1]
+        self._samples += block.size
+        self._process()
+
+    def finish(self):
+        """Recording-level summary (as ``extract_signal_features``, plus stds), or None if empty"""
+        if self._signal is None:
+            return None
+        half = self.n_fft // 2
+        self._signal = np.concatenate((self._signal, np.zeros(half, dtype=np.float32)))
+        self._negative = np.concatenate((self._negative, np.full(half, self._last_negative)))
+        self._process()
+        self._close_segment()
+        return self.summary()
+
+    def summary(self):
+        """Summary of the frames computed so far, or None before the first complete frame
+
+        Before ``finish`` this leaves out the last half frame received and the
+        segment still open.
+        """
+        if not self._frames_done:
+            return None
+        summary = self.total.summary()
+        if self._floored_frames:
+            # Entirely floored frames: a constant log-mel spectrum at the current floor
+            floor = max(-100.0, self._db_max - TOP_DB)
+            mfcc = copy.copy(self.total.stats['mfcc'])
+            mfcc.merge(self._floored_frames,
+                       scipy.fft.dct(np.full(N_MELS, floor), type=2, norm='ortho')[:self.n_mfcc],
+                       np.zeros(self.n_mfcc))
+            summary['mfcc_mean'], summary['mfcc_std'] = np.float32(mfcc.mean), np.float32(mfcc.std)
+        summary['duration'] = round(self.seconds, 2)
+        if self.segment_seconds:
+            summary['timeline'] = list(self.timeline)
+        return summary
+
+    def _process(self):
+        """Compute every complete frame in the buffer and keep the overlap"""
+        available = len(self._signal)
+        if available < self.n_fft:
+            return
+        n_frames = 1 + (available - self.n_fft) // self.hop_length
+        used = (n_frames - 1) * self.hop_length + self.n_fft
+        features, self._db_max = _block_features(
+            self._signal[:used], self._negative[:used], self.sr,
+            self.n_fft, self.hop_length, self.n_mfcc, self._db_max
+        )
+        floored = features['mel_max'] <= max(-100.0, self._db_max - TOP_DB)
+        self._floored_frames += int(floored.sum())
+        self.total.update({**features, 'mfcc': features['mfcc'][:, ~floored]})
+        if self.segment_seconds:
+            self._update_segments(features, n_frames)
+
+        consumed = n_frames * self.hop_length
+        self._signal = self._signal[consumed:]
+        self._negative = self._negative[consumed:]
+        self._frames_done += n_frames
+
+    def _update_segments(self, features, n_frames):
+        # Frame j is centred on sample j * hop_length
+        times = (self._frames_done + np.arange(n_frames)) * self.hop_length / self.sr
+        segments = (times // self.segment_seconds).astype(int)
+        for index in np.unique(segments):
+            if self._segment is not None and index != self._segment_index:
+                self._close_segment()
+            if self._segment is None:
+                # The timeline carries no MFCCs
+                self._segment = FeatureStats([name for name in SUMMARY_NAMES if name != 'mfcc'])
+                self._segment_index = int(index)
+            mask = segments == index
+            self._segment.update({name: values[..., mask] for name, values in features.items()})
+
+    def _close_segment(self):
+        if self._segment is None:
+            return
+        summary = self._segment.summary()
+        start = self._segment_index * self.segment_seconds
+        self.timeline.append({
+            'start': round(start, 2),
+            'end': round(min(start + self.segment_seconds, self._samples / self.sr), 2),
+            **{key: float(value) for key, value in summary.items()}
+        })
+        self._segment = None
@@ -0,0 +1,130 @@
+"""Live respiratory sound analysis from audio chunks sent while recording.
+
+A client opens a stream with its sample rate and PCM format, posts raw PCM
+chunks as they are recorded and gets a provisional analysis back every
+``SOUND_PROVISIONAL_SECONDS`` of audio; closing the stream returns the final
+result right away, since every chunk was already analyzed on arrival. Only
+running feature statistics are kept, never the recording itself.
+
+Streams live in the memory of one server process: run a single worker, or
+route a stream's requests to the same worker.
+"""
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from .sound_features import StreamingFeatures
+
+# Raw PCM formats accepted for chunks -> (dtype, scale to [-1, 1])
+PCM_FORMATS = {
+    'f32le': (np.dtype('<f4'), 1.0),
+    's16le': (np.dtype('<i2'), 1.0 / 32768)
+}
+
+
+class SoundStream:
+    """One live recording: PCM chunks in, provisional and final analyses out"""
+
+    def __init__(self, analyzer, user_id, sample_rate, pcm_format='f32le'):
+        if pcm_format not in PCM_FORMATS:
+            raise ValueError(f"Unsupported PCM format '{pcm_format}' (use {', '.join(PCM_FORMATS)})")
+        if not 8000 <= sample_rate <= 192000:
+            raise ValueError(f"Unsupported sample rate {sample_rate}")
+
+        self.analyzer = analyzer
+        self.user_id = user_id
+        self.dtype, self.scale = PCM_FORMATS[pcm_format]
+        self.resampler = analyzer.audio_loader.resampler(sample_rate)
+        self.sample_rate = analyzer.audio_loader.target_rate(sample_rate)
+        self.features = StreamingFeatures(self.sample_rate, segment_seconds=analyzer.timeline_seconds)
+
+        self.provisional_seconds = float(os.getenv('SOUND_PROVISIONAL_SECONDS', 5))
+        self.last_provisional = 0.0
+        self.last_active = time.monotonic()
+        self.lock = threading.Lock()
+        self._remainder = b''
+
+    def feed(self, data):
+        """Add a chunk of raw PCM; returns a provisional analysis when one is due, else None"""
+        self.last_active = time.monotonic()
+        # A chunk may end in the middle of a sample; keep those bytes for the next one
+        data = self._remainder + data
+        usable = len(data) - len(data) % self.dtype.itemsize
+        self._remainder = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=self.dtype).astype(np.float32)
+        if self.scale != 1.0:
+            samples *= self.scale
+        if self.resampler is not None:
+            samples = self.resampler.resample_chunk(samples)
+        self.features.update(samples)
+
+        if self.features.seconds - self.last_provisional < self.provisional_seconds:
+            return None
+        self.last_provisional = self.features.seconds
+        return self.provisional()
+
+    def provisional(self):
+        """Analysis of the audio so far, or None before the first complete frame"""
+        features = self.features.summary()
+        if features is None:
+            return None
+        result = self.analyzer.analyze_features(features)
+        result['provisional'] = True
+        return result
+
+    def finish(self):
+        """Final analysis of the whole recording"""
+        if self.resampler is not None:
+            self.features.update(self.resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+        features = self.features.finish()
+        if features is None:
+            raise ValueError("The recording is too short to analyze")
+        result = self.analyzer.analyze_features(features)
+        result['provisional'] = False
+        return result
+
+
+class SoundStreamRegistry:
+    """Open streams by id; streams idle for longer than the timeout are dropped"""
+
+    def __init__(self, analyzer, max_streams=None, idle_seconds=None):
+        self.analyzer = analyzer
+        self.max_streams = max_streams or int(os.getenv('SOUND_STREAM_MAX_OPEN', 50))
+        self.idle_seconds = idle_seconds or float(os.getenv('SOUND_STREAM_IDLE_SECONDS', 120))
+        self.streams = {}
+        self._lock = threading.Lock()
+
+    def open(self, user_id, sample_rate, pcm_format='f32le'):
+        """Start a stream and return its id"""
+        stream = SoundStream(self.analyzer, user_id, sample_rate, pcm_format)
+        with self._lock:
+            self._expire()
+            if len(self.streams) >= self.max_streams:
+                raise RuntimeError("Too many live recordings in progress; please try again shortly")
+            stream_id = uuid.uuid4().hex
+            self.streams[stream_id] = stream
+        return stream_id
+
+    def get(self, stream_id, user_id):
+        """The user's open stream with this id, or None"""
+        with self._lock:
+            self._expire()
+            stream = self.streams.get(stream_id)
+        return stream if stream is not None and stream.user_id == user_id else None
+
+    def close(self, stream_id, user_id):
+        """Remove and return the user's stream, or None"""
+        with self._lock:
+            stream = self.streams.get(stream_id)
+            if stream is None or stream.user_id != user_id:
+                return None
+            return self.streams.pop(stream_id)
+
+    def _expire(self):
+        now = time.monotonic()
+        for stream_id in [stream_id for stream_id, stream in self.streams.items()
+                          if now - stream.last_active > self.idle_seconds]:
+            del self.streams[stream_id]
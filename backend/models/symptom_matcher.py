@@ -0,0 +1,136 @@
+"""Single-pass symptom detection for chat messages.
+
+Every symptom name and synonym is compiled once into an Aho-Corasick
+automaton, so a message is scanned a single time however large the symptom
+vocabulary grows. Matches must start and end on word boundaries ('rash' is
+not found in 'crash'); a few inflections are let through at the end
+('coughing', 'headaches').
+"""
+import re
+
+# Built-in synonyms per symptom; only used for symptoms the database knows
+DEFAULT_SYNONYMS = {
+    'fever': ['high temperature', 'running a temperature', 'pyrexia', 'feverish'],
+    'headache': ['head ache', 'head hurts', 'head is pounding'],
+    'cough': ['coughing'],
+    'sore throat': ['throat pain', 'throat hurts', 'scratchy throat'],
+    'shortness of breath': ['short of breath', 'breathless', 'difficulty breathing', 'trouble breathing'],
+    'chest pain': ['chest hurts', 'pain in my chest'],
+    'stomach pain': ['stomach ache', 'stomachache', 'tummy ache', 'belly pain'],
+    'nausea': ['nauseous', 'nauseated', 'queasy'],
+    'vomiting': ['throwing up', 'threw up', 'vomit'],
+    'diarrhea': ['diarrhoea', 'loose stools'],
+    'dizziness': ['dizzy', 'lightheaded', 'light headed'],
+    'fatigue': ['tired', 'exhausted', 'exhaustion'],
+    'itching': ['itchy', 'itch'],
+    'back pain': ['backache', 'back ache'],
+    'joint pain': ['joint ache', 'aching joints'],
+    'muscle pain': ['muscle ache', 'body aches', 'myalgia'],
+    'runny nose': ['running nose'],
+    'congestion': ['stuffy nose', 'blocked nose', 'congested'],
+    'sneezing': ['sneeze']
+}
+
+# Endings allowed after a symptom before the closing word boundary
+SUFFIXES = ('s', 'es', 'ing', 'ed', 'y', 'ish')
+
+_SEPARATORS = re.compile(r'[\s_\-]+')
+
+
+def normalize_symptom(text):
+    """Lowercase and treat whitespace, underscores and hyphens alike ('Sore_Throat' == 'sore throat')"""
+    return _SEPARATORS.sub(' ', text.lower()).strip()
+
+
+def synonyms_from_database(disease_database):
+    """Synonym lists from disease_database.json
+
+    The database may carry a ``symptom_synonyms`` object mapping a symptom
+    name to a list of other ways of saying it.
+    """
+    synonyms = {}
+    for symptom, phrases in disease_database.get('symptom_synonyms', {}).items():
+        synonyms.setdefault(normalize_symptom(symptom), []).extend(phrases)
+    return synonyms
+
+
+class SymptomMatcher:
+    """Finds known symptoms in a message in one linear scan"""
+
+    def __init__(self, symptoms, synonyms=None, extra_synonyms=None):
+        # Results come back in the order the symptoms were given
+        self.symptoms = list(dict.fromkeys(symptoms))
+        known = {symptom: index for index, symptom in enumerate(self.symptoms)}
+
+        # normalized phrase -> indexes of the symptoms it stands for
+        phrases = {}
+        for index, symptom in enumerate(self.symptoms):
+            phrases.setdefault(normalize_symptom(symptom), set()).add(index)
+        for source in (DEFAULT_SYNONYMS if synonyms is None else synonyms, extra_synonyms or {}):
+            for symptom, labels in source.items():
+                index = known.get(normalize_symptom(symptom))
+                if index is None:
+                    continue
+                for label in labels:
+                    phrases.setdefault(normalize_symptom(label), set()).add(index)
+        phrases.pop('', None)
+        self.phrase_count = len(phrases)
+        self._build(phrases)
+
+    def _build(self, phrases):
+        # Trie of all phrases; outputs are (phrase length, symptom indexes)
+        self._goto = [{}]
+        self._outputs = [[]]
+        for phrase, indexes in phrases.items():
+            state = 0
+            for char in phrase:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._outputs.append([])
+                state = next_state
+            self._outputs[state].append((len(phrase), tuple(sorted(indexes))))
+
+        # Failure links breadth first; a state also reports its failure state's phrases
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+                queue.append(child)
+
+    def _ends_word(self, text, end):
+        """End of a word at ``end``, possibly after one of SUFFIXES"""
+        if end >= len(text) or not text[end].isalnum():
+            return True
+        for suffix in SUFFIXES:
+            stop = end + len(suffix)
+            if text.startswith(suffix, end) and (stop >= len(text) or not text[stop].isalnum()):
+                return True
+        return False
+
+    def find(self, message):
+        """Symptoms mentioned in the message, each once, in vocabulary order"""
+        text = normalize_symptom(message)
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found = set()
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not outputs[state]:
+                continue
+            end = position + 1
+            for length, indexes in outputs[state]:
+                start = end - length
+                if (start == 0 or not text[start - 1].isalnum()) and self._ends_word(text, end):
+                    found.update(indexes)
+        return [self.symptoms[index] for index in sorted(found)]
@@ -220,6 +220,7 @@ def download_lab_test_data():
             {
                 'name': 'Glucose (Fasting)',
                 'unit': 'mg/dL',
+                'synonyms': ['fbs', 'fbg', 'fasting blood sugar'],
                 'normal_range': {'min': 70, 'max': 100},
                 'interpretation': {
                     'low': {'range': '<70', 'meaning': 'Hypoglycemia', 'action': 'Eat glucose, consult doctor'},
@@ -290,6 +291,7 @@ def download_lab_test_data():
             {
                 'name': 'WBC (White Blood Cells)',
                 'unit': 'cells/mcL',
+                'synonyms': ['wbc count', 'tlc', 'total leukocyte count'],
                 'normal_range': {'min': 4000, 'max': 11000},
                 'interpretation': {
                     'low': {'range': '<4000', 'meaning': 'Leukopenia', 'action': 'Investigate cause, boost immunity'},
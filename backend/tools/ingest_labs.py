@@ -0,0 +1,219 @@
+"""
+Bulk-ingest a directory of scanned lab reports without going through the HTTP API.
+
+Every image or PDF under the directory is one report. Reports are analyzed
+by LabAnalyzer in a process pool; results are written to health_records (with
+their raw OCR) in batched transactions and streamed as NDJSON. Each committed
+file is recorded in lab_ingest_checkpoint in the same transaction, so a run
+that crashes or is interrupted resumes where it stopped.
+
+Usage: python -m backend.tools.ingest_labs <dir> --user 1 [--db medical_assistant.db] [--workers 4] [--output results.ndjson]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db as database
+from database.ocr_store import LabOcrStore
+from utils.helpers import allowed_file
+
+STAGES = ('render', 'quality', 'ocr', 'analysis')
+
+_analyzer = None
+_ocr_store = None
+_user_id = None
+
+
+def _init_worker(db_path, user_id):
+    """One analyzer per worker process, with a single Tesseract instance"""
+    global _analyzer, _ocr_store, _user_id
+    # Parallelism comes from the processes; keep each one single-threaded
+    os.environ.setdefault('OCR_POOL_SIZE', '1')
+    os.environ.setdefault('LAB_PAGE_WORKERS', '1')
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    sys.stdout = open(os.devnull, 'w')
+    from models.lab_analyzer import LabAnalyzer
+    _analyzer = LabAnalyzer()
+    # Pages already OCR'd (e.g. in an earlier run) are parsed from the stored OCR instead
+    _ocr_store = LabOcrStore(sqlite3.connect(db_path, timeout=30))
+    _user_id = user_id
+
+
+def _find_ocr(image_hash, ocr_version):
+    return _ocr_store.find(image_hash, ocr_version, user_id=_user_id)
+
+
+def _ingest_file(path):
+    """Analyze one report file; returns its status, result and raw OCR pages"""
+    pages = []
+    try:
+        result = _analyzer.analyze_document([path], ocr_sink=pages.append, ocr_lookup=_find_ocr)
+    except Exception as e:
+        result = {'error': str(e)}
+
+    if 'quality' in result:
+        status = 'rejected'
+    elif 'error' in result:
+        status = 'error'
+    elif not result['ocr'].get('value_sources'):
+        # Nothing was read: the analyzer fell back to demo values
+        status = 'no_values'
+    else:
+        status = 'ok'
+
+    return {
+        'path': path,
+        'status': status,
+        'result': result,
+        'ocr_pages': pages,
+        'timings_ms': result.get('ocr', {}).get('timings_ms', {})
+    }
+
+
+def find_reports(directory):
+    """Lab report files under a directory, in a stable order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if allowed_file(name, 'lab'):
+                yield os.path.abspath(os.path.join(root, name))
+
+
+def _load_checkpoint(conn):
+    """Files already handled; failed files are tried again"""
+    rows = conn.execute("SELECT path FROM lab_ingest_checkpoint WHERE status != 'error'")
+    return {row[0] for row in rows}
+
+
+def _commit_batch(conn, out, batch, user_id, directory, totals):
+    """Insert one batch of results in a single transaction, then stream them"""
+    start = time.perf_counter()
+    store = LabOcrStore(conn)
+    lines = []
+    for item in batch:
+        result = item['result']
+        record_id = None
+        if item['status'] == 'ok':
+            cursor = conn.execute(
+                'INSERT INTO health_records (user_id, record_type, diagnosis, treatment, severity) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (user_id, 'lab', result['diagnosis'], result['treatment'], result['severity'])
+            )
+            record_id = cursor.lastrowid
+            if item['ocr_pages']:
+                store.save_pages(record_id, user_id, item['ocr_pages'], commit=False)
+        conn.execute(
+            'INSERT OR REPLACE INTO lab_ingest_checkpoint (path, user_id, health_record_id, status) '
+            'VALUES (?, ?, ?, ?)',
+            (item['path'], user_id, record_id, item['status'])
+        )
+
+        line = {'path': os.path.relpath(item['path'], directory), 'status': item['status'],
+                'health_record_id': record_id}
+        if item['status'] == 'ok':
+            line.update({
+                'lab_values': result['lab_values'],
+                'diagnosis': result['diagnosis'],
+                'severity': result['severity'],
+                'abnormal_values': result['abnormal_values']
+            })
+        elif item['status'] in ('rejected', 'error'):
+            line['message'] = result['error']
+        line['timings_ms'] = item['timings_ms']
+        lines.append(line)
+
+        totals['files'] += 1
+        totals[item['status']] += 1
+        for stage in STAGES:
+            totals['stages'][stage] += item['timings_ms'].get(stage, 0.0)
+    conn.commit()
+    totals['stages']['db'] += (time.perf_counter() - start) * 1000
+
+    # Only committed results are streamed, so the output matches the checkpoint
+    for line in lines:
+        out.write(json.dumps(line) + '\n')
+    out.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory')
+    parser.add_argument('--user', type=int, required=True, help='user id the records belong to')
+    parser.add_argument('--db', default='medical_assistant.db')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--commit-every', type=int, default=50, help='files per transaction')
+    parser.add_argument('--output', help='NDJSON file to append results to (default: stdout)')
+    args = parser.parse_args()
+
+    database.DATABASE = args.db
+    # stdout may carry the NDJSON stream; status messages go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        database.init_db()
+    conn = sqlite3.connect(args.db)
+    if conn.execute('SELECT 1 FROM users WHERE id = ?', (args.user,)).fetchone() is None:
+        sys.exit(f"User {args.user} does not exist in {args.db}")
+
+    # Without OCR every report would get demo values
+    from models.ocr_engine import OcrEngine
+    engine = OcrEngine(pool_size=1)
+    if not engine.available:
+        sys.exit("Tesseract OCR is not available; install it before ingesting reports")
+    engine.close()
+
+    done = _load_checkpoint(conn)
+    paths = [path for path in find_reports(args.directory) if path not in done]
+    print(f"{len(paths)} report files to ingest ({len(done)} already done)", file=sys.stderr)
+
+    out = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+    totals = {'files': 0, 'ok': 0, 'rejected': 0, 'no_values': 0, 'error': 0,
+              'stages': {stage: 0.0 for stage in STAGES + ('db',)}}
+    batch = []
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.db, args.user))
+    try:
+        # Bounded number of files in flight; results are committed as they arrive
+        pending = set()
+        for path in paths:
+            pending.add(pool.submit(_ingest_file, path))
+            if len(pending) < 2 * args.workers:
+                continue
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            batch += [future.result() for future in finished]
+            if len(batch) >= args.commit_every:
+                _commit_batch(conn, out, batch, args.user, args.directory, totals)
+                batch = []
+                elapsed = time.perf_counter() - start
+                print(f"  {totals['files']}/{len(paths)} files ({totals['files'] / elapsed:.2f} files/s)",
+                      file=sys.stderr)
+        for future in pending:
+            batch.append(future.result())
+    except KeyboardInterrupt:
+        print("Interrupted; committing finished files (re-run to resume)", file=sys.stderr)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if batch:
+            _commit_batch(conn, out, batch, args.user, args.directory, totals)
+        conn.close()
+        if args.output:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    files = totals['files']
+    print(f"Ingested {files} files in {elapsed:.1f}s ({files / elapsed if elapsed else 0:.2f} files/s): "
+          f"{totals['ok']} saved, {totals['rejected']} rejected by the quality gate, "
+          f"{totals['no_values']} without lab values, {totals['error']} failed", file=sys.stderr)
+    if files:
+        print("Stage timings (summed over workers; mean per file):", file=sys.stderr)
+        for stage, ms in totals['stages'].items():
+            print(f"  {stage:<10} {ms / 1000:8.1f}s  {ms / files:8.1f} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
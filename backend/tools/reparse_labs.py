@@ -0,0 +1,120 @@
+"""
+Re-parse stored lab report OCR output with the current parser and normal ranges.
+
+Streams the raw OCR text saved in lab_ocr_results through LabAnalyzer's
+parser and _analyze_values in a process pool. No image is OCR'd again, so
+re-analyzing the whole history costs only parsing time.
+
+Usage: python -m backend.tools.reparse_labs [--db medical_assistant.db] [--workers 4] [--update] [--output results.ndjson]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.ocr_store import LabOcrStore, decompress_text
+
+_analyzer = None
+
+
+def _init_worker():
+    """One parse-only analyzer per worker process"""
+    global _analyzer
+    sys.stdout = open(os.devnull, 'w')
+    from models.lab_analyzer import LabAnalyzer
+    _analyzer = LabAnalyzer(enable_ocr=False)
+
+
+def _reparse_batch(documents):
+    results = []
+    for record_id, rows in documents:
+        pages = [{
+            'text': decompress_text(text),
+            'lines': json.loads(decompress_text(lines)) if lines is not None else None
+        } for _, text, lines in rows]
+        results.append((record_id, _analyzer.reanalyze_ocr(pages)))
+    return results
+
+
+def _batches(documents, size):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default='medical_assistant.db')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=64, help='reports per task')
+    parser.add_argument('--ocr-version', help='only re-parse OCR stored under this config version')
+    parser.add_argument('--update', action='store_true', help='write new diagnoses to health_records')
+    parser.add_argument('--output', help='NDJSON file for the new results (default: stdout)')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    store = LabOcrStore(conn)
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    batches = _batches(store.iter_documents(args.ocr_version), args.batch_size)
+
+    start = time.perf_counter()
+    totals = {'reports': 0, 'updated': 0, 'empty': 0}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        # Bounded number of batches in flight: rows are streamed, never all loaded
+        pending = set()
+        for batch in batches:
+            pending.add(pool.submit(_reparse_batch, batch))
+            if len(pending) < 2 * args.workers:
+                continue
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                _write_results(conn, out, future.result(), args.update, totals)
+        for future in pending:
+            _write_results(conn, out, future.result(), args.update, totals)
+
+    conn.commit()
+    conn.close()
+    if args.output:
+        out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Re-parsed {totals['reports']} reports in {elapsed:.1f}s "
+          f"({totals['reports'] / elapsed if elapsed else 0:.0f} reports/s); {totals['empty']} without values"
+          + (f", {totals['updated']} records updated" if args.update else ""), file=sys.stderr)
+
+
+def _write_results(conn, out, results, update, totals):
+    """Write one batch of results and add it to the totals"""
+    updates = []
+    for record_id, analysis in results:
+        totals['reports'] += 1
+        if analysis is None:
+            totals['empty'] += 1
+            out.write(json.dumps({'health_record_id': record_id, 'lab_values': {}}) + '\n')
+            continue
+        out.write(json.dumps({
+            'health_record_id': record_id,
+            'lab_values': analysis['lab_values'],
+            'diagnosis': analysis['diagnosis'],
+            'severity': analysis['severity'],
+            'abnormal_values': analysis['abnormal_values']
+        }) + '\n')
+        updates.append((analysis['diagnosis'], analysis['treatment'], analysis['severity'], record_id))
+
+    if update and updates:
+        conn.executemany('UPDATE health_records SET diagnosis = ?, treatment = ?, severity = ? WHERE id = ?', updates)
+        totals['updated'] += len(updates)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ from werkzeug.utils import secure_filename
 
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
 ALLOWED_AUDIO_EXTENSIONS = {'wav', 'mp3', 'ogg', 'm4a'}
+ALLOWED_DOCUMENT_EXTENSIONS = {'pdf'}
 
 def allowed_file(filename, file_type='image'):
     """Check if file extension is allowed"""
@@ -15,6 +16,8 @@ def allowed_file(filename, file_type='image'):
         return ext in ALLOWED_IMAGE_EXTENSIONS
     elif file_type == 'audio':
         return ext in ALLOWED_AUDIO_EXTENSIONS
+    elif file_type == 'lab':
+        return ext in ALLOWED_IMAGE_EXTENSIONS or ext in ALLOWED_DOCUMENT_EXTENSIONS
     
     return False
 
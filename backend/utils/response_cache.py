@@ -0,0 +1,107 @@
+"""Cache for precompiled response fragments (treatment text, symptom and recommendation lists)"""
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+
+class FragmentCache:
+    """Bounded cache of immutable response fragments
+
+    Lists are stored as tuples so a cached fragment can never be modified by
+    a caller; the decorator hands out a fresh list copy instead. When full,
+    the least recently used entry is evicted. ``maxsize=0`` disables caching.
+    ``generation`` counts clears: a fragment built from data read before a
+    clear is returned but not stored.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value, generation=None):
+        value = _freeze(value)
+        with self._lock:
+            self.misses += 1
+            if self.maxsize > 0 and generation in (None, self.generation):
+                self._entries[key] = value
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+def cached_fragment(key=None):
+    """Memoize a response-building method per instance
+
+    ``key`` maps the method arguments to the inputs the output actually
+    depends on; by default the arguments themselves are the key.
+    """
+    def decorator(method):
+        name = method.__name__
+
+        @wraps(method)
+        def wrapper(self, *args):
+            cache = self.__dict__.get('_fragment_cache')
+            if cache is None:
+                cache = self.__dict__.setdefault('_fragment_cache', FragmentCache())
+            cache_key = (name, key(*args) if key else args)
+            value = cache.get(cache_key)
+            if value is None:
+                generation = cache.generation
+                value = cache.put(cache_key, method(self, *args), generation)
+            return _thaw(value)
+
+        return wrapper
+
+    return decorator
+
+
+def fragment_cache_stats(obj):
+    """Hit/miss statistics of an object's fragment cache"""
+    cache = obj.__dict__.get('_fragment_cache')
+    return cache.stats() if cache else FragmentCache().stats()
+
+
+def clear_fragment_cache(obj):
+    """Drop an object's cached fragments, e.g. after the data they were built from changed"""
+    cache = obj.__dict__.get('_fragment_cache')
+    if cache is not None:
+        cache.clear()